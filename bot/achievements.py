@@ -0,0 +1,324 @@
+"""
+Достижения и ежедневные бонусы
+
+Правила проверяются по счетчикам игрока, которые обновляются из журнала
+расчетов (events.py) по одному событию - история игр не перечитывается.
+
+Правила компилируются в индекс по типу события: расчет lucky2 проверяет
+только правила на "settlement", "settlement:lucky2" и, если это
+выигрыш, "win". Тип "day" - первое событие игрока за календарный день.
+
+Счетчики, полученные достижения и позиция игрока хранятся в
+achievement_progress и меняются в транзакции потребителя вместе с
+начислением наград, поэтому повторная обработка пачки ничего не
+начисляет дважды.
+"""
+import json
+import logging
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from events import Consumer
+
+logger = logging.getLogger(__name__)
+
+GAMES = ("mono", "lucky2")
+
+# Как события меняют счетчики: тип события -> [(счетчик, операция, значение)]
+#   add - прибавить, max - максимум, streak - +1 при истинном значении, иначе 0
+COUNTERS: Dict[str, List[tuple]] = {
+    "settlement": [
+        ("games", "add", lambda event: 1),
+        ("wagered_stars", "add", lambda event: event["bet_stars"]),
+        ("day_games", "add", lambda event: 1),
+        ("win_streak", "streak", lambda event: event["win_stars"] > event["bet_stars"]),
+    ],
+    "win": [
+        ("wins", "add", lambda event: 1),
+        ("won_stars", "add", lambda event: event["win_stars"]),
+        ("max_multiplier", "max", lambda event: event["multiplier"]),
+    ],
+    "nft": [
+        ("nfts", "add", lambda event: 1),
+    ],
+    "day": [
+        ("days", "add", lambda event: 1),
+    ],
+    **{
+        f"settlement:{game}": [(f"{game}_games", "add", lambda event: 1)]
+        for game in GAMES
+    }
+}
+
+# Счетчики, которые ведет сам движок при смене дня
+DAY_COUNTERS = ("day_streak",)
+
+# Сбрасываются в начале нового дня игрока
+DAILY_COUNTERS = ("day_games",)
+
+ACHIEVEMENTS = [
+    {"id": "first_game", "name": "Первая ставка", "emoji": "🎲", "on": "settlement", "counter": "games", "threshold": 1, "reward_stars": 0},
+    {"id": "games_100", "name": "Завсегдатай", "emoji": "🎰", "on": "settlement", "counter": "games", "threshold": 100, "reward_stars": 50},
+    {"id": "games_1000", "name": "Хайроллер", "emoji": "🏛️", "on": "settlement", "counter": "games", "threshold": 1000, "reward_stars": 500},
+    {"id": "mono_100", "name": "Мастер Моно", "emoji": "🎯", "on": "settlement:mono", "counter": "mono_games", "threshold": 100, "reward_stars": 50},
+    {"id": "lucky2_100", "name": "Счастливая двойка", "emoji": "🍀", "on": "settlement:lucky2", "counter": "lucky2_games", "threshold": 100, "reward_stars": 50},
+    {"id": "first_win", "name": "Первый выигрыш", "emoji": "🥇", "on": "win", "counter": "wins", "threshold": 1, "reward_stars": 0},
+    {"id": "win_streak_5", "name": "Серия из пяти", "emoji": "🔥", "on": "win", "counter": "win_streak", "threshold": 5, "reward_stars": 100},
+    {"id": "multiplier_10", "name": "Множитель x10", "emoji": "🚀", "on": "win", "counter": "max_multiplier", "threshold": 10, "reward_stars": 100},
+    {"id": "multiplier_100", "name": "Множитель x100", "emoji": "🌠", "on": "win", "counter": "max_multiplier", "threshold": 100, "reward_stars": 1000},
+    {"id": "won_100k", "name": "Сто тысяч", "emoji": "💰", "on": "win", "counter": "won_stars", "threshold": 100000, "reward_stars": 1000},
+    {"id": "first_nft", "name": "Коллекционер", "emoji": "🎁", "on": "nft", "counter": "nfts", "threshold": 1, "reward_stars": 0},
+    {"id": "day_streak_7", "name": "Неделя в игре", "emoji": "📅", "on": "day", "counter": "day_streak", "threshold": 7, "reward_stars": 200},
+]
+
+# Выдаются не чаще раза в день игрока
+DAILY_BONUSES = [
+    {"id": "daily_first_game", "name": "Первая игра дня", "emoji": "☀️", "on": "day", "counter": "day_games", "threshold": 1, "reward_stars": 10},
+    {"id": "daily_games_20", "name": "20 игр за день", "emoji": "⚡", "on": "settlement", "counter": "day_games", "threshold": 20, "reward_stars": 50},
+]
+
+
+class Rule:
+    """Скомпилированное правило достижения или ежедневного бонуса"""
+    
+    __slots__ = ("id", "daily", "name", "emoji", "on", "counter", "threshold", "reward_stars")
+    
+    def __init__(self, definition: Dict, daily: bool = False):
+        self.id = definition["id"]
+        self.daily = daily
+        self.name = definition["name"]
+        self.emoji = definition["emoji"]
+        self.on = definition["on"]
+        self.counter = definition["counter"]
+        self.threshold = definition["threshold"]
+        self.reward_stars = int(definition.get("reward_stars", 0))
+
+
+def compile_rules(achievements: Iterable[Dict] = ACHIEVEMENTS,
+                  daily_bonuses: Iterable[Dict] = DAILY_BONUSES) -> Dict[str, List[Rule]]:
+    """
+    Индекс правил по типу события
+    
+    Raises:
+        ValueError: повтор id, неизвестный тип события или счетчик
+    """
+    counters = {name for updates in COUNTERS.values() for name, _, _ in updates}
+    counters.update(DAY_COUNTERS)
+    
+    index: Dict[str, List[Rule]] = {}
+    seen = set()
+    for rules, daily in ((achievements, False), (daily_bonuses, True)):
+        for definition in rules:
+            rule = Rule(definition, daily)
+            if rule.id in seen:
+                raise ValueError(f"Правило {rule.id} объявлено дважды")
+            if rule.on not in COUNTERS:
+                raise ValueError(f"Правило {rule.id}: неизвестный тип события {rule.on}")
+            if rule.counter not in counters:
+                raise ValueError(f"Правило {rule.id}: неизвестный счетчик {rule.counter}")
+            seen.add(rule.id)
+            index.setdefault(rule.on, []).append(rule)
+    
+    return index
+
+
+class UserProgress:
+    """Счетчики игрока и уже выданные достижения и бонусы"""
+    
+    __slots__ = ("user_id", "counters", "achievements", "day", "daily",
+                 "last_txid", "last_event_id")
+    
+    def __init__(self, user_id: int, counters: Optional[Dict] = None,
+                 achievements: Iterable[str] = (), day: Optional[date] = None,
+                 daily: Iterable[str] = (), last_txid: int = 0, last_event_id: int = 0):
+        self.user_id = user_id
+        self.counters = counters or {}
+        self.achievements = set(achievements)
+        self.day = day
+        # Ежедневные бонусы, выданные за day
+        self.daily = set(daily)
+        # Последнее учтенное событие в порядке журнала (txid, event_id)
+        self.last_txid = last_txid
+        self.last_event_id = last_event_id
+
+
+class AchievementEngine:
+    """Применение событий к счетчикам игрока и проверка правил по индексу"""
+    
+    def __init__(self, index: Optional[Dict[str, List[Rule]]] = None):
+        self.index = index if index is not None else compile_rules()
+        self.rules: Dict[str, Rule] = {
+            rule.id: rule for rules in self.index.values() for rule in rules
+        }
+    
+    @staticmethod
+    def event_types(event: Dict) -> List[str]:
+        types = ["settlement", f"settlement:{event['game']}"]
+        if event["win_stars"] > event["bet_stars"]:
+            types.append("win")
+        if event["details"].get("nft_awarded"):
+            types.append("nft")
+        return types
+    
+    def apply(self, progress: UserProgress, event: Dict) -> List[Rule]:
+        """Учесть событие; возвращает сработавшие правила"""
+        counters = progress.counters
+        types = self.event_types(event)
+        
+        day = event["created_at"].date()
+        if progress.day != day:
+            yesterday = day - timedelta(days=1)
+            counters["day_streak"] = counters.get("day_streak", 0) + 1 if progress.day == yesterday else 1
+            for name in DAILY_COUNTERS:
+                counters[name] = 0
+            progress.day = day
+            progress.daily.clear()
+            types.append("day")
+        
+        for event_type in types:
+            for name, operation, value in COUNTERS.get(event_type, ()):
+                current = counters.get(name, 0)
+                if operation == "add":
+                    counters[name] = current + value(event)
+                elif operation == "max":
+                    counters[name] = max(current, value(event))
+                elif operation == "streak":
+                    counters[name] = current + 1 if value(event) else 0
+        
+        fired = []
+        for event_type in types:
+            for rule in self.index.get(event_type, ()):
+                claimed = progress.daily if rule.daily else progress.achievements
+                if rule.id in claimed or counters.get(rule.counter, 0) < rule.threshold:
+                    continue
+                claimed.add(rule.id)
+                fired.append(rule)
+        
+        progress.last_txid = event["txid"]
+        progress.last_event_id = event["event_id"]
+        return fired
+
+
+class AchievementConsumer(Consumer):
+    """
+    Потребитель журнала расчетов: достижения и ежедневные бонусы
+    
+    Награды в stars начисляются в транзакции пачки. Слушатели
+    unlock_listeners(user_id, rule) вызываются после ее фиксации.
+    """
+    
+    name = "achievements"
+    
+    def __init__(self, db, engine: Optional[AchievementEngine] = None):
+        self.db = db
+        self.engine = engine or AchievementEngine()
+        self.unlock_listeners: List[Callable[[int, Rule], None]] = []
+        self._unlocked: List[tuple] = []
+        self._credited: List[Dict] = []
+    
+    async def handle(self, conn, events: List[Dict]):
+        progress = await self._load(conn, {event["user_id"] for event in events})
+        
+        changed = {}
+        unlocked = []
+        for event in events:
+            user_id = event["user_id"]
+            state = progress.get(user_id)
+            if state is None:
+                state = progress[user_id] = UserProgress(user_id)
+            # Событие уже учтено до перемотки потребителя. Журнал идет в
+            # порядке (txid, event_id), а не event_id: сравниваем пару
+            if (event["txid"], event["event_id"]) <= (state.last_txid, state.last_event_id):
+                continue
+            for rule in self.engine.apply(state, event):
+                unlocked.append((user_id, rule, event))
+            changed[user_id] = state
+        
+        if not changed:
+            return
+        
+        await conn.executemany('''
+            INSERT INTO achievement_progress
+            (user_id, counters, achievements, day, daily, last_txid, last_event_id)
+            VALUES ($1, $2::jsonb, $3, $4, $5, $6, $7)
+            ON CONFLICT (user_id) DO UPDATE
+            SET counters = EXCLUDED.counters,
+                achievements = EXCLUDED.achievements,
+                day = EXCLUDED.day,
+                daily = EXCLUDED.daily,
+                last_txid = EXCLUDED.last_txid,
+                last_event_id = EXCLUDED.last_event_id,
+                updated_at = NOW()
+        ''', [
+            (state.user_id, json.dumps(state.counters), sorted(state.achievements),
+             state.day, sorted(state.daily), state.last_txid, state.last_event_id)
+            for state in changed.values()
+        ])
+        
+        if unlocked:
+            await conn.executemany('''
+                INSERT INTO user_achievements
+                (user_id, achievement_id, day, reward_stars, event_id, unlocked_at)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT DO NOTHING
+            ''', [
+                (user_id, rule.id, event["created_at"].date() if rule.daily else None,
+                 rule.reward_stars, event["event_id"], event["created_at"])
+                for user_id, rule, event in unlocked
+            ])
+        
+        rewards: Dict[int, int] = {}
+        for user_id, rule, _ in unlocked:
+            if rule.reward_stars:
+                rewards[user_id] = rewards.get(user_id, 0) + rule.reward_stars
+        
+        credited = []
+        if rewards:
+            rows = await conn.fetch('''
+                UPDATE users u
+                SET stars_balance = u.stars_balance + r.stars,
+                    updated_at = NOW()
+                FROM unnest($1::bigint[], $2::int[]) AS r(user_id, stars)
+                WHERE u.user_id = r.user_id
+                RETURNING u.user_id, u.stars_balance, u.spins_balance, u.row_version
+            ''', list(rewards), list(rewards.values()))
+            credited = [dict(row) for row in rows]
+        
+        self._unlocked = [(user_id, rule) for user_id, rule, _ in unlocked]
+        self._credited = credited
+    
+    async def _load(self, conn, user_ids: set) -> Dict[int, UserProgress]:
+        rows = await conn.fetch('''
+            SELECT user_id, counters, achievements, day, daily, last_txid, last_event_id
+            FROM achievement_progress
+            WHERE user_id = ANY($1::bigint[])
+        ''', list(user_ids))
+        
+        return {
+            row['user_id']: UserProgress(
+                row['user_id'],
+                counters=json.loads(row['counters']) if row['counters'] else {},
+                achievements=row['achievements'] or (),
+                day=row['day'],
+                daily=row['daily'] or (),
+                last_txid=row['last_txid'],
+                last_event_id=row['last_event_id']
+            )
+            for row in rows
+        }
+    
+    async def committed(self, events: List[Dict]):
+        credited, self._credited = self._credited, []
+        for row in credited:
+            await self.db._row_changed(row['user_id'], row['row_version'], {
+                "stars_balance": row['stars_balance'],
+                "spins_balance": row['spins_balance']
+            })
+        
+        unlocked, self._unlocked = self._unlocked, []
+        for user_id, rule in unlocked:
+            for listener in self.unlock_listeners:
+                try:
+                    listener(user_id, rule)
+                except Exception as e:
+                    logger.error(f"Ошибка слушателя достижений для {user_id}: {e}")
@@ -0,0 +1,465 @@
+import os
+import time
+import asyncio
+import logging
+from functools import partial
+from typing import Dict, Iterable, Optional
+
+import ujson
+from aiohttp import web
+
+import redis.asyncio as aioredis
+
+from config import Config
+from database import Database
+from cache import BalanceCache
+from inventory import InventorySystem
+from metrics import CasinoMetrics, MetricsServer
+from query_inspector import QueryInspector, create_query_inspector
+from push import PushConnection, PushHub, PushService, create_push_service
+from webapp_auth import InitDataError, WebAppAuth
+from games.mono import MonoGame
+from games.lucky2 import Lucky2Game
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера не сжимаются
+GZIP_MIN_SIZE = 1024
+
+# Запросы дольше этого времени попадают в лог
+SLOW_REQUEST_SECONDS = 0.5
+
+# Ключ статистики для запросов, не попавших ни в один маршрут
+UNMATCHED_ROUTE = "unmatched"
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая возвращается клиенту"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# Даты и Decimal из БД сериализуются строками
+_dumps = partial(ujson.dumps, ensure_ascii=False, default=str)
+
+
+def json_response(data: Dict, status: int = 200) -> web.Response:
+    """JSON-ответ через ujson"""
+    return web.json_response(data, status=status, dumps=_dumps)
+
+
+class ApiServer:
+    """
+    HTTP API для WebApp
+    
+    Использует те же Database, MonoGame, Lucky2Game и InventorySystem,
+    что и бот, поэтому игровые правила и балансы считаются одним кодом.
+    WebApp получает результат напрямую, без Telegram.WebApp.sendData.
+    """
+    
+    def __init__(self, db: Database, mono_game: MonoGame, lucky2_game: Lucky2Game,
+                 inventory: InventorySystem, host: str = "0.0.0.0", port: int = 3000,
+                 static_dir: Optional[str] = None, keepalive_timeout: float = 75.0,
+                 auth: Optional[WebAppAuth] = None, push: Optional[PushService] = None,
+                 hub: Optional[PushHub] = None,
+                 query_inspector: Optional[QueryInspector] = None,
+                 admin_ids: Iterable[int] = ()):
+        self.db = db
+        self.mono_game = mono_game
+        self.lucky2_game = lucky2_game
+        self.inventory = inventory
+        self.host = host
+        self.port = port
+        self.keepalive_timeout = keepalive_timeout
+        
+        # Push-события для WebSocket: сервис публикует, hub держит соединения
+        self.auth = auth
+        self.push = push
+        self.hub = hub
+        
+        # Кому доступна служебная статистика /api/stats
+        self.admin_ids = frozenset(admin_ids)
+        
+        # Маршрут -> [запросов, ошибок, суммарное время]
+        self.timings: Dict[str, list] = {}
+        
+        # Запросы к БД группируются по HTTP запросу (только DEV_MODE)
+        self.query_inspector = query_inspector
+        middlewares = [self.timing_middleware, self.error_middleware]
+        if query_inspector is not None and query_inspector.enabled:
+            middlewares.insert(0, self.query_scope_middleware)
+        
+        self.app = web.Application(
+            middlewares=middlewares,
+            client_max_size=64 * 1024
+        )
+        self.app.router.add_post("/api/auth", self.login)
+        self.app.router.add_get("/api/user/balance", self.get_balance)
+        self.app.router.add_post("/api/mono/spin", self.mono_spin)
+        self.app.router.add_post("/api/lucky2/bet", self.lucky2_bet)
+        self.app.router.add_get("/api/inventory", self.get_inventory)
+        self.app.router.add_post("/api/booster/use", self.use_booster)
+        self.app.router.add_post("/api/inventory/sell", self.sell_item)
+        self.app.router.add_get("/api/stats", self.get_stats)
+        self.app.router.add_get("/healthz", self.healthz)
+        if self.hub is not None:
+            self.app.router.add_get("/ws", self.websocket)
+        
+        # Статика WebApp (в docker-compose фронтенд монтируется в public)
+        if static_dir and os.path.isdir(static_dir):
+            self.app.router.add_static("/", static_dir)
+        
+        self._runner: Optional[web.AppRunner] = None
+    
+    @staticmethod
+    def _route_name(request: web.Request) -> str:
+        """
+        Имя маршрута для статистики
+        
+        Запросы мимо маршрутов идут в одну запись: путь из запроса при
+        сканировании случайных URL растил бы статистику без предела.
+        """
+        route = request.match_info.route.resource
+        return route.canonical if route is not None else UNMATCHED_ROUTE
+    
+    @web.middleware
+    async def query_scope_middleware(self, request: web.Request, handler):
+        """Запросы к БД одного HTTP запроса - одна область проверки"""
+        name = self._route_name(request)
+        with self.query_inspector.scope(f"{request.method} {name}"):
+            return await handler(request)
+    
+    @web.middleware
+    async def timing_middleware(self, request: web.Request, handler):
+        """Время обработки запроса: заголовок ответа, статистика и лог медленных"""
+        started = time.perf_counter()
+        name = self._route_name(request)
+        failed = False
+        
+        try:
+            response = await handler(request)
+            failed = response.status >= 400
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self.timings.setdefault(name, [0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += elapsed
+            
+            if elapsed > SLOW_REQUEST_SECONDS:
+                logger.warning(f"Медленный запрос {request.method} {name}: {elapsed * 1000:.0f} мс")
+        
+        response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.1f}"
+        
+        # gzip только для крупных ответов и клиентов, которые его принимают
+        if (isinstance(response, web.Response) and response.body is not None
+                and len(response.body) >= GZIP_MIN_SIZE
+                and "gzip" in request.headers.get("Accept-Encoding", "")):
+            response.enable_compression(web.ContentCoding.gzip)
+        
+        return response
+    
+    @web.middleware
+    async def error_middleware(self, request: web.Request, handler):
+        """Ошибки в формате, который ожидает фронтенд"""
+        try:
+            return await handler(request)
+        except ApiError as e:
+            return json_response({"success": False, "error": e.message}, status=e.status)
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(f"Ошибка обработки {request.method} {request.path}: {e}")
+            return json_response({"success": False, "error": "Внутренняя ошибка"}, status=500)
+    
+    # Разбор запросов
+    
+    @staticmethod
+    async def _body(request: web.Request) -> Dict:
+        try:
+            body = await request.json(loads=ujson.loads)
+        except ValueError:
+            raise ApiError("Некорректный JSON")
+        
+        if not isinstance(body, dict):
+            raise ApiError("Ожидается JSON-объект")
+        return body
+    
+    @staticmethod
+    def _int(data, field: str) -> int:
+        try:
+            return int(data[field])
+        except KeyError:
+            raise ApiError(f"Не указан параметр {field}")
+        except (TypeError, ValueError):
+            raise ApiError(f"Параметр {field} должен быть числом")
+    
+    def _user_id(self, request: web.Request) -> int:
+        """
+        ID пользователя из токена сессии (Authorization: Bearer <токен>)
+        
+        user_id из запроса не используется - он приходил от клиента и
+        позволял действовать от имени любого игрока.
+        """
+        header = request.headers.get("Authorization", "")
+        token = header[7:] if header.startswith("Bearer ") else None
+        
+        try:
+            return self.auth.authenticate(token)
+        except InitDataError as e:
+            raise ApiError(str(e), status=401)
+    
+    # Обработчики
+    
+    async def login(self, request: web.Request) -> web.Response:
+        """POST /api/auth {init_data} - проверка initData и выдача токена сессии"""
+        body = await self._body(request)
+        
+        try:
+            user, token, ttl = self.auth.login(str(body.get("init_data", "")))
+        except (InitDataError, KeyError, ValueError) as e:
+            raise ApiError(str(e), status=401)
+        
+        return json_response({
+            "success": True,
+            "token": token,
+            "expires_in": ttl,
+            "user_id": user["id"]
+        })
+    
+    async def get_balance(self, request: web.Request) -> web.Response:
+        """GET /api/user/balance?user_id="""
+        user = await self.db.get_user_row(self._user_id(request))
+        if user is None:
+            raise ApiError("Пользователь не найден", status=404)
+        
+        return json_response({
+            "success": True,
+            "balance": user["stars_balance"],
+            "stars": user["stars_balance"],
+            "spins": user["spins_balance"]
+        })
+    
+    async def mono_spin(self, request: web.Request) -> web.Response:
+        """POST /api/mono/spin {user_id, chance, bet_spins}"""
+        body = await self._body(request)
+        user_id = self._user_id(request)
+        result = await self.mono_game.spin(
+            user_id,
+            self._int(body, "chance"),
+            self._int(body, "bet_spins") if "bet_spins" in body else 1
+        )
+        self._publish_result(user_id, "mono", result)
+        return json_response(result)
+    
+    async def lucky2_bet(self, request: web.Request) -> web.Response:
+        """POST /api/lucky2/bet {user_id, color, amount}"""
+        body = await self._body(request)
+        
+        user_id = self._user_id(request)
+        
+        # Результат всегда считает сервер; won/winning_color клиента игнорируются
+        result = await self.lucky2_game.bet(
+            user_id,
+            str(body.get("color", "")),
+            self._int(body, "amount")
+        )
+        if result.get("success"):
+            result["new_balance"] = result["balance"]
+        self._publish_result(user_id, "lucky2", result)
+        return json_response(result)
+    
+    def _publish_result(self, user_id: int, game: str, result: Dict):
+        """Результат игры - во все открытые вкладки WebApp пользователя"""
+        if self.push is None or not result.get("success"):
+            return
+        
+        self.push.spin_result(user_id, game, result)
+        if result.get("nft_awarded"):
+            self.push.nft_awarded(user_id, result["nft_awarded"])
+    
+    async def websocket(self, request: web.Request) -> web.StreamResponse:
+        """GET /ws?token= - поток событий для WebApp"""
+        try:
+            user_id = self.auth.authenticate(request.query.get("token"))
+        except InitDataError as e:
+            raise ApiError(str(e), status=401)
+        
+        ws = web.WebSocketResponse(heartbeat=30, max_msg_size=4096)
+        await ws.prepare(request)
+        
+        connection = PushConnection(ws, user_id, max_buffer=self.hub.max_buffer)
+        self.hub.add(connection)
+        writer = asyncio.create_task(connection.run_writer())
+        
+        try:
+            # Клиент ничего не присылает; чтение нужно, чтобы заметить закрытие
+            async for _ in ws:
+                pass
+        finally:
+            connection.close()
+            self.hub.remove(connection)
+            await writer
+        
+        return ws
+    
+    async def get_inventory(self, request: web.Request) -> web.Response:
+        """GET /api/inventory?user_id="""
+        inventory = await self.inventory.get_user_inventory(self._user_id(request))
+        return json_response({"success": True, "inventory": inventory})
+    
+    async def use_booster(self, request: web.Request) -> web.Response:
+        """POST /api/booster/use {user_id, booster_id}"""
+        body = await self._body(request)
+        success = await self.inventory.use_booster(
+            self._user_id(request), self._int(body, "booster_id")
+        )
+        return json_response({"success": success})
+    
+    async def sell_item(self, request: web.Request) -> web.Response:
+        """POST /api/inventory/sell {user_id, item_id, item_type}"""
+        body = await self._body(request)
+        if body.get("item_type", "nft") != "nft":
+            raise ApiError("Продавать можно только NFT")
+        
+        price = await self.inventory.sell_nft(
+            self._user_id(request), self._int(body, "item_id")
+        )
+        if price is None:
+            return json_response({"success": False, "error": "Предмет не найден"})
+        
+        return json_response({"success": True, "price": price})
+    
+    async def get_stats(self, request: web.Request) -> web.Response:
+        """GET /api/stats - время обработки по маршрутам (только администраторам)"""
+        if self._user_id(request) not in self.admin_ids:
+            raise ApiError("Недостаточно прав", status=403)
+        
+        routes = {
+            name: {
+                "requests": count,
+                "errors": errors,
+                "avg_ms": round(total / count * 1000, 2) if count else 0
+            }
+            for name, (count, errors, total) in self.timings.items()
+        }
+        return json_response({
+            "success": True,
+            "routes": routes,
+            "push": self.hub.stats if self.hub is not None else None,
+            "auth": self.auth.stats if self.auth is not None else None
+        })
+    
+    async def healthz(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+    
+    async def start(self):
+        """Запустить HTTP сервер"""
+        self._runner = web.AppRunner(
+            self.app,
+            keepalive_timeout=self.keepalive_timeout,
+            access_log=None
+        )
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port, reuse_port=True).start()
+        logger.info(f"API запущен на {self.host}:{self.port}")
+    
+    async def stop(self):
+        """Остановить HTTP сервер"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def main():
+    config = Config()
+    
+    redis_url = os.getenv("REDIS_URL")
+    redis = aioredis.from_url(redis_url) if redis_url else None
+    
+    # Один пул соединений на все обработчики API
+    db = Database(
+        config.DB_URL,
+        cache=BalanceCache(redis) if redis else None,
+        pool_max_size=int(os.getenv("API_DB_POOL_SIZE", "20"))
+    )
+    await db.connect()
+    
+    query_inspector = create_query_inspector()
+    query_inspector.instrument_pool(db)
+    
+    # Изменения балансов из любого процесса доходят до WebSocket клиентов
+    hub = PushHub()
+    push = create_push_service(redis, hub)
+    db.row_listeners.append(push.balance_changed)
+    await push.broker.start()
+    
+    inventory = InventorySystem(db)
+    mono_game = MonoGame(db, inventory)
+    lucky2_game = Lucky2Game(db)
+    
+    # Метрики Prometheus включаются только вместе с METRICS_PORT
+    metrics_port = os.getenv("METRICS_PORT")
+    metrics = CasinoMetrics(enabled=bool(metrics_port))
+    metrics.instrument_database(db)
+    metrics.instrument_game(mono_game, "mono", ("spin",))
+    metrics.instrument_game(lucky2_game, "lucky2", ("bet", "multi_bet"))
+    metrics.instrument_inventory(inventory)
+    metrics.gauge("casino_push_connections", "Открытые WebSocket соединения",
+                  lambda: sum(len(c) for c in hub.connections.values()))
+    
+    server = ApiServer(
+        db,
+        mono_game,
+        lucky2_game,
+        inventory,
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "3000")),
+        static_dir=os.getenv("STATIC_DIR", "public"),
+        auth=WebAppAuth(
+            config.BOT_TOKEN,
+            session_secret=os.getenv("JWT_SECRET"),
+            session_ttl=int(os.getenv("SESSION_TTL", "3600"))
+        ),
+        push=push,
+        hub=hub,
+        query_inspector=query_inspector,
+        admin_ids={config.OWNER_ID, *config.ADMINS}
+    )
+    
+    metrics_server = None
+    if metrics_port:
+        metrics_server = MetricsServer(
+            metrics.registry,
+            host=os.getenv("METRICS_HOST", "127.0.0.1"),
+            port=int(metrics_port)
+        )
+        await metrics_server.start()
+    
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        await push.broker.stop()
+        await query_inspector.close()
+        await db.close()
+        if redis:
+            await redis.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    asyncio.run(main())
@@ -0,0 +1,198 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Поля строки users, которые хранятся в кэше
+PROFILE_FIELDS = (
+    "username", "first_name", "stars_balance", "spins_balance",
+    "total_deposited", "total_withdrawn", "total_won", "total_games", "created_at"
+)
+INT_FIELDS = {
+    "stars_balance", "spins_balance", "total_deposited",
+    "total_withdrawn", "total_won", "total_games"
+}
+
+# Запись в хэш пользователя с учетом версии строки.
+# Версия - счетчик изменений строки users (row_version), поэтому устаревшая
+# запись (например, чтение, обогнанное списанием) не перетирает более новую.
+#   populate   - полная строка из БД, записывается только если она новее
+#   update     - изменившиеся поля после списания/начисления
+#   invalidate - пометить запись неполной, следующее чтение пойдет в БД
+# update содержит только поля своей версии, поэтому полной запись остается,
+# только если версии идут подряд. Опоздавшая (v2 после v3) или пропущенная
+# (v3 после v1) версия помечает запись неполной: поля, изменившиеся только в
+# другой версии, иначе остались бы устаревшими до конца TTL.
+_WRITE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+local version = tonumber(ARGV[1])
+local mode = ARGV[3]
+
+if current then
+    current = tonumber(current)
+    if mode == 'update' and current > version then
+        redis.call('HSET', KEYS[1], 'partial', '1')
+        return 0
+    end
+    if current > version or (mode == 'populate' and current == version) then
+        return 0
+    end
+end
+
+if mode == 'populate' or mode == 'invalidate' then
+    redis.call('DEL', KEYS[1])
+end
+if mode == 'invalidate' or (mode == 'update' and (not current or version > current + 1)) then
+    redis.call('HSET', KEYS[1], 'partial', '1')
+end
+
+redis.call('HSET', KEYS[1], 'version', ARGV[1])
+if #ARGV > 3 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class BalanceCache:
+    """
+    Кэш балансов и профилей пользователей
+    
+    Два уровня: локальный словарь процесса с коротким TTL и Redis.
+    Если Redis недоступен, кэш прозрачно пропускает запросы в Postgres.
+    """
+    
+    def __init__(self, redis, ttl: int = 300, local_ttl: float = 1.0,
+                 local_max_size: int = 10000, retry_interval: float = 5.0,
+                 key_prefix: str = "casino:user:v2:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_max_size = local_max_size
+        self.retry_interval = retry_interval
+        # v2: версии-счетчики row_version меньше прежних версий-моментов
+        # времени, записи старого формата не должны их перекрывать
+        self.key_prefix = key_prefix
+        
+        # user_id -> (истекает, строка)
+        self._local: OrderedDict = OrderedDict()
+        self._write_script = redis.register_script(_WRITE_SCRIPT)
+        self._redis_down_until = 0.0
+        
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+    
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+    
+    def _local_get(self, user_id: int) -> Optional[Dict]:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        
+        expires, row = entry
+        if expires < time.monotonic():
+            del self._local[user_id]
+            return None
+        
+        return row
+    
+    def _local_set(self, user_id: int, row: Dict):
+        self._local[user_id] = (time.monotonic() + self.local_ttl, row)
+        self._local.move_to_end(user_id)
+        
+        while len(self._local) > self.local_max_size:
+            self._local.popitem(last=False)
+    
+    @property
+    def redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_down_until
+    
+    def _redis_failed(self, e: Exception):
+        self.stats["redis_errors"] += 1
+        if self.redis_available:
+            logger.warning(f"Redis недоступен, работаем напрямую с БД: {e}")
+        self._redis_down_until = time.monotonic() + self.retry_interval
+    
+    async def _write(self, user_id: int, version: int, mode: str, fields: Dict):
+        if not self.redis_available:
+            return
+        
+        args = [version, self.ttl, mode]
+        for field, value in fields.items():
+            args.extend((field, "" if value is None else str(value)))
+        
+        try:
+            await self._write_script(keys=[self._key(user_id)], args=args)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._redis_failed(e)
+    
+    @staticmethod
+    def _decode(data: Dict) -> Dict:
+        row = {}
+        for field in PROFILE_FIELDS:
+            value = data.get(field, "")
+            if field in INT_FIELDS:
+                row[field] = int(value or 0)
+            else:
+                row[field] = value or None
+        return row
+    
+    async def get_user(self, user_id: int, loader) -> Optional[Dict]:
+        """
+        Получить строку пользователя (read-through)
+        
+        Args:
+            user_id: ID пользователя
+            loader: Корутина loader(user_id) -> (строка, версия) из БД
+        """
+        row = self._local_get(user_id)
+        if row is not None:
+            self.stats["local_hits"] += 1
+            return row
+        
+        if self.redis_available:
+            try:
+                data = await self.redis.hgetall(self._key(user_id))
+            except (RedisError, OSError, asyncio.TimeoutError) as e:
+                self._redis_failed(e)
+                data = None
+            
+            if data:
+                data = {
+                    (k.decode() if isinstance(k, bytes) else k):
+                    (v.decode() if isinstance(v, bytes) else v)
+                    for k, v in data.items()
+                }
+                if not data.get("partial"):
+                    self.stats["redis_hits"] += 1
+                    row = self._decode(data)
+                    self._local_set(user_id, row)
+                    return row
+        
+        self.stats["misses"] += 1
+        row, version = await loader(user_id)
+        if row is None:
+            return None
+        
+        await self._write(user_id, version, "populate", row)
+        self._local_set(user_id, row)
+        return row
+    
+    async def update(self, user_id: int, version: int, fields: Dict):
+        """Записать изменившиеся поля после изменения строки (write-through)"""
+        row = self._local_get(user_id)
+        if row is not None:
+            self._local_set(user_id, {**row, **fields})
+        
+        await self._write(user_id, version, "update", fields)
+    
+    async def invalidate(self, user_id: int, version: int):
+        """Сбросить запись пользователя"""
+        self._local.pop(user_id, None)
+        await self._write(user_id, version, "invalidate", {})
@@ -1,25 +1,41 @@
 import asyncpg
 import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Версия строки users для кэша: счетчик изменений строки, его увеличивает
+# триггер users_row_version при каждом UPDATE
+ROW_VERSION = "row_version"
+
+# Валюта ставки -> колонка баланса в users
+BALANCE_COLUMNS = {"stars": "stars_balance", "spins": "spins_balance"}
+
 class Database:
     """Класс для работы с базой данных PostgreSQL"""
     
-    def __init__(self, connection_string: str):
+    def __init__(self, connection_string: str, cache=None,
+                 pool_min_size: int = 5, pool_max_size: int = 20):
         self.connection_string = connection_string
         self.pool = None
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        
+        # Кэш балансов и профилей (BalanceCache), необязательный
+        self.cache = cache
+        
+        # Слушатели изменений строки пользователя: listener(user_id, fields)
+        self.row_listeners: List[Callable[[int, Dict], None]] = []
     
     async def connect(self):
         """Подключиться к базе данных"""
         if not self.pool:
             self.pool = await asyncpg.create_pool(
                 self.connection_string,
-                min_size=5,
-                max_size=20,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
                 command_timeout=60
             )
             logger.info("Подключено к базе данных")
@@ -55,6 +71,24 @@ class Database:
             )
         ''')
         
+        # Версия строки для кэша балансов (cache.py). Версия меняется в той
+        # же транзакции, что и строка, поэтому чтение до фиксации списания
+        # получает старую версию и не перетирает в кэше новый баланс
+        await self.pool.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT 1')
+        await self.pool.execute('''
+            CREATE OR REPLACE FUNCTION users_bump_row_version() RETURNS trigger AS $$
+            BEGIN
+                NEW.row_version := OLD.row_version + 1;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        await self.pool.execute('''
+            CREATE OR REPLACE TRIGGER users_row_version
+            BEFORE UPDATE ON users
+            FOR EACH ROW EXECUTE FUNCTION users_bump_row_version()
+        ''')
+        
         # Таблица истории игр Моно
         await self.pool.execute('''
             CREATE TABLE IF NOT EXISTS mono_history (
@@ -92,23 +126,359 @@ class Database:
             )
         ''')
         
+        # Строки отчетов платежных провайдеров (для сверки)
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS provider_reports (
+                report_row_id BIGSERIAL PRIMARY KEY,
+                provider VARCHAR(50) NOT NULL,
+                source_file VARCHAR(255) NOT NULL,
+                line_no BIGINT NOT NULL,
+                provider_payment_id VARCHAR(255),
+                amount INTEGER,
+                currency VARCHAR(10),
+                status VARCHAR(50),
+                paid_at TIMESTAMP,
+                imported_at TIMESTAMP DEFAULT NOW(),
+                row_hash VARCHAR(64)
+            )
+        ''')
+        
+        # Повторы строк отсекаются по содержимому (row_hash), а не по имени
+        # файла: провайдер может выгружать отчеты под одним именем.
+        # Строки, загруженные до появления row_hash, получают его здесь
+        await self.pool.execute('ALTER TABLE provider_reports ADD COLUMN IF NOT EXISTS row_hash VARCHAR(64)')
+        await self.pool.execute('''
+            UPDATE provider_reports p
+            SET row_hash = h.row_hash
+            FROM (
+                SELECT report_row_id,
+                       md5(ROW(provider_payment_id, amount, currency, status, paid_at)::text)
+                       || ':' || ROW_NUMBER() OVER (
+                           PARTITION BY provider, provider_payment_id, amount, currency, status, paid_at
+                           ORDER BY report_row_id
+                       ) AS row_hash
+                FROM provider_reports
+                WHERE row_hash IS NULL
+            ) h
+            WHERE p.report_row_id = h.report_row_id
+        ''')
+        await self.pool.execute('ALTER TABLE provider_reports DROP CONSTRAINT IF EXISTS provider_reports_provider_source_file_line_no_key')
+        await self.pool.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_provider_reports_row_hash
+            ON provider_reports(provider, row_hash)
+        ''')
+        
+        # Расхождения, найденные при сверке
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS reconciliation_mismatches (
+                mismatch_id BIGSERIAL PRIMARY KEY,
+                provider VARCHAR(50) NOT NULL,
+                kind VARCHAR(30) NOT NULL,
+                provider_payment_id VARCHAR(255) NOT NULL,
+                payment_id INTEGER,
+                report_amount INTEGER,
+                db_amount INTEGER,
+                report_count INTEGER,
+                detected_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE (provider, kind, provider_payment_id)
+            )
+        ''')
+        
+        # Позиция инкрементальной сверки по провайдеру
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS reconciliation_checkpoints (
+                provider VARCHAR(50) PRIMARY KEY,
+                last_report_row_id BIGINT DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        # Журнал расчетов игр: пишется вместе с изменением баланса,
+        # история, статистика и лидерборды обновляются потребителями (events.py).
+        # txid - транзакция записи: потребители читают журнал в порядке
+        # (txid, event_id) и только завершенные транзакции, поэтому не
+        # пропускают события, зафиксированные не в порядке event_id
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS settlement_events (
+                event_id BIGSERIAL PRIMARY KEY,
+                txid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint,
+                game VARCHAR(20) NOT NULL,
+                user_id BIGINT NOT NULL,
+                bet_stars NUMERIC(14,2) NOT NULL,
+                win_stars NUMERIC(14,2) NOT NULL,
+                multiplier NUMERIC(10,2) NOT NULL DEFAULT 0,
+                details JSONB,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        # Позиции потребителей журнала расчетов
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS event_consumers (
+                name VARCHAR(50) PRIMARY KEY,
+                last_txid BIGINT NOT NULL DEFAULT 0,
+                last_event_id BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        # События, на которых потребитель падал MAX_ATTEMPTS раз подряд:
+        # позиция сдвинута за них, повторить - events.py replay
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS event_dead_letters (
+                id BIGSERIAL PRIMARY KEY,
+                consumer VARCHAR(50) NOT NULL,
+                event_id BIGINT NOT NULL,
+                txid BIGINT NOT NULL,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE (consumer, event_id)
+            )
+        ''')
+        
+        # Инвентарь (inventory.py): NFT, бусты и полезные предметы игроков.
+        # Каталог NFT хранится в InventorySystem, здесь только владение
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS user_nfts (
+                id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                nft_id INTEGER NOT NULL,
+                acquired_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS user_boosters (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                type VARCHAR(50) NOT NULL,
+                value NUMERIC(10,2) NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT FALSE,
+                activated_at TIMESTAMP,
+                expires_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS user_items (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                item_type VARCHAR(50) NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS inventory_history (
+                id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                action VARCHAR(50) NOT NULL,
+                item_type VARCHAR(50),
+                item_id INTEGER,
+                item_name VARCHAR(255),
+                quantity INTEGER DEFAULT 1,
+                metadata JSONB,
+                source_user_id BIGINT,
+                target_user_id BIGINT,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        # Счетчики достижений игрока (achievements.py): обновляются по
+        # событиям журнала, позиция (last_txid, last_event_id) отсекает повторы
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS achievement_progress (
+                user_id BIGINT PRIMARY KEY,
+                counters JSONB NOT NULL DEFAULT '{}',
+                achievements TEXT[] NOT NULL DEFAULT '{}',
+                day DATE,
+                daily TEXT[] NOT NULL DEFAULT '{}',
+                last_txid BIGINT NOT NULL DEFAULT 0,
+                last_event_id BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
+        # Полученные достижения и ежедневные бонусы (day - день бонуса)
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS user_achievements (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                achievement_id VARCHAR(50) NOT NULL,
+                day DATE,
+                reward_stars INTEGER NOT NULL DEFAULT 0,
+                event_id BIGINT,
+                unlocked_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE NULLS NOT DISTINCT (user_id, achievement_id, day)
+            )
+        ''')
+        
+        # Повторная обработка событий не дублирует историю и статистику
+        await self.pool.execute('ALTER TABLE mono_history ADD COLUMN IF NOT EXISTS event_id BIGINT')
+        await self.pool.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS last_stats_event_id BIGINT DEFAULT 0')
+        
+        # Журнал читается в порядке (txid, event_id), поэтому и отметки
+        # примененных событий - пары. Старые отметки получают txid своего события
+        await self.pool.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS last_stats_txid BIGINT NOT NULL DEFAULT 0')
+        await self.pool.execute('ALTER TABLE achievement_progress ADD COLUMN IF NOT EXISTS last_txid BIGINT NOT NULL DEFAULT 0')
+        await self.pool.execute('''
+            UPDATE users u SET last_stats_txid = e.txid
+            FROM settlement_events e
+            WHERE e.event_id = u.last_stats_event_id
+              AND u.last_stats_txid = 0 AND u.last_stats_event_id > 0
+        ''')
+        await self.pool.execute('''
+            UPDATE achievement_progress p SET last_txid = e.txid
+            FROM settlement_events e
+            WHERE e.event_id = p.last_event_id
+              AND p.last_txid = 0 AND p.last_event_id > 0
+        ''')
+        
+        # Сводки статистики по часам и дням (rollups.py)
+        for unit in ("hourly", "daily"):
+            await self.pool.execute(f'''
+                CREATE TABLE IF NOT EXISTS stats_{unit}_games (
+                    bucket TIMESTAMP NOT NULL,
+                    game VARCHAR(20) NOT NULL,
+                    games INTEGER NOT NULL,
+                    wins INTEGER NOT NULL,
+                    wagered_stars BIGINT NOT NULL,
+                    won_stars BIGINT NOT NULL,
+                    nfts INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, game)
+                )
+            ''')
+            await self.pool.execute(f'''
+                CREATE TABLE IF NOT EXISTS stats_{unit}_payments (
+                    bucket TIMESTAMP NOT NULL,
+                    product_type VARCHAR(50),
+                    currency VARCHAR(10),
+                    payments INTEGER NOT NULL,
+                    amount BIGINT NOT NULL,
+                    product_amount BIGINT NOT NULL
+                )
+            ''')
+            await self.pool.execute(f'''
+                CREATE TABLE IF NOT EXISTS stats_{unit}_users (
+                    bucket TIMESTAMP PRIMARY KEY,
+                    new_users INTEGER NOT NULL
+                )
+            ''')
+            await self.pool.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_stats_{unit}_payments_bucket
+                ON stats_{unit}_payments(bucket)
+            ''')
+        
+        # Активные игроки по дням: уникальные значения не суммируются по часам
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS stats_daily_active_users (
+                bucket TIMESTAMP NOT NULL,
+                user_id BIGINT NOT NULL,
+                PRIMARY KEY (bucket, user_id)
+            )
+        ''')
+        
+        # Позиция сворачивания сводок: все часы до last_hour свернуты
+        await self.pool.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_checkpoints (
+                name VARCHAR(50) PRIMARY KEY,
+                last_hour TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        ''')
+        
         # Индексы
         await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_mono_history_created_at ON mono_history(created_at)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments(created_at)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_settlement_events_position ON settlement_events(txid, event_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_settlement_events_created_at ON settlement_events(created_at)')
+        await self.pool.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_mono_history_event_id ON mono_history(event_id)')
         await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_mono_history_user_id ON mono_history(user_id, created_at)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_user_nfts_user_id ON user_nfts(user_id, nft_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_user_boosters_user_id ON user_boosters(user_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_user_items_user_id ON user_items(user_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_inventory_history_user_id ON inventory_history(user_id, created_at)')
         await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_payments_user_id ON payments(user_id, created_at)')
+        await self._create_charge_id_index()
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_payments_provider_payment_id ON payments(provider, provider_payment_id)')
+        await self.pool.execute('CREATE INDEX IF NOT EXISTS idx_provider_reports_payment_id ON provider_reports(provider, provider_payment_id)')
+    
+    async def _create_charge_id_index(self):
+        """
+        Уникальный индекс по telegram_payment_charge_id
+        
+        Повторы платежа, записанные до индекса (двойное начисление), не дали
+        бы его создать: они переносятся в payment_duplicates для разбора
+        владельцем, в payments остается самая ранняя строка.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                exists = await conn.fetchval(
+                    "SELECT to_regclass('idx_payments_telegram_charge_id') IS NOT NULL"
+                )
+                if exists:
+                    return
+                
+                await conn.execute('''
+                    CREATE TABLE IF NOT EXISTS payment_duplicates (
+                        LIKE payments,
+                        detected_at TIMESTAMP DEFAULT NOW()
+                    )
+                ''')
+                moved = await conn.fetch('''
+                    WITH duplicates AS (
+                        DELETE FROM payments
+                        WHERE payment_id IN (
+                            SELECT payment_id FROM (
+                                SELECT payment_id, ROW_NUMBER() OVER (
+                                    PARTITION BY telegram_payment_charge_id
+                                    ORDER BY created_at, payment_id
+                                ) AS copy
+                                FROM payments
+                                WHERE telegram_payment_charge_id IS NOT NULL
+                            ) AS numbered
+                            WHERE copy > 1
+                        )
+                        RETURNING *
+                    )
+                    INSERT INTO payment_duplicates
+                    SELECT * FROM duplicates
+                    RETURNING payment_id, user_id, telegram_payment_charge_id
+                ''')
+                if moved:
+                    logger.warning(
+                        f"Повторы платежей перенесены в payment_duplicates "
+                        f"({len(moved)}): {[row['payment_id'] for row in moved]}"
+                    )
+                
+                await conn.execute('''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_telegram_charge_id
+                    ON payments(telegram_payment_charge_id)
+                ''')
     
     async def register_user(self, user_id: int, username: str, first_name: str) -> bool:
         """Зарегистрировать нового пользователя"""
         try:
-            await self.pool.execute('''
+            row = await self.pool.fetchrow(f'''
                 INSERT INTO users (user_id, username, first_name)
                 VALUES ($1, $2, $3)
                 ON CONFLICT (user_id) DO UPDATE
                 SET username = EXCLUDED.username,
                     first_name = EXCLUDED.first_name,
                     updated_at = NOW()
+                RETURNING {ROW_VERSION}
             ''', user_id, username, first_name)
             
+            if row:
+                await self._row_changed(user_id, row['row_version'], {
+                    "username": username,
+                    "first_name": first_name
+                })
+            
             logger.info(f"Пользователь зарегистрирован: {user_id}")
             return True
             
@@ -116,8 +486,68 @@ class Database:
             logger.error(f"Ошибка регистрации пользователя {user_id}: {e}")
             return False
     
+    async def _row_changed(self, user_id: int, version: int, fields: Dict):
+        """Передать изменившиеся поля пользователя в кэш и слушателям"""
+        if self.cache:
+            await self.cache.update(user_id, version, fields)
+        
+        for listener in self.row_listeners:
+            try:
+                listener(user_id, fields)
+            except Exception as e:
+                logger.error(f"Ошибка слушателя изменений пользователя {user_id}: {e}")
+    
+    async def get_user_row(self, user_id: int) -> Optional[Dict]:
+        """Получить строку пользователя (через кэш, если он подключен)"""
+        if self.cache:
+            return await self.cache.get_user(user_id, self._load_user_row)
+        
+        row, _ = await self._load_user_row(user_id)
+        return row
+    
+    async def _load_user_row(self, user_id: int):
+        """Прочитать строку пользователя из БД вместе с ее версией"""
+        row = await self.pool.fetchrow(f'''
+            SELECT username, first_name, stars_balance, spins_balance,
+                   total_deposited, total_withdrawn, total_won, total_games,
+                   created_at, {ROW_VERSION}
+            FROM users WHERE user_id = $1
+        ''', user_id)
+        
+        if not row:
+            return None, 0
+        
+        user = dict(row)
+        version = user.pop('row_version')
+        if user['created_at']:
+            user['created_at'] = user['created_at'].isoformat()
+        
+        return user, version
+    
+    async def iter_user_ids(self, batch_size: int = 1000) -> AsyncIterator[List[int]]:
+        """Все ID пользователей порциями (постранично по первичному ключу)"""
+        last_id = 0
+        while True:
+            rows = await self.pool.fetch('''
+                SELECT user_id FROM users
+                WHERE user_id > $1
+                ORDER BY user_id
+                LIMIT $2
+            ''', last_id, batch_size)
+            
+            if not rows:
+                return
+            
+            user_ids = [row['user_id'] for row in rows]
+            yield user_ids
+            last_id = user_ids[-1]
+    
     async def get_stars_balance(self, user_id: int) -> int:
         """Получить баланс stars"""
+        if self.cache:
+            user = await self.get_user_row(user_id)
+            return user['stars_balance'] if user else 0
+        
         row = await self.pool.fetchrow('''
             SELECT stars_balance FROM users WHERE user_id = $1
         ''', user_id)
@@ -126,6 +556,10 @@ class Database:
     
     async def get_spins_balance(self, user_id: int) -> int:
         """Получить баланс спинов"""
+        if self.cache:
+            user = await self.get_user_row(user_id)
+            return user['spins_balance'] if user else 0
+        
         row = await self.pool.fetchrow('''
             SELECT spins_balance FROM users WHERE user_id = $1
         ''', user_id)
@@ -135,20 +569,20 @@ class Database:
     async def update_stars_balance(self, user_id: int, amount: int) -> bool:
         """Обновить баланс stars"""
         try:
-            await self.pool.execute('''
+            row = await self.pool.fetchrow(f'''
                 UPDATE users 
                 SET stars_balance = stars_balance + $2,
+                    total_deposited = total_deposited + GREATEST($2, 0),
                     updated_at = NOW()
                 WHERE user_id = $1
+                RETURNING stars_balance, total_deposited, {ROW_VERSION}
             ''', user_id, amount)
             
-            if amount > 0:
-                await self.pool.execute('''
-                    UPDATE users 
-                    SET total_deposited = total_deposited + $2,
-                        updated_at = NOW()
-                    WHERE user_id = $1
-                ''', user_id, amount)
+            if row:
+                await self._row_changed(user_id, row['row_version'], {
+                    "stars_balance": row['stars_balance'],
+                    "total_deposited": row['total_deposited']
+                })
             
             logger.info(f"Баланс stars обновлен: {user_id} +{amount}")
             return True
@@ -160,13 +594,19 @@ class Database:
     async def update_spins_balance(self, user_id: int, amount: int) -> bool:
         """Обновить баланс спинов"""
         try:
-            await self.pool.execute('''
+            row = await self.pool.fetchrow(f'''
                 UPDATE users 
                 SET spins_balance = spins_balance + $2,
                     updated_at = NOW()
                 WHERE user_id = $1
+                RETURNING spins_balance, {ROW_VERSION}
             ''', user_id, amount)
             
+            if row:
+                await self._row_changed(user_id, row['row_version'], {
+                    "spins_balance": row['spins_balance']
+                })
+            
             logger.info(f"Баланс спинов обновлен: {user_id} +{amount}")
             return True
             
@@ -174,6 +614,189 @@ class Database:
             logger.error(f"Ошибка обновления баланса спинов {user_id}: {e}")
             return False
     
+    async def settle(self, user_id: int, game: str, currency: str, stake: float,
+                     delta: float, bet_stars: float, win_stars: float,
+                     multiplier: float, details: Dict,
+                     nft_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        Расчет игры: изменение баланса и событие журнала одним запросом
+        
+        Баланс меняется, только если на нем есть stake. История, статистика
+        и лидерборды обновляются потребителями журнала (events.py).
+        
+        Args:
+            currency: "stars" или "spins" - какой баланс меняется
+            stake: Сколько должно быть на балансе для ставки
+            delta: Изменение баланса (выигрыш минус ставка)
+            details: Поля игры для истории (JSON)
+            nft_id: NFT, выдаваемый вместе с расчетом (в том же запросе)
+        
+        Returns:
+            event_id и новые балансы или None, если баланса не хватило
+        """
+        column = BALANCE_COLUMNS[currency]
+        
+        row = await self.pool.fetchrow(f'''
+            WITH updated AS (
+                UPDATE users
+                SET {column} = {column} + $3::numeric,
+                    updated_at = NOW()
+                WHERE user_id = $1 AND {column} >= $2::numeric
+                RETURNING stars_balance, spins_balance, {ROW_VERSION}
+            ), event AS (
+                INSERT INTO settlement_events
+                (game, user_id, bet_stars, win_stars, multiplier, details)
+                SELECT $4, $1, $5, $6, $7, $8::jsonb
+                FROM updated
+                RETURNING event_id
+            ), nft AS (
+                INSERT INTO user_nfts (user_id, nft_id)
+                SELECT $1, $9::int
+                FROM updated
+                WHERE $9::int IS NOT NULL
+            )
+            SELECT e.event_id, u.stars_balance, u.spins_balance, u.row_version
+            FROM updated u, event e
+        ''', user_id, stake, delta, game, bet_stars, win_stars, multiplier,
+            json.dumps(details), nft_id)
+        
+        if row is None:
+            return None
+        
+        await self._row_changed(user_id, row['row_version'], {
+            "stars_balance": row['stars_balance'],
+            "spins_balance": row['spins_balance']
+        })
+        return dict(row)
+    
+    async def get_user_nft_ids(self, user_id: int) -> List[int]:
+        """ID NFT пользователя (повторяются, если копий несколько)"""
+        rows = await self.pool.fetch('''
+            SELECT nft_id FROM user_nfts
+            WHERE user_id = $1
+            ORDER BY acquired_at
+        ''', user_id)
+        return [row['nft_id'] for row in rows]
+    
+    async def get_nft_acquisition_date(self, user_id: int, nft_id: int) -> Optional[datetime]:
+        """Когда пользователь получил NFT (первую копию)"""
+        return await self.pool.fetchval('''
+            SELECT MIN(acquired_at) FROM user_nfts
+            WHERE user_id = $1 AND nft_id = $2
+        ''', user_id, nft_id)
+    
+    async def add_user_nft(self, user_id: int, nft_id: int) -> bool:
+        """Добавить NFT пользователю"""
+        row = await self.pool.fetchrow('''
+            INSERT INTO user_nfts (user_id, nft_id)
+            VALUES ($1, $2)
+            RETURNING id
+        ''', user_id, nft_id)
+        return row is not None
+    
+    async def remove_user_nft(self, user_id: int, nft_id: int) -> bool:
+        """
+        Удалить одну копию NFT у пользователя
+        
+        Returns:
+            False, если NFT у пользователя нет (например, его уже продали
+            параллельным запросом)
+        """
+        row = await self.pool.fetchrow('''
+            DELETE FROM user_nfts
+            WHERE id = (
+                SELECT id FROM user_nfts
+                WHERE user_id = $1 AND nft_id = $2
+                ORDER BY acquired_at DESC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+        ''', user_id, nft_id)
+        return row is not None
+    
+    async def get_user_boosters(self, user_id: int) -> List[Dict]:
+        """Бусты пользователя, кроме истекших"""
+        rows = await self.pool.fetch('''
+            SELECT id, type, value, is_active, expires_at
+            FROM user_boosters
+            WHERE user_id = $1 AND (expires_at IS NULL OR expires_at > NOW())
+            ORDER BY created_at
+        ''', user_id)
+        return [dict(row) for row in rows]
+    
+    async def get_user_booster(self, user_id: int, booster_id: int) -> Optional[Dict]:
+        """Буст пользователя по ID"""
+        row = await self.pool.fetchrow('''
+            SELECT id, type, value, is_active, expires_at
+            FROM user_boosters
+            WHERE id = $1 AND user_id = $2
+        ''', booster_id, user_id)
+        return dict(row) if row else None
+    
+    async def activate_booster(self, user_id: int, booster_id: int) -> bool:
+        """Активировать буст; False, если он уже активен или не найден"""
+        row = await self.pool.fetchrow('''
+            UPDATE user_boosters
+            SET is_active = TRUE, activated_at = NOW()
+            WHERE id = $1 AND user_id = $2 AND NOT is_active
+            RETURNING id
+        ''', booster_id, user_id)
+        return row is not None
+    
+    async def get_user_utility_items(self, user_id: int) -> List[Dict]:
+        """Полезные предметы пользователя (ключи, сундуки, пропуски)"""
+        rows = await self.pool.fetch('''
+            SELECT item_type AS type, SUM(quantity)::int AS quantity
+            FROM user_items
+            WHERE user_id = $1
+            GROUP BY item_type
+            HAVING SUM(quantity) > 0
+            ORDER BY item_type
+        ''', user_id)
+        return [dict(row) for row in rows]
+    
+    async def add_inventory_history(self, user_id: int, action: str, item_type: str,
+                                    item_id: int, item_name: str, quantity: int = 1,
+                                    metadata: Optional[Dict] = None,
+                                    source_user_id: Optional[int] = None,
+                                    target_user_id: Optional[int] = None):
+        """Добавить запись в историю инвентаря"""
+        await self.pool.execute('''
+            INSERT INTO inventory_history
+            (user_id, action, item_type, item_id, item_name, quantity, metadata,
+             source_user_id, target_user_id)
+            VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, $8, $9)
+        ''', user_id, action, item_type, item_id, item_name, quantity,
+            json.dumps(metadata) if metadata is not None else None,
+            source_user_id, target_user_id)
+    
+    async def get_inventory_history(self, user_id: int, limit: int = 20) -> List[Dict]:
+        """Последние записи истории инвентаря"""
+        rows = await self.pool.fetch('''
+            SELECT action, item_type, item_id, item_name, quantity, metadata,
+                   source_user_id, target_user_id, created_at
+            FROM inventory_history
+            WHERE user_id = $1
+            ORDER BY created_at DESC
+            LIMIT $2
+        ''', user_id, limit)
+        return [
+            {**dict(row), "metadata": json.loads(row['metadata']) if row['metadata'] else None}
+            for row in rows
+        ]
+    
+    async def get_user_achievements(self, user_id: int) -> List[Dict]:
+        """Достижения пользователя (без ежедневных бонусов)"""
+        rows = await self.pool.fetch('''
+            SELECT achievement_id, reward_stars, unlocked_at
+            FROM user_achievements
+            WHERE user_id = $1 AND day IS NULL
+            ORDER BY unlocked_at
+        ''', user_id)
+        
+        return [dict(row) for row in rows]
+    
     async def add_mono_history(self, user_id: int, chance: int, bet_spins: int, 
                               bet_stars: int, win_number: int, won: bool,
                               win_spins: float, win_stars: int, multiplier: float,
@@ -188,13 +811,20 @@ class Database:
             win_spins, win_stars, multiplier, nft_awarded, min_bet_required)
         
         # Обновляем статистику пользователя
-        await self.pool.execute('''
+        row = await self.pool.fetchrow(f'''
             UPDATE users 
             SET total_games = total_games + 1,
                 total_won = total_won + $2,
                 updated_at = NOW()
             WHERE user_id = $1
+            RETURNING total_games, total_won, {ROW_VERSION}
         ''', user_id, win_stars)
+        
+        if row:
+            await self._row_changed(user_id, row['row_version'], {
+                "total_games": row['total_games'],
+                "total_won": row['total_won']
+            })
     
     async def add_payment(self, user_id: int, amount: int, currency: str, 
                          provider: str, provider_payment_id: str,
@@ -215,6 +845,64 @@ class Database:
         
         return row['payment_id'] if row else 0
     
+    async def add_payment_and_credit(self, user_id: int, amount: int, currency: str,
+                                     provider: str, provider_payment_id: str,
+                                     telegram_payment_charge_id: str, status: str,
+                                     product_type: str, product_amount: int,
+                                     invoice_payload: str) -> Optional[Dict]:
+        """
+        Сохранить платеж и начислить продукт одним запросом
+        
+        Повторная доставка того же telegram_payment_charge_id ничего не
+        меняет благодаря уникальному индексу и ON CONFLICT DO NOTHING.
+        
+        Returns:
+            Запись о платеже с новыми балансами или None, если платеж
+            уже был обработан
+        """
+        row = await self.pool.fetchrow(f'''
+            WITH inserted AS (
+                INSERT INTO payments 
+                (user_id, amount, currency, provider, provider_payment_id,
+                 telegram_payment_charge_id, status, product_type, product_amount,
+                 invoice_payload)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+                ON CONFLICT (telegram_payment_charge_id) DO NOTHING
+                RETURNING payment_id, user_id, product_type, product_amount
+            ), credited AS (
+                UPDATE users u
+                SET stars_balance = u.stars_balance + CASE WHEN i.product_type = 'stars'
+                                                         THEN i.product_amount ELSE 0 END,
+                    spins_balance = u.spins_balance + CASE WHEN i.product_type = 'spins'
+                                                         THEN i.product_amount ELSE 0 END,
+                    total_deposited = u.total_deposited + CASE WHEN i.product_type = 'stars'
+                                                             THEN i.product_amount ELSE 0 END,
+                    updated_at = NOW()
+                FROM inserted i
+                WHERE u.user_id = i.user_id
+                RETURNING u.stars_balance, u.spins_balance, u.total_deposited,
+                          {ROW_VERSION}
+            )
+            SELECT i.payment_id, i.product_type, i.product_amount,
+                   c.stars_balance, c.spins_balance, c.total_deposited, c.row_version
+            FROM inserted i
+            LEFT JOIN credited c ON TRUE
+        ''', user_id, amount, currency, provider, provider_payment_id,
+            telegram_payment_charge_id, status, product_type, product_amount,
+            invoice_payload)
+        
+        if row:
+            logger.info(f"Платеж {row['payment_id']} зачислен: {user_id} +{product_amount} {product_type}")
+            
+            if row['row_version'] is not None:
+                await self._row_changed(user_id, row['row_version'], {
+                    "stars_balance": row['stars_balance'],
+                    "spins_balance": row['spins_balance'],
+                    "total_deposited": row['total_deposited']
+                })
+        
+        return dict(row) if row else None
+    
     async def get_payment_by_telegram_id(self, telegram_payment_charge_id: str) -> Optional[Dict]:
         """Получить платеж по telegram ID"""
         row = await self.pool.fetchrow('''
@@ -0,0 +1,444 @@
+"""
+Журнал расчетов игр и его потребители
+
+Игра в одном запросе меняет баланс и пишет событие в settlement_events
+(Database.settle). Все остальное - история, статистика игроков,
+лидерборды, уведомления, достижения - делают потребители пачками в фоне:
+
+  - позиция каждого потребителя хранится в event_consumers и сдвигается
+    в той же транзакции, в которой потребитель обработал пачку, поэтому
+    изменения в Postgres применяются ровно один раз;
+  - журнал читается в порядке (txid, event_id) и только из завершенных
+    транзакций: событие, зафиксированное позже события с большим
+    event_id, не будет пропущено;
+  - потребителя можно перемотать на любое событие и обработать журнал
+    заново - потребители пропускают уже примененные события;
+  - пачка с ошибкой повторяется по одному событию: событие, на котором
+    потребитель падает MAX_ATTEMPTS раз подряд, записывается в
+    event_dead_letters, и позиция сдвигается за него.
+
+Состояние и перемотка из командной строки:
+    python events.py status
+    python events.py replay history 12345
+"""
+import json
+import time
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Пауза после ошибки потребителя перед повтором пачки, секунды
+RETRY_DELAY = 5.0
+
+# Ошибок подряд на одном событии до его переноса в event_dead_letters
+MAX_ATTEMPTS = 3
+
+
+async def read_events(conn, after: tuple, limit: int) -> List[Dict]:
+    """
+    События после позиции after = (txid, event_id)
+    
+    Транзакции с txid не меньше xmin текущего снимка еще могут
+    зафиксироваться, их события откладываются до следующего чтения.
+    """
+    rows = await conn.fetch('''
+        SELECT event_id, txid, game, user_id, bet_stars, win_stars, multiplier,
+               details, created_at
+        FROM settlement_events
+        WHERE (txid, event_id) > ($1, $2)
+          AND txid < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+        ORDER BY txid, event_id
+        LIMIT $3
+    ''', after[0], after[1], limit)
+    
+    return [
+        {
+            **dict(row),
+            "bet_stars": float(row['bet_stars']),
+            "win_stars": float(row['win_stars']),
+            "multiplier": float(row['multiplier']),
+            "details": json.loads(row['details']) if row['details'] else {}
+        }
+        for row in rows
+    ]
+
+
+class Consumer:
+    """
+    Потребитель журнала расчетов
+    
+    handle вызывается в транзакции, в которой сдвигается позиция;
+    committed - после ее фиксации (кэш, события для клиентов).
+    """
+    
+    name = "consumer"
+    batch_size = 500
+    
+    async def handle(self, conn, events: List[Dict]):
+        raise NotImplementedError
+    
+    async def committed(self, events: List[Dict]):
+        pass
+
+
+class HistoryConsumer(Consumer):
+    """История игр Моно и счетчики игр и выигрышей в users"""
+    
+    name = "history"
+    
+    def __init__(self, db):
+        self.db = db
+        self._changed: List[Dict] = []
+    
+    async def handle(self, conn, events: List[Dict]):
+        event_ids = [event["event_id"] for event in events]
+        
+        # event_id уникален в mono_history: повтор пачки ничего не добавит
+        await conn.execute('''
+            INSERT INTO mono_history
+            (event_id, user_id, chance, bet_spins, bet_stars, win_number, won,
+             win_spins, win_stars, multiplier, nft_awarded, min_bet_required, created_at)
+            SELECT e.event_id, e.user_id,
+                   (e.details->>'chance')::int,
+                   (e.details->>'bet_spins')::int,
+                   e.bet_stars,
+                   (e.details->>'win_number')::int,
+                   (e.details->>'won')::boolean,
+                   (e.details->>'win_spins')::numeric,
+                   e.win_stars,
+                   e.multiplier,
+                   COALESCE((e.details->>'nft_awarded')::boolean, FALSE),
+                   (e.details->>'min_bet_required')::int,
+                   e.created_at
+            FROM settlement_events e
+            WHERE e.event_id = ANY($1::bigint[]) AND e.game = 'mono'
+            ON CONFLICT (event_id) DO NOTHING
+        ''', event_ids)
+        
+        # Журнал идет в порядке (txid, event_id): отметка последнего
+        # учтенного события игрока - та же пара, она отсекает повторы
+        rows = await conn.fetch('''
+            UPDATE users u
+            SET total_games = u.total_games + s.games,
+                total_won = u.total_won + s.won,
+                last_stats_txid = s.last[1],
+                last_stats_event_id = s.last[2],
+                updated_at = NOW()
+            FROM (
+                SELECT e.user_id, COUNT(*) AS games,
+                       ROUND(SUM(e.win_stars))::int AS won,
+                       MAX(ARRAY[e.txid, e.event_id]) AS last
+                FROM settlement_events e
+                JOIN users x ON x.user_id = e.user_id
+                WHERE e.event_id = ANY($1::bigint[])
+                  AND (e.txid, e.event_id) > (x.last_stats_txid, COALESCE(x.last_stats_event_id, 0))
+                GROUP BY e.user_id
+            ) s
+            WHERE u.user_id = s.user_id
+            RETURNING u.user_id, u.total_games, u.total_won, u.row_version
+        ''', event_ids)
+        self._changed = [dict(row) for row in rows]
+    
+    async def committed(self, events: List[Dict]):
+        changed, self._changed = self._changed, []
+        for row in changed:
+            await self.db._row_changed(row['user_id'], row['row_version'], {
+                "total_games": row['total_games'],
+                "total_won": row['total_won']
+            })
+
+
+class LeaderboardConsumer(Consumer):
+    """
+    Лидерборды Redis
+    
+    Позиция последнего примененного события хранится в Redis и меняется
+    в той же транзакции MULTI, что и лидерборды: после сбоя между Redis
+    и Postgres пачка применяется повторно без двойного учета.
+    """
+    
+    name = "leaderboard"
+    
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+        self.position_key = f"{leaderboard.key_prefix}position"
+    
+    async def handle(self, conn, events: List[Dict]):
+        redis = self.leaderboard.redis
+        
+        stored = await redis.get(self.position_key)
+        if isinstance(stored, bytes):
+            stored = stored.decode()
+        applied = tuple(int(part) for part in stored.split(":")) if stored else (0, 0)
+        fresh = [event for event in events if (event["txid"], event["event_id"]) > applied]
+        if not fresh:
+            return
+        
+        pipe = redis.pipeline(transaction=True)
+        for event in fresh:
+            self.leaderboard.add_settlement(
+                pipe, event["user_id"], event["game"], event["bet_stars"],
+                event["win_stars"], event["multiplier"], event["created_at"]
+            )
+        last = fresh[-1]
+        pipe.set(self.position_key, f"{last['txid']}:{last['event_id']}")
+        await pipe.execute()
+
+
+class NotificationConsumer(Consumer):
+    """
+    Крупные выигрыши - всем игрокам в WebApp
+    
+    События старше max_age не объявляются: перемотка журнала не
+    повторяет старые уведомления.
+    """
+    
+    name = "notifications"
+    
+    def __init__(self, push, min_multiplier: float = 10, min_win_stars: float = 10000,
+                 max_age: float = 300):
+        self.push = push
+        self.min_multiplier = min_multiplier
+        self.min_win_stars = min_win_stars
+        self.max_age = timedelta(seconds=max_age)
+        self._pending: List[Dict] = []
+    
+    async def handle(self, conn, events: List[Dict]):
+        # created_at пишется часами БД (TIMESTAMP без зоны): возраст события
+        # считаем по ним же, а не по часам и часовому поясу процесса
+        now = await conn.fetchval('SELECT LOCALTIMESTAMP')
+        self._pending = [
+            event for event in events
+            if now - event["created_at"] <= self.max_age
+            and (event["multiplier"] >= self.min_multiplier
+                 or event["win_stars"] >= self.min_win_stars)
+        ]
+    
+    async def committed(self, events: List[Dict]):
+        pending, self._pending = self._pending, []
+        for event in pending:
+            self.push.round_event({
+                "event": "big_win",
+                "game": event["game"],
+                "multiplier": event["multiplier"],
+                "win_stars": event["win_stars"]
+            })
+
+
+class EventPipeline:
+    """Фоновая обработка журнала расчетов пачками"""
+    
+    def __init__(self, db, consumers: Sequence[Consumer] = (), poll_interval: float = 1.0):
+        self.db = db
+        self.consumers: List[Consumer] = list(consumers)
+        self.poll_interval = poll_interval
+        
+        # Обработано и отложено в event_dead_letters по потребителям с запуска
+        self.processed: Dict[str, int] = {}
+        self.dead_lettered: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        # Потребители, идущие по журналу по одному событию после ошибки
+        # пачки: [ошибок подряд, событий до возврата к пачкам]
+        self._isolating: Dict[str, List[int]] = {}
+        self._running = False
+    
+    def add(self, consumer: Consumer):
+        self.consumers.append(consumer)
+    
+    async def process(self, consumer: Consumer, limit: Optional[int] = None) -> int:
+        """Обработать одну пачку (не больше limit событий); возвращает число событий"""
+        async with self.db.pool.acquire() as conn:
+            async with conn.transaction():
+                events = await read_events(
+                    conn, await self._lock_position(conn, consumer), limit or consumer.batch_size
+                )
+                if not events:
+                    return 0
+                
+                await consumer.handle(conn, events)
+                await self._advance(conn, consumer, events[-1])
+        
+        # Позиция уже сдвинута: ошибка здесь не повторяет пачку
+        try:
+            await consumer.committed(events)
+        except Exception as e:
+            logger.error(f"Ошибка потребителя {consumer.name} после фиксации: {e}")
+        
+        self.processed[consumer.name] = self.processed.get(consumer.name, 0) + len(events)
+        return len(events)
+    
+    async def dead_letter(self, consumer: Consumer, error: str) -> Optional[int]:
+        """Перенести следующее событие потребителя в event_dead_letters и пропустить его"""
+        async with self.db.pool.acquire() as conn:
+            async with conn.transaction():
+                events = await read_events(conn, await self._lock_position(conn, consumer), 1)
+                if not events:
+                    return None
+                
+                event = events[0]
+                await conn.execute('''
+                    INSERT INTO event_dead_letters (consumer, event_id, txid, error)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (consumer, event_id) DO UPDATE
+                    SET error = EXCLUDED.error, created_at = NOW()
+                ''', consumer.name, event["event_id"], event["txid"], error)
+                await self._advance(conn, consumer, event)
+        
+        self.dead_lettered[consumer.name] = self.dead_lettered.get(consumer.name, 0) + 1
+        logger.error(
+            f"Событие {event['event_id']} отложено в event_dead_letters "
+            f"потребителем {consumer.name}: {error}"
+        )
+        return event["event_id"]
+    
+    async def _lock_position(self, conn, consumer: Consumer) -> tuple:
+        """Позиция потребителя; блокировка не дает двум процессам обработать одну пачку"""
+        await conn.execute('''
+            INSERT INTO event_consumers (name)
+            VALUES ($1)
+            ON CONFLICT (name) DO NOTHING
+        ''', consumer.name)
+        
+        position = await conn.fetchrow('''
+            SELECT last_txid, last_event_id FROM event_consumers
+            WHERE name = $1
+            FOR UPDATE
+        ''', consumer.name)
+        return position['last_txid'], position['last_event_id']
+    
+    async def _advance(self, conn, consumer: Consumer, last: Dict):
+        await conn.execute('''
+            UPDATE event_consumers
+            SET last_txid = $2, last_event_id = $3, updated_at = NOW()
+            WHERE name = $1
+        ''', consumer.name, last["txid"], last["event_id"])
+    
+    async def run(self):
+        """Обрабатывать журнал, пока не вызван stop"""
+        self._running = True
+        logger.info(f"Потребители журнала расчетов: {[c.name for c in self.consumers]}")
+        
+        while self._running:
+            busy = False
+            for consumer in self.consumers:
+                if time.monotonic() < self._retry_at.get(consumer.name, 0):
+                    continue
+                
+                # После ошибки пачка повторяется по одному событию, чтобы
+                # найти событие с ошибкой и не держать из-за него остальные
+                isolating = self._isolating.get(consumer.name)
+                try:
+                    if isolating:
+                        busy |= await self.process(consumer, 1) > 0
+                        isolating[0] = 0
+                        isolating[1] -= 1
+                        if isolating[1] <= 0:
+                            del self._isolating[consumer.name]
+                    else:
+                        # Полная пачка - журнал не догнан, читаем сразу снова
+                        busy |= await self.process(consumer) >= consumer.batch_size
+                except Exception as e:
+                    # Позиция не сдвинута: пачка будет обработана повторно
+                    logger.error(f"Ошибка потребителя {consumer.name}: {e}")
+                    await self._failed(consumer, e)
+            
+            if not busy:
+                await asyncio.sleep(self.poll_interval)
+    
+    async def _failed(self, consumer: Consumer, error: Exception):
+        isolating = self._isolating.get(consumer.name)
+        if isolating is None:
+            # Ошибка пачки: сразу повторяем ее по одному событию
+            self._isolating[consumer.name] = [0, consumer.batch_size]
+            return
+        
+        isolating[0] += 1
+        if isolating[0] >= MAX_ATTEMPTS:
+            try:
+                await self.dead_letter(consumer, f"{type(error).__name__}: {error}")
+                isolating[0] = 0
+                isolating[1] -= 1
+                return
+            except Exception as e:
+                logger.error(f"Ошибка переноса события в event_dead_letters ({consumer.name}): {e}")
+        
+        self._retry_at[consumer.name] = time.monotonic() + RETRY_DELAY
+    
+    def stop(self):
+        self._running = False
+    
+    async def replay(self, name: str, from_event_id: int = 0):
+        """Перемотать потребителя: следующим будет обработано событие from_event_id"""
+        async with self.db.pool.acquire() as conn:
+            txid = 0
+            if from_event_id:
+                txid = await conn.fetchval(
+                    'SELECT txid FROM settlement_events WHERE event_id = $1', from_event_id
+                )
+                if txid is None:
+                    raise ValueError(f"Событие {from_event_id} не найдено")
+            
+            await conn.execute('''
+                INSERT INTO event_consumers (name, last_txid, last_event_id)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (name) DO UPDATE
+                SET last_txid = EXCLUDED.last_txid,
+                    last_event_id = EXCLUDED.last_event_id,
+                    updated_at = NOW()
+            ''', name, txid, max(from_event_id - 1, 0))
+        
+        logger.info(f"Потребитель {name} перемотан на событие {from_event_id}")
+    
+    async def status(self) -> List[Dict]:
+        """Позиции потребителей, число необработанных и отложенных событий"""
+        rows = await self.db.pool.fetch('''
+            SELECT c.name, c.last_event_id, c.updated_at,
+                   (SELECT COUNT(*) FROM settlement_events e
+                    WHERE (e.txid, e.event_id) > (c.last_txid, c.last_event_id)) AS lag,
+                   (SELECT COUNT(*) FROM event_dead_letters d
+                    WHERE d.consumer = c.name) AS dead_letters
+            FROM event_consumers c
+            ORDER BY c.name
+        ''')
+        return [dict(row) for row in rows]
+
+
+async def main(command: str, consumer: Optional[str] = None, from_event_id: int = 0):
+    """Состояние и перемотка потребителей из командной строки"""
+    from config import Config
+    from database import Database
+    
+    db = Database(Config().DB_URL)
+    await db.initialize()
+    
+    try:
+        pipeline = EventPipeline(db)
+        if command == "replay":
+            await pipeline.replay(consumer, from_event_id)
+        for row in await pipeline.status():
+            print(row)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    parser = argparse.ArgumentParser(description="Журнал расчетов игр")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Позиции потребителей")
+    replay_parser = subparsers.add_parser("replay", help="Перемотать потребителя")
+    replay_parser.add_argument("consumer")
+    replay_parser.add_argument("from_event_id", type=int, help="0 - с начала журнала")
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.command, getattr(args, "consumer", None),
+                     getattr(args, "from_event_id", 0)))
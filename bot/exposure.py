@@ -0,0 +1,265 @@
+"""
+Риск казино в реальном времени
+
+ExposureConsumer читает журнал settlement_events (events.py) и передает
+каждый расчет в ExposureMonitor.record, поэтому монитор видит ставки всех
+процессов - бота и API. Монитор складывает ставки и выплаты по играм в
+минутные корзины в памяти, из корзин считаются скользящий RTP, результат
+казино и самая крупная выплата за окно.
+
+Пороговые алерты (крупная выплата, убыток за окно, высокий RTP)
+передаются слушателям не чаще раза в ALERT_COOLDOWN на игру и вид.
+"""
+import os
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from events import Consumer
+
+logger = logging.getLogger(__name__)
+
+# Окна для админ-панели и метрик, минуты
+WINDOWS = {"5m": 5, "1h": 60, "24h": 1440}
+
+# Повтор алерта того же вида по той же игре не раньше, секунды
+ALERT_COOLDOWN = 600
+
+# Сводка по всем играм
+ALL_GAMES = "all"
+
+
+class MinuteBucket:
+    """Расчеты одной игры за одну минуту"""
+    
+    __slots__ = ("minute", "bets", "wagered", "paid", "max_payout")
+    
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.bets = 0
+        self.wagered = 0.0
+        self.paid = 0.0
+        self.max_payout = 0.0
+
+
+class ExposureMonitor:
+    """
+    Ставки и выплаты по играм по минутам
+    
+    Args:
+        max_payout: Алерт на одну выплату больше этого (stars), 0 - выключен
+        max_loss: Алерт на убыток казино за loss_window минут (stars)
+        max_rtp: Алерт на RTP за rtp_window минут выше порога
+        min_wagered: Оборот за окно, ниже которого RTP не проверяется
+    """
+    
+    def __init__(self, max_payout: float = 0, max_loss: float = 0, max_rtp: float = 0,
+                 loss_window: int = 60, rtp_window: int = 60, min_wagered: float = 10000,
+                 retention_minutes: int = max(WINDOWS.values())):
+        self.max_payout = max_payout
+        self.max_loss = max_loss
+        self.max_rtp = max_rtp
+        self.loss_window = loss_window
+        self.rtp_window = rtp_window
+        self.min_wagered = min_wagered
+        self.retention_minutes = retention_minutes
+        
+        self.games: Dict[str, deque] = {}
+        # Самая крупная выплата с запуска по играм
+        self.largest: Dict[str, Dict] = {}
+        
+        # Слушатели алертов: listener(text)
+        self.alert_listeners: List[Callable[[str], None]] = []
+        self._alerted: Dict[tuple, float] = {}
+    
+    def record(self, game: str, user_id: int, bet_stars: float, win_stars: float,
+               multiplier: float = 0, at: Optional[float] = None, alert: bool = True):
+        """
+        Учесть расчет: ставка и выплата игроку в stars
+        
+        at - время расчета (по умолчанию сейчас); расчеты старше
+        retention_minutes не учитываются. alert=False - без алертов.
+        """
+        now = time.time()
+        at = now if at is None else at
+        minute = int(at // 60)
+        current = int(now // 60)
+        if minute <= current - self.retention_minutes:
+            return
+        
+        buckets = self.games.get(game)
+        if buckets is None:
+            buckets = self.games[game] = deque()
+        bucket = self._bucket(buckets, minute, current)
+        
+        bucket.bets += 1
+        bucket.wagered += bet_stars
+        bucket.paid += win_stars
+        if win_stars > bucket.max_payout:
+            bucket.max_payout = win_stars
+        
+        largest = self.largest.get(game)
+        if largest is None or win_stars > largest["payout"]:
+            self.largest[game] = {
+                "payout": win_stars,
+                "bet": bet_stars,
+                "multiplier": multiplier,
+                "user_id": user_id,
+                "at": at
+            }
+        
+        if alert:
+            self._check(game, user_id, bet_stars, win_stars, multiplier, now)
+    
+    def _bucket(self, buckets: deque, minute: int, current: int) -> MinuteBucket:
+        """Корзина минуты; журнал в порядке txid может вернуть и прошлую минуту"""
+        if not buckets or buckets[-1].minute < minute:
+            buckets.append(MinuteBucket(minute))
+            while buckets[0].minute <= current - self.retention_minutes:
+                buckets.popleft()
+            return buckets[-1]
+        
+        # Корзины упорядочены по минуте: ищем с конца
+        for index in range(len(buckets) - 1, -1, -1):
+            if buckets[index].minute == minute:
+                return buckets[index]
+            if buckets[index].minute < minute:
+                buckets.insert(index + 1, MinuteBucket(minute))
+                return buckets[index + 1]
+        
+        buckets.appendleft(MinuteBucket(minute))
+        return buckets[0]
+    
+    def window(self, game: str, minutes: int) -> Dict:
+        """Сводка по игре (или ALL_GAMES) за последние minutes минут"""
+        since = int(time.time() // 60) - minutes
+        games = self.games if game == ALL_GAMES else {game: self.games.get(game, ())}
+        
+        bets = 0
+        wagered = paid = max_payout = 0.0
+        for buckets in games.values():
+            # Новые корзины в конце: идем с конца до границы окна
+            for bucket in reversed(buckets):
+                if bucket.minute <= since:
+                    break
+                bets += bucket.bets
+                wagered += bucket.wagered
+                paid += bucket.paid
+                max_payout = max(max_payout, bucket.max_payout)
+        
+        return {
+            "bets": bets,
+            "wagered": round(wagered, 2),
+            "paid": round(paid, 2),
+            "house_result": round(wagered - paid, 2),
+            "rtp": round(paid / wagered, 4) if wagered else None,
+            "max_payout": round(max_payout, 2)
+        }
+    
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        """{игра: {окно: сводка}} для всех игр и их суммы"""
+        return {
+            game: {name: self.window(game, minutes) for name, minutes in WINDOWS.items()}
+            for game in sorted(self.games) + [ALL_GAMES]
+        }
+    
+    def metric(self, field: str) -> Dict[tuple, float]:
+        """Значения поля сводки для Gauge: {(игра, окно): значение}"""
+        values = {}
+        for game, windows in self.snapshot().items():
+            for name, summary in windows.items():
+                if summary[field] is not None:
+                    values[(game, name)] = summary[field]
+        return values
+    
+    def _check(self, game: str, user_id: int, bet_stars: float, win_stars: float,
+               multiplier: float, now: float):
+        if self.max_payout and win_stars > self.max_payout:
+            self._alert(game, "payout", now,
+                        f"💸 {game}: выплата {win_stars:.0f} stars игроку {user_id} "
+                        f"(ставка {bet_stars:.0f}, x{multiplier})")
+        
+        if self.max_loss and win_stars > bet_stars:
+            result = self.window(game, self.loss_window)["house_result"]
+            if -result > self.max_loss:
+                self._alert(game, "loss", now,
+                            f"📉 {game}: убыток казино {-result:.0f} stars "
+                            f"за {self.loss_window} мин")
+        
+        if self.max_rtp and win_stars > bet_stars:
+            summary = self.window(game, self.rtp_window)
+            if summary["wagered"] >= self.min_wagered and summary["rtp"] > self.max_rtp:
+                self._alert(game, "rtp", now,
+                            f"🎰 {game}: RTP {summary['rtp']:.1%} за {self.rtp_window} мин "
+                            f"при обороте {summary['wagered']:.0f} stars")
+    
+    def _alert(self, game: str, kind: str, now: float, text: str):
+        if now - self._alerted.get((game, kind), 0) < ALERT_COOLDOWN:
+            return
+        self._alerted[(game, kind)] = now
+        
+        logger.warning(f"Алерт риска: {text}")
+        for listener in self.alert_listeners:
+            try:
+                listener(text)
+            except Exception as e:
+                logger.error(f"Ошибка слушателя алертов риска: {e}")
+
+
+class ExposureConsumer(Consumer):
+    """
+    Расчеты из журнала в ExposureMonitor
+    
+    Корзины монитора живут в памяти, поэтому при запуске потребитель
+    перематывается на начало самого длинного окна (rewind). Алерты - только
+    по событиям моложе max_alert_age: перемотка не повторяет старые.
+    """
+    
+    name = "exposure"
+    batch_size = 5000
+    
+    def __init__(self, monitor: ExposureMonitor, max_alert_age: float = 300):
+        self.monitor = monitor
+        self.max_alert_age = max_alert_age
+        self._db_now: Optional[datetime] = None
+    
+    async def handle(self, conn, events: List[Dict]):
+        # created_at пишется часами БД (TIMESTAMP без зоны): возраст события
+        # считаем по ним, а не по часовому поясу процесса
+        self._db_now = await conn.fetchval('SELECT LOCALTIMESTAMP')
+    
+    async def committed(self, events: List[Dict]):
+        now = time.time()
+        for event in events:
+            at = now - (self._db_now - event["created_at"]).total_seconds()
+            self.monitor.record(
+                event["game"], event["user_id"], event["bet_stars"], event["win_stars"],
+                event["multiplier"], at=at, alert=now - at <= self.max_alert_age
+            )
+    
+    async def rewind(self, pipeline):
+        """Перемотать на первое событие окна монитора, чтобы заново набрать корзины"""
+        # Без расчетов за окно - на последнее событие: старое монитор отбросит
+        event_id = await pipeline.db.pool.fetchval('''
+            SELECT COALESCE(
+                (SELECT MIN(event_id) FROM settlement_events
+                 WHERE created_at >= LOCALTIMESTAMP - make_interval(mins => $1)),
+                (SELECT MAX(event_id) FROM settlement_events),
+                0
+            )
+        ''', self.monitor.retention_minutes)
+        await pipeline.replay(self.name, event_id)
+
+
+def create_exposure_monitor() -> ExposureMonitor:
+    """Монитор из окружения: EXPOSURE_MAX_PAYOUT, EXPOSURE_MAX_LOSS, EXPOSURE_MAX_RTP"""
+    return ExposureMonitor(
+        max_payout=float(os.getenv("EXPOSURE_MAX_PAYOUT", "100000")),
+        max_loss=float(os.getenv("EXPOSURE_MAX_LOSS", "250000")),
+        max_rtp=float(os.getenv("EXPOSURE_MAX_RTP", "1.2")),
+        loss_window=int(os.getenv("EXPOSURE_LOSS_WINDOW", "60")),
+        rtp_window=int(os.getenv("EXPOSURE_RTP_WINDOW", "60")),
+        min_wagered=float(os.getenv("EXPOSURE_MIN_WAGERED", "10000"))
+    )
@@ -0,0 +1,155 @@
+"""
+Фейковый Telegram для локальной проверки режима webhook
+
+Поднимает заглушку Bot API (отвечает на любые методы бота) и отправляет
+в webhook сгенерированные обновления от множества пользователей.
+
+Пример:
+    # бот в режиме webhook (CasinoBot.run_webhook) с Bot API на заглушке
+    TELEGRAM_API_URL=http://127.0.0.1:8081 WEBHOOK_PORT=8443 ...
+    python fake_telegram.py --webhook http://127.0.0.1:8443/webhook --users 200
+"""
+import time
+import asyncio
+import logging
+import argparse
+import itertools
+from typing import Dict, List
+
+import ujson
+from aiohttp import web, ClientSession
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Casino Royale", "username": "fake_casino_bot"}
+
+
+class FakeBotAPI:
+    """Заглушка Bot API: фиксирует вызовы и отвечает успехом"""
+    
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+        
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle_method)
+    
+    def _message(self, chat_id) -> Dict:
+        """Минимальный объект Message"""
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id or 0), "type": "private"},
+            "from": BOT_USER
+        }
+    
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        
+        params = dict(await request.post())
+        method_lower = method.lower()
+        
+        if method_lower == "getme":
+            result = BOT_USER
+        elif method_lower.startswith(("send", "edit", "copy", "forward")):
+            result = self._message(params.get("chat_id"))
+        else:
+            result = True
+        
+        return web.json_response({"ok": True, "result": result}, dumps=ujson.dumps)
+
+
+def make_command_update(update_id: int, user_id: int, text: str) -> Dict:
+    """Сгенерировать обновление с командой от пользователя"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+    command = text.split()[0]
+    
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": user,
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        }
+    }
+
+
+async def post_updates(webhook_url: str, secret_token: str, users: int,
+                       commands: List[str], concurrency: int) -> Dict:
+    """Отправить обновления в webhook от множества пользователей"""
+    update_ids = itertools.count(1)
+    statuses: Dict[int, int] = {}
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret_token} if secret_token else {}
+    
+    async with ClientSession(json_serialize=ujson.dumps) as session:
+        
+        async def user_session(user_id: int):
+            # Обновления одного пользователя отправляются последовательно
+            for text in commands:
+                update = make_command_update(next(update_ids), user_id, text)
+                async with semaphore:
+                    started = time.perf_counter()
+                    async with session.post(webhook_url, json=update, headers=headers) as response:
+                        statuses[response.status] = statuses.get(response.status, 0) + 1
+                    latencies.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(user_session(100000 + i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "updates": len(latencies),
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else 0,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else 0,
+        "statuses": statuses
+    }
+
+
+async def main(args):
+    api = FakeBotAPI()
+    runner = web.AppRunner(api.app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    logger.info(f"Фейковый Bot API запущен на http://{args.host}:{args.port}")
+    
+    try:
+        if args.webhook:
+            # Даем боту время подняться
+            await asyncio.sleep(args.delay)
+            result = await post_updates(
+                args.webhook, args.secret, args.users, args.commands, args.concurrency
+            )
+            print(ujson.dumps(result, indent=2))
+            print(ujson.dumps({"bot_api_calls": api.calls}, indent=2))
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    parser = argparse.ArgumentParser(description="Фейковый Telegram для проверки webhook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--webhook", help="URL webhook бота, например http://127.0.0.1:8443/webhook")
+    parser.add_argument("--secret", default=None, help="WEBHOOK_SECRET бота")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=1.0)
+    parser.add_argument("--commands", nargs="+", default=["/start", "/menu", "/balance"])
+    
+    asyncio.run(main(parser.parse_args()))
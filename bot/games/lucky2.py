@@ -87,9 +87,6 @@ class Lucky2Game:
                 "error": f"Недостаточно stars. Нужно: {amount}, есть: {current_balance}"
             }
         
-        # Списываем ставку
-        await self.db.update_stars_balance(user_id, -amount)
-        
         # Определяем выигрышный цвет
         winning_color = self._spin_wheel()
         color_settings = self.colors[color]
@@ -105,37 +102,28 @@ class Lucky2Game:
             commission = gross_win * self.house_edge
             net_win = gross_win - commission
             
-            # Начисляем выигрыш
-            await self.db.update_stars_balance(user_id, net_win)
-            
             win_amount = net_win
         else:
             # Проигрыш - деньги остаются у казино
             win_multiplier = 0
             win_amount = 0
-            
-            # Деньги идут владельцу бота (уже списаны у игрока)
-            # Владелец получает их автоматически через update_stars_balance
-        
-        # Сохраняем историю
-        await self.db.add_bet_history(
-            user_id=user_id,
-            game_type="lucky2",
-            bet_color=color,
-            bet_amount=amount,
-            winning_color=winning_color,
-            won=won,
-            win_amount=win_amount,
-            win_multiplier=win_multiplier
-        )
         
-        # Обновляем статистику
-        await self.db.update_user_stats(
-            user_id=user_id,
-            games_played=1,
-            total_wagered=amount,
-            total_won=win_amount
+        # Ставка и выигрыш - одним изменением баланса вместе с событием
+        # расчета; история, статистика и лидерборды - в events.py
+        settlement = await self.db.settle(
+            user_id, "lucky2", "stars",
+            stake=amount,
+            delta=win_amount - amount,
+            bet_stars=amount,
+            win_stars=win_amount,
+            multiplier=win_multiplier,
+            details={"bet_color": color, "winning_color": winning_color, "won": won}
         )
+        if settlement is None:
+            return {
+                "success": False,
+                "error": f"Недостаточно stars. Нужно: {amount}"
+            }
         
         # Возвращаем результат
         return {
@@ -147,7 +135,8 @@ class Lucky2Game:
             "winning_color_name": self.colors[winning_color]["name"],
             "multiplier": win_multiplier,
             "win_amount": win_amount,
-            "balance": await self.db.get_stars_balance(user_id),
+            "balance": settlement["stars_balance"],
+            "event_id": settlement["event_id"],
             "color_settings": color_settings
         }
     
@@ -182,9 +171,6 @@ class Lucky2Game:
                 "error": f"Недостаточно stars. Нужно: {total_bet}, есть: {current_balance}"
             }
         
-        # Списываем общую сумму
-        await self.db.update_stars_balance(user_id, -total_bet)
-        
         # Определяем выигрышный цвет
         winning_color = self._spin_wheel()
         
@@ -218,18 +204,23 @@ class Lucky2Game:
                 "win_amount": win_amount
             })
         
-        # Начисляем общий выигрыш
-        if total_win > 0:
-            await self.db.update_stars_balance(user_id, total_win)
-        
-        # Сохраняем историю
-        await self.db.add_multi_bet_history(
-            user_id=user_id,
-            bets=bets,
-            winning_color=winning_color,
-            total_bet=total_bet,
-            total_win=total_win
+        winning_bet = bets.get(winning_color, 0)
+        multiplier = total_win / winning_bet if total_win and winning_bet else 0
+        
+        settlement = await self.db.settle(
+            user_id, "lucky2", "stars",
+            stake=total_bet,
+            delta=total_win - total_bet,
+            bet_stars=total_bet,
+            win_stars=total_win,
+            multiplier=multiplier,
+            details={"bets": bets, "winning_color": winning_color, "won": total_win > 0}
         )
+        if settlement is None:
+            return {
+                "success": False,
+                "error": f"Недостаточно stars. Нужно: {total_bet}"
+            }
         
         return {
             "success": True,
@@ -238,7 +229,8 @@ class Lucky2Game:
             "total_bet": total_bet,
             "total_win": total_win,
             "results": results,
-            "balance": await self.db.get_stars_balance(user_id),
+            "balance": settlement["stars_balance"],
+            "event_id": settlement["event_id"],
             "net_profit": total_win - total_bet
         }
     
@@ -1,6 +1,6 @@
 import random
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -8,8 +8,10 @@ logger = logging.getLogger(__name__)
 class MonoGame:
     """Игра Моно - увеличение шанса выигрыша свайпом"""
     
-    def __init__(self, db):
+    def __init__(self, db, inventory=None):
         self.db = db
+        # InventorySystem для выдачи NFT; без него NFT не выдаются
+        self.inventory = inventory
         
         # ОБНОВЛЕНО: Настройки шансов, множителей и МИНИМАЛЬНЫХ СТАВОК
         self.chance_settings = [
@@ -84,58 +86,58 @@ class MonoGame:
             }
         
         # Проверяем выигрыш
-        win_number = random.randint(1, 100)
+        win_number = self._draw_number()
         won = win_number <= setting["chance"]
         
         # Рассчитываем результат
+        bet_stars_used = bet_spins * self.spin_to_stars
         if won:
             # Выигрыш
             win_multiplier = setting["multiplier"]
             win_spins = bet_spins * win_multiplier
             
-            # Начисляем выигрыш (уже минус использованные спины)
-            net_win_spins = win_spins - bet_spins
-            await self.db.update_spins_balance(user_id, net_win_spins)
-            
-            # Проверяем NFT
-            nft_awarded = None
-            if random.randint(1, 1000) <= 5:  # 0.5% шанс
-                nft_awarded = await self._award_nft(user_id)
-                
             # Конвертируем в stars для отображения
             win_stars = win_spins * self.spin_to_stars
-            bet_stars_used = bet_spins * self.spin_to_stars
         else:
-            # Проигрыш - списываем ставку
-            await self.db.update_spins_balance(user_id, -bet_spins)
+            # Проигрыш - списывается ставка
             win_multiplier = 0
             win_spins = 0
             win_stars = 0
-            bet_stars_used = bet_spins * self.spin_to_stars
-            nft_awarded = None
         
-        # Сохраняем историю
-        await self.db.add_game_history(
-            user_id=user_id,
-            game_type="mono",
-            bet_amount=bet_spins,
+        # NFT: 0.5% шанс при выигрыше. NFT выбирается до расчета и выдается
+        # в том же запросе, поэтому в событии - фактически выданный NFT
+        nft = await self._pick_nft() if won and random.randint(1, 1000) <= 5 else None
+        
+        # Баланс и событие расчета - одним запросом; история, статистика
+        # и лидерборды обновляются потребителями журнала (events.py)
+        settlement = await self.db.settle(
+            user_id, "mono", "spins",
+            stake=bet_spins,
+            delta=win_spins - bet_spins,
             bet_stars=bet_stars_used,
-            chance=chance_percentage,
-            won=won,
-            win_amount=win_spins,
             win_stars=win_stars,
-            win_multiplier=win_multiplier,
-            nft_awarded=nft_awarded is not None,
-            min_bet_required=min_bet_stars
+            multiplier=win_multiplier,
+            details={
+                "chance": chance_percentage,
+                "bet_spins": bet_spins,
+                "win_number": win_number,
+                "won": won,
+                "win_spins": win_spins,
+                "nft_awarded": nft is not None,
+                "nft_id": nft["id"] if nft else None,
+                "min_bet_required": min_bet_stars
+            },
+            nft_id=nft["id"] if nft else None
         )
+        if settlement is None:
+            return {
+                "success": False,
+                "error": "Недостаточно спинов",
+                "required": bet_spins
+            }
         
-        # Обновляем статистику
-        await self.db.update_user_stats(
-            user_id=user_id,
-            games_played=1,
-            total_wagered=bet_stars_used,
-            total_won=win_stars
-        )
+        if nft:
+            await self._log_nft(user_id, nft)
         
         # Возвращаем результат
         return {
@@ -149,12 +151,17 @@ class MonoGame:
             "bet_spins": bet_spins,
             "bet_stars": bet_stars_used,
             "min_bet_required": min_bet_stars,
-            "nft_awarded": nft_awarded,
-            "balance": await self.db.get_spins_balance(user_id),
-            "balance_stars": await self.db.get_stars_balance(user_id),
+            "nft_awarded": nft,
+            "balance": settlement["spins_balance"],
+            "balance_stars": settlement["stars_balance"],
+            "event_id": settlement["event_id"],
             "setting": setting
         }
     
+    def _draw_number(self) -> int:
+        """Выпавшее число 1-100: выигрыш, если не больше шанса"""
+        return random.randint(1, 100)
+    
     def _get_setting_for_chance(self, chance: int) -> Dict:
         """Получить настройки для выбранного шанса"""
         for setting in self.chance_settings:
@@ -165,14 +172,32 @@ class MonoGame:
         closest = min(self.chance_settings, key=lambda x: abs(x["chance"] - chance))
         return closest
     
-    async def _award_nft(self, user_id: int) -> Dict:
-        """Выдать случайный NFT"""
-        # Получаем случайный NFT из базы
-        nft = await self.db.get_random_nft()
-        if nft:
-            await self.db.add_nft_to_user(user_id, nft["id"])
-            return nft
-        return None
+    async def _pick_nft(self) -> Optional[Dict]:
+        """Случайный NFT из каталога инвентаря; без инвентаря NFT не выдаются"""
+        if self.inventory is None:
+            return None
+        
+        # Ошибка каталога не должна ломать выигрышный спин: рассчитываем без NFT
+        try:
+            return await self.inventory.get_random_nft()
+        except Exception as e:
+            logger.error(f"Ошибка выбора NFT: {e}")
+            return None
+    
+    async def _log_nft(self, user_id: int, nft: Dict):
+        """Запись о выданном NFT в историю инвентаря"""
+        # NFT уже выдан вместе с расчетом: ошибка истории не ломает ответ
+        try:
+            await self.db.add_inventory_history(
+                user_id=user_id,
+                action="nft_received",
+                item_type="nft",
+                item_id=nft["id"],
+                item_name=nft["name"],
+                quantity=1
+            )
+        except Exception as e:
+            logger.error(f"Ошибка записи NFT {nft['id']} в историю {user_id}: {e}")
     
     async def get_user_stats(self, user_id: int) -> Dict:
         """Получить статистику пользователя по игре Моно"""
@@ -271,7 +296,7 @@ class MonoGame:
                 "min_required": min_bet_stars
             }
         
-        win_number = random.randint(1, 100)
+        win_number = self._draw_number()
         won = win_number <= setting["chance"]
         
         if won:
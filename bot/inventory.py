@@ -4,8 +4,12 @@ import logging
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from achievements import ACHIEVEMENTS
+
 logger = logging.getLogger(__name__)
 
+ACHIEVEMENTS_BY_ID = {rule["id"]: rule for rule in ACHIEVEMENTS}
+
 class InventorySystem:
     """Система инвентаря пользователя"""
     
@@ -142,8 +146,21 @@ class InventorySystem:
         return formatted_boosters
     
     async def get_user_collectibles(self, user_id: int) -> List[Dict]:
-        """Получить коллекционные предметы"""
-        collectibles = await self.db.get_user_collectibles(user_id)
+        """Получить коллекционные предметы: достижения игрока"""
+        achievements = await self.db.get_user_achievements(user_id)
+        
+        collectibles = []
+        for achievement in achievements:
+            rule = ACHIEVEMENTS_BY_ID.get(achievement["achievement_id"])
+            if rule:
+                collectibles.append({
+                    "id": rule["id"],
+                    "type": "achievements",
+                    "name": rule["name"],
+                    "emoji": rule["emoji"],
+                    "reward_stars": achievement["reward_stars"],
+                    "acquired_date": achievement["unlocked_at"]
+                })
         return collectibles
     
     async def get_user_utility_items(self, user_id: int) -> List[Dict]:
@@ -235,6 +252,35 @@ class InventorySystem:
         
         return success
     
+    async def sell_nft(self, user_id: int, nft_id: int) -> Optional[int]:
+        """
+        Продать NFT за 70% стоимости
+        
+        Returns:
+            Начисленная сумма в stars или None, если NFT у пользователя нет
+        """
+        nft = self.get_nft_by_id(nft_id)
+        if not nft:
+            return None
+        
+        if not await self.remove_nft_from_user(user_id, nft_id):
+            return None
+        
+        price = int(nft["value"] * 0.7)
+        await self.db.update_stars_balance(user_id, price)
+        
+        await self.db.add_inventory_history(
+            user_id=user_id,
+            action="nft_sold",
+            item_type="nft",
+            item_id=nft_id,
+            item_name=nft["name"],
+            quantity=1,
+            metadata={"price": price}
+        )
+        
+        return price
+    
     async def transfer_nft(self, from_user_id: int, to_user_id: int, nft_id: int) -> bool:
         """Передать NFT другому пользователю"""
         # Проверяем владение
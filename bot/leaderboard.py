@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Метрики лидербордов
+METRICS = ("multiplier", "won", "profit")
+
+# Периоды и время жизни ключей (секунды)
+PERIODS = {
+    "daily": 3 * 86400,
+    "weekly": 15 * 86400,
+    "alltime": None
+}
+
+# Сводный лидерборд по всем играм
+ALL_GAMES = "all"
+
+
+class Leaderboard:
+    """Лидерборды на отсортированных множествах Redis"""
+    
+    def __init__(self, redis, db, games=("mono", "lucky2", "roulette"),
+                 key_prefix: str = "casino:lb:"):
+        self.redis = redis
+        self.db = db
+        self.games = tuple(games)
+        self.key_prefix = key_prefix
+        self.usernames_key = f"{key_prefix}usernames"
+    
+    @staticmethod
+    def _bucket(period: str, moment: datetime) -> str:
+        """Суффикс ключа для периода"""
+        if period == "daily":
+            return moment.strftime("%Y%m%d")
+        if period == "weekly":
+            year, week, _ = moment.isocalendar()
+            return f"{year}w{week:02d}"
+        return "all"
+    
+    def key(self, metric: str, game: str = ALL_GAMES, period: str = "alltime",
+            moment: Optional[datetime] = None) -> str:
+        """Ключ лидерборда"""
+        bucket = self._bucket(period, moment or datetime.now())
+        return f"{self.key_prefix}{metric}:{game}:{period}:{bucket}"
+    
+    async def record_settlement(self, user_id: int, game: str, bet_stars: float,
+                                win_stars: float, multiplier: float):
+        """Учесть завершенную игру во всех лидербордах"""
+        pipe = self.redis.pipeline(transaction=False)
+        self.add_settlement(pipe, user_id, game, bet_stars, win_stars, multiplier)
+        
+        try:
+            await pipe.execute()
+        except Exception as e:
+            # Лидерборд восстановится при ночной пересборке
+            logger.error(f"Ошибка обновления лидерборда для {user_id}: {e}")
+    
+    def add_settlement(self, pipe, user_id: int, game: str, bet_stars: float,
+                       win_stars: float, multiplier: float, moment: Optional[datetime] = None):
+        """Добавить в pipeline Redis команды учета одной игры"""
+        moment = moment or datetime.now()
+        profit = win_stars - bet_stars
+        
+        for period, ttl in PERIODS.items():
+            for board_game in (game, ALL_GAMES):
+                if multiplier:
+                    key = self.key("multiplier", board_game, period, moment)
+                    # GT: сохраняем только лучший множитель игрока
+                    pipe.zadd(key, {user_id: multiplier}, gt=True)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                
+                if win_stars:
+                    key = self.key("won", board_game, period, moment)
+                    pipe.zincrby(key, win_stars, user_id)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                
+                key = self.key("profit", board_game, period, moment)
+                pipe.zincrby(key, profit, user_id)
+                if ttl:
+                    pipe.expire(key, ttl)
+    
+    async def top(self, metric: str, game: str = ALL_GAMES, period: str = "daily",
+                  limit: int = 5) -> List[Dict]:
+        """Лучшие игроки лидерборда"""
+        entries = await self.redis.zrevrange(
+            self.key(metric, game, period), 0, limit - 1, withscores=True
+        )
+        if not entries:
+            return []
+        
+        user_ids = [int(member) for member, _ in entries]
+        usernames = await self._get_usernames(user_ids)
+        
+        return [
+            {
+                "user_id": user_id,
+                "username": usernames.get(user_id) or "user",
+                metric: round(score, 2)
+            }
+            for user_id, (_, score) in zip(user_ids, entries)
+        ]
+    
+    async def rank(self, user_id: int, metric: str = "won", game: str = ALL_GAMES,
+                   period: str = "alltime") -> int:
+        """Место игрока (0 - нет в лидерборде)"""
+        position = await self.redis.zrevrank(self.key(metric, game, period), user_id)
+        return position + 1 if position is not None else 0
+    
+    async def _get_usernames(self, user_ids: List[int]) -> Dict[int, str]:
+        """Имена игроков: из Redis, недостающие - одним запросом к БД"""
+        values = await self.redis.hmget(self.usernames_key, user_ids)
+        usernames = {
+            user_id: value.decode() if isinstance(value, bytes) else value
+            for user_id, value in zip(user_ids, values)
+            if value is not None
+        }
+        
+        missing = [user_id for user_id in user_ids if user_id not in usernames]
+        if missing:
+            rows = await self.db.pool.fetch('''
+                SELECT user_id, COALESCE(username, first_name, '') AS username
+                FROM users WHERE user_id = ANY($1::bigint[])
+            ''', missing)
+            loaded = {row['user_id']: row['username'] for row in rows}
+            if loaded:
+                await self.redis.hset(self.usernames_key, mapping=loaded)
+            usernames.update(loaded)
+        
+        return usernames
+    
+    async def rebuild(self):
+        """
+        Пересобрать лидерборды из Postgres
+        
+        Новые множества собираются во временных ключах и подменяют
+        текущие через RENAME, так что чтение не видит пустых досок.
+        """
+        now = datetime.now()
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = day_start - timedelta(days=now.weekday())
+        since = {"daily": day_start, "weekly": week_start, "alltime": datetime(1970, 1, 1)}
+        
+        # Расчеты всех игр есть в журнале settlement_events; строки
+        # mono_history без event_id - история Моно до появления журнала.
+        # Сводные доски - объединение досок отдельных игр
+        for period, ttl in PERIODS.items():
+            rows = await self.db.pool.fetch('''
+                SELECT game, user_id,
+                       COALESCE(MAX(multiplier), 0) AS multiplier,
+                       COALESCE(SUM(win_stars), 0) AS won,
+                       COALESCE(SUM(win_stars), 0) - COALESCE(SUM(bet_stars), 0) AS profit
+                FROM (
+                    SELECT game, user_id, bet_stars, win_stars, multiplier
+                    FROM settlement_events
+                    WHERE created_at >= $1
+                    UNION ALL
+                    SELECT 'mono', user_id, bet_stars, win_stars,
+                           CASE WHEN won THEN multiplier ELSE 0 END
+                    FROM mono_history
+                    WHERE event_id IS NULL AND created_at >= $1
+                ) AS settlements
+                GROUP BY game, user_id
+            ''', since[period])
+            
+            for metric in METRICS:
+                pipe = self.redis.pipeline(transaction=True)
+                for game in self.games:
+                    scores = {
+                        row['user_id']: float(row[metric])
+                        for row in rows if row['game'] == game and row[metric]
+                    }
+                    key = self.key(metric, game, period, now)
+                    tmp_key = f"{key}:rebuild"
+                    
+                    if scores:
+                        pipe.delete(tmp_key)
+                        pipe.zadd(tmp_key, scores)
+                        pipe.rename(tmp_key, key)
+                        if ttl:
+                            pipe.expire(key, ttl)
+                    else:
+                        pipe.delete(key)
+                
+                all_key = self.key(metric, ALL_GAMES, period, now)
+                pipe.zunionstore(
+                    all_key,
+                    [self.key(metric, game, period, now) for game in self.games],
+                    aggregate="MAX" if metric == "multiplier" else "SUM"
+                )
+                if ttl:
+                    pipe.expire(all_key, ttl)
+                await pipe.execute()
+        
+        logger.info("Лидерборды пересобраны из БД")
+    
+    async def run_nightly_rebuild(self, hour: int = 4):
+        """Пересобирать лидерборды каждую ночь"""
+        while True:
+            now = datetime.now()
+            next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            
+            await asyncio.sleep((next_run - now).total_seconds())
+            
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Ошибка пересборки лидербордов: {e}")
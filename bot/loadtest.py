@@ -0,0 +1,422 @@
+"""
+Нагрузочный прогон обработчиков CasinoBot на синтетических сессиях
+
+Обновления создаются в процессе и передаются прямо в Application,
+вызовы Bot API уходят в фейковый транспорт без сети. Postgres и Redis
+настоящие (DATABASE_URL, REDIS_URL), поэтому запускать только на
+локальном окружении.
+
+Пример:
+    BOT_TOKEN=123456:loadtest DATABASE_URL=postgresql://... REDIS_URL=redis://localhost \\
+    python loadtest.py --users 2000 --concurrency 500 --output load.json
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import contextvars
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import ujson
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest, RequestData
+
+from benchmark import summarize
+from fake_telegram import BOT_USER, make_command_update
+from main import CasinoBot
+from metrics import timed
+from payments import InvoicePayload
+
+# Пользователи прогона не пересекаются с реальными ID Telegram
+LOAD_USER_BASE = 8_000_000_000_000
+
+# Счетчик запросов к Postgres текущего обновления
+_update_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    "update_queries", default=None
+)
+
+
+class FakeTransport(BaseRequest):
+    """Транспорт Bot API: отвечает успехом на любой метод без сети"""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        pass
+    
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+    
+    async def do_request(self, url: str, method: str,
+                         request_data: Optional[RequestData] = None,
+                         **timeouts) -> Tuple[int, bytes]:
+        name = url.rsplit("/", 1)[-1]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        
+        # Задержка сети до Telegram
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        name = name.lower()
+        if name == "getme":
+            result = BOT_USER
+        elif name.startswith(("send", "edit", "copy", "forward")):
+            params = request_data.parameters if request_data else {}
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "from": BOT_USER,
+                "text": "ok"
+            }
+        else:
+            result = True
+        
+        return 200, ujson.dumps({"ok": True, "result": result}).encode()
+
+
+class CountingPool:
+    """Обертка пула asyncpg, считающая запросы текущего обновления"""
+    
+    QUERY_METHODS = ("fetch", "fetchrow", "fetchval", "execute", "executemany")
+    
+    def __init__(self, pool):
+        self._pool = pool
+        self.total = 0
+        for name in self.QUERY_METHODS:
+            setattr(self, name, self._counted(getattr(pool, name)))
+    
+    def _counted(self, method):
+        async def wrapper(*args, **kwargs):
+            self.total += 1
+            counter = _update_queries.get()
+            if counter is not None:
+                counter[0] += 1
+            return await method(*args, **kwargs)
+        return wrapper
+    
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class LatencyRecorder:
+    """Приемник для metrics.timed: сырые задержки и ошибки по обработчику"""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+    
+    def observe(self, value: float, handler: str):
+        self.latencies.setdefault(handler, []).append(value)
+    
+    def inc(self, handler: str, amount: int = 1):
+        self.errors[handler] = self.errors.get(handler, 0) + amount
+
+
+def _user(user_id: int) -> Dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}",
+            "username": f"load{user_id}", "language_code": "ru"}
+
+
+def _message(update_id: int, user_id: int, **fields) -> Dict:
+    return {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        **fields
+    }
+
+
+def make_callback_update(update_id: int, user_id: int, data: str) -> Dict:
+    """Нажатие inline кнопки под сообщением бота"""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "menu"
+            }
+        }
+    }
+
+
+def make_web_app_update(update_id: int, user_id: int, payload: Dict) -> Dict:
+    """Данные из WebApp (Telegram.WebApp.sendData)"""
+    return {
+        "update_id": update_id,
+        "message": _message(update_id, user_id, web_app_data={
+            "data": ujson.dumps(payload),
+            "button_text": "🎰 Моно"
+        })
+    }
+
+
+def make_payment_updates(update_id: int, user_id: int, stars: int, price: int) -> List[Dict]:
+    """pre_checkout_query и successful_payment для покупки stars"""
+    payload = InvoicePayload(product_type="stars", amount=stars, user_id=user_id).encode()
+    total_amount = price * 100
+    return [
+        {
+            "update_id": update_id,
+            "pre_checkout_query": {
+                "id": str(update_id),
+                "from": _user(user_id),
+                "currency": "RUB",
+                "total_amount": total_amount,
+                "invoice_payload": payload
+            }
+        },
+        {
+            "update_id": update_id + 1,
+            "message": _message(update_id + 1, user_id, successful_payment={
+                "currency": "RUB",
+                "total_amount": total_amount,
+                "invoice_payload": payload,
+                "telegram_payment_charge_id": f"load_{user_id}_{update_id}",
+                "provider_payment_charge_id": f"provider_{user_id}_{update_id}"
+            })
+        }
+    ]
+
+
+class LoadGenerator:
+    """
+    Сессии пользователей: /start -> /menu -> /mono -> спины -> /balance -> покупка
+    
+    Каждая сессия идет последовательно, как у живого пользователя;
+    одновременно активны не больше concurrency сессий.
+    """
+    
+    def __init__(self, bot, spins: int = 5, purchase_rate: float = 0.2,
+                 think_time: float = 0.0, starting_spins: int = 50):
+        self.bot = bot
+        self.spins = spins
+        self.purchase_rate = purchase_rate
+        self.think_time = think_time
+        self.starting_spins = starting_spins
+        
+        self.update_ids = itertools.count(1)
+        self.handlers = LatencyRecorder()
+        # шаг сессии -> задержки и число запросов к БД на обновление
+        self.steps: Dict[str, List[float]] = {}
+        self.step_queries: Dict[str, List[int]] = {}
+        self.failed_updates = 0
+    
+    def instrument(self, keep_rate_limit: bool = True):
+        """Замерять каждый обработчик; лимитер можно убрать, чтобы мерить пропускную способность"""
+        application = self.bot.application
+        for group, handlers in application.handlers.items():
+            for handler in list(handlers):
+                if group < 0 and not keep_rate_limit:
+                    application.remove_handler(handler, group)
+                    continue
+                callback = getattr(handler, "callback", None)
+                if callback is None:
+                    continue
+                label = getattr(callback, "__name__", None) or type(callback).__name__
+                handler.callback = timed(
+                    callback, self.handlers, self.handlers, (label,),
+                    expected=(ApplicationHandlerStop,)
+                )
+    
+    async def send(self, step: str, data: Dict):
+        """Обработать одно обновление и записать задержку и запросы к БД"""
+        update = Update.de_json(data, self.bot.application.bot)
+        counter = [0]
+        token = _update_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            await self.bot.application.process_update(update)
+        except Exception:
+            self.failed_updates += 1
+        finally:
+            _update_queries.reset(token)
+        self.steps.setdefault(step, []).append(time.perf_counter() - started)
+        self.step_queries.setdefault(step, []).append(counter[0])
+        
+        if self.think_time:
+            await asyncio.sleep(random.expovariate(1 / self.think_time))
+    
+    async def session(self, user_id: int):
+        ids = self.update_ids
+        await self.send("start", make_command_update(next(ids), user_id, "/start"))
+        
+        # Стартовый баланс вне обновлений, чтобы спины не упирались в ноль
+        if self.starting_spins:
+            await self.bot.db.update_spins_balance(user_id, self.starting_spins)
+        
+        await self.send("menu", make_command_update(next(ids), user_id, "/menu"))
+        await self.send("mono", make_command_update(next(ids), user_id, "/mono"))
+        
+        for _ in range(self.spins):
+            chance = random.choice(self.bot.mono_game.chance_settings)["chance"]
+            payload = {
+                "action": "mono_spin",
+                "chance": chance,
+                "bet_spins": self.bot.mono_game.get_min_spins_for_chance(chance)
+            }
+            await self.send("mono_spin", make_web_app_update(next(ids), user_id, payload))
+        
+        await self.send("balance", make_command_update(next(ids), user_id, "/balance"))
+        
+        if random.random() < self.purchase_rate:
+            await self.send("buy", make_command_update(next(ids), user_id, "/buy"))
+            await self.send("buy_stars", make_callback_update(next(ids), user_id, "buy_250_stars"))
+            
+            first_id = next(ids)
+            next(ids)
+            pre_checkout, payment = make_payment_updates(first_id, user_id, 250, 400)
+            await self.send("pre_checkout", pre_checkout)
+            await self.send("successful_payment", payment)
+            
+            await self.send("exchange", make_callback_update(next(ids), user_id, "exchange_5"))
+    
+    async def run(self, users: int, concurrency: int) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def limited(user_id: int):
+            async with semaphore:
+                await self.session(user_id)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(LOAD_USER_BASE + i) for i in range(users)))
+        return time.perf_counter() - started
+    
+    def report(self, elapsed: float, pool: CountingPool, transport: FakeTransport) -> Dict:
+        updates = sum(len(latencies) for latencies in self.steps.values())
+        queries = [count for counts in self.step_queries.values() for count in counts]
+        
+        def queries_summary(counts: List[int]) -> Dict:
+            ordered = sorted(counts)
+            return {
+                "mean": round(sum(ordered) / len(ordered), 2),
+                "p50": ordered[len(ordered) // 2],
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                "max": ordered[-1]
+            }
+        
+        return {
+            "updates": updates,
+            "failed_updates": self.failed_updates,
+            "seconds": round(elapsed, 3),
+            "updates_per_sec": round(updates / elapsed, 1) if elapsed else 0,
+            "db_queries": pool.total,
+            "db_queries_per_update": queries_summary(queries) if queries else {},
+            "steps": {
+                step: {
+                    "updates": len(latencies),
+                    "latency": summarize(latencies),
+                    "db_queries": queries_summary(self.step_queries[step])
+                }
+                for step, latencies in self.steps.items()
+            },
+            "handlers": {
+                handler: {
+                    "calls": len(latencies),
+                    "errors": self.handlers.errors.get(handler, 0),
+                    "latency": summarize(latencies)
+                }
+                for handler, latencies in self.handlers.latencies.items()
+            },
+            "bot_api_calls": transport.calls,
+            "rate_limiter": self.bot.rate_limiter.stats()
+        }
+
+
+async def cleanup(db, users: int):
+    """Удалить строки пользователей прогона"""
+    last_user = LOAD_USER_BASE + users
+    tables = (
+        "mono_history", "settlement_events", "achievement_progress", "user_achievements",
+        "user_nfts", "inventory_history", "payments", "users"
+    )
+    for table in tables:
+        await db.pool.execute(
+            f'DELETE FROM {table} WHERE user_id >= $1 AND user_id < $2',
+            LOAD_USER_BASE, last_user
+        )
+
+
+async def run(args) -> Dict:
+    random.seed(args.seed)
+    transport = FakeTransport(latency=args.api_latency / 1000)
+    bot = CasinoBot(request=transport)
+    
+    await bot.db.initialize()
+    pool = bot.db.pool = CountingPool(bot.db.pool)
+    bot.setup_handlers()
+    
+    generator = LoadGenerator(
+        bot,
+        spins=args.spins,
+        purchase_rate=args.purchase_rate,
+        think_time=args.think_time,
+        starting_spins=args.starting_spins
+    )
+    generator.instrument(keep_rate_limit=not args.no_rate_limit)
+    
+    async with bot.application:
+        try:
+            elapsed = await generator.run(args.users, args.concurrency)
+            await bot.sender.close()
+            await bot.payments.close()
+        finally:
+            await cleanup(bot.db, args.users)
+            await bot.db.close()
+    
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "args": vars(args)
+        },
+        **generator.report(elapsed, pool, transport)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков бота")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200, help="Одновременно активных сессий")
+    parser.add_argument("--spins", type=int, default=5, help="Спинов Моно за сессию")
+    parser.add_argument("--purchase-rate", type=float, default=0.2, help="Доля сессий с покупкой")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Средняя пауза между действиями, с")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Задержка ответа Bot API, мс")
+    parser.add_argument("--starting-spins", type=int, default=50)
+    parser.add_argument("--no-rate-limit", action="store_true", help="Убрать лимитер обновлений")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+    report = asyncio.run(run(args))
+    output = ujson.dumps(report, indent=2, ensure_ascii=False)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+# Bot screens in English.
+# Same structure and fields as locales/ru.py.
+
+SCREENS = {
+    "start": {
+        "text": """
+🎰 *Welcome to Casino Royale!*
+
+👤 *{first_name}*, glad to see you at our casino!
+
+*Available games:*
+🎯 *MONO* - Raise your win chance with a swipe (1-65%)
+🎨 *LUCKY2* - Bet on colors with multipliers up to 5x
+🎡 *ROULETTE* - The classic game
+
+*Your balance:*
+🎰 Spins: {spins_balance}
+⭐ Stars: {stars_balance}
+
+*Commands:*
+/menu - Main menu
+/games - Choose a game
+/buy - Top up balance
+/balance - Check balance
+""",
+        "keyboard": [
+            [("🎮 MAIN MENU", "main_menu"), ("💰 TOP UP", "buy_stars")],
+            [("🎯 PLAY MONO", "play_mono"), ("🎨 PLAY LUCKY2", "play_lucky2")],
+            [("📊 STATISTICS", "stats"), ("ℹ️ HELP", "help")]
+        ]
+    },
+
+    "menu": {
+        "text": """
+🏠 *MAIN MENU*
+
+👤 *{first_name}* | ID: `{user_id}`
+💰 Balance: {stars_balance} stars
+🎰 Spins: {spins_balance}
+
+*Choose an action:*
+""",
+        "keyboard": [
+            [("🎮 GAMES", "games_menu"), ("👛 WALLET", "wallet")],
+            [("📊 PROFILE", "profile"), ("🏆 LEADERS", "leaders")],
+            [("🔄 TOP UP", "buy_stars"), ("🎁 DEMO", "demo_mode")],
+            [("📖 RULES", "rules"), ("👨‍💼 SUPPORT", "support")]
+        ]
+    },
+
+    "games": {
+        "text": """
+🎮 *AVAILABLE GAMES*
+
+1️⃣ *MONO* 🎯
+   Raise your win chance with a swipe!
+   • Chance: 1% to 65%
+   • Multiplier: 1.54x to 100x
+   • NFT chance: 0.5% on a win
+
+2️⃣ *LUCKY2* 🎨
+   Bet on colors!
+   • Minimum bet: 25 stars
+   • Blue/Purple: x2
+   • Red: x5 (rare)
+
+3️⃣ *ROULETTE* 🎡
+   The classic game
+   • 16 sectors
+   • Multipliers up to 10x
+   • NFT every 5 spins
+
+Choose a game:
+""",
+        "keyboard": [
+            [("🎯 MONO", "play_mono"), ("🎨 LUCKY2", "play_lucky2")],
+            [("🎡 ROULETTE", "play_roulette"), ("🎮 DEMO GAMES", "demo_games")],
+            [("📊 GAME STATS", "games_stats"), ("🏆 TOP PLAYERS", "top_players")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "mono_no_spins": {
+        "text": """
+⚠️ *You have no spins!*
+
+Mono requires spins:
+🎰 1 spin = 50 stars
+
+*Your balance:*
+⭐ Stars: {stars_balance}
+🎰 Spins: {spins_balance}
+
+Choose an action:
+""",
+        "keyboard": [
+            [("💰 BUY SPINS", "buy_spins"), ("🔄 EXCHANGE STARS", "exchange_stars")],
+            [("🎮 DEMO MODE", "demo_mono"), ("« BACK", "games_menu")]
+        ]
+    },
+
+    "mono_info": {
+        "text": """
+🎯 *MONO - RULES*
+
+*How to play:*
+1. Choose a win chance from 1% to 65%
+2. Set your bet (minimum depends on chance)
+3. Spin the wheel
+4. Land on a green sector - you win!
+
+*Minimum bets:*
+1% - 4 stars     15% - 60 stars
+3% - 12 stars    20% - 80 stars
+5% - 20 stars    25% - 100 stars
+7% - 28 stars    30% - 120 stars
+10% - 40 stars   65% - 260 stars
+
+*Multipliers:*
+1% = 100x    20% = 5x
+3% = 33x     25% = 4x
+5% = 20x     30% = 3.33x
+7% = 14.3x   40% = 2.5x
+10% = 10x    50% = 2x
+15% = 6.67x  65% = 1.54x
+
+🎰 *Your spins:* {spins_balance}
+""",
+        "keyboard": [
+            [{"text": "🎯 START GAME", "web_app": "{webapp_url}/mono.html"}],
+            [("💰 BUY SPINS", "buy_spins"), ("📖 FULL RULES", "mono_rules")],
+            [("« BACK", "games_menu")]
+        ]
+    },
+
+    "lucky2_no_stars": {
+        "text": """
+⚠️ *Not enough stars!*
+
+Lucky2 requires at least 25 stars.
+
+*Your balance:*
+⭐ Stars: {stars_balance}
+🎰 Spins: {spins_balance}
+
+Choose an action:
+""",
+        "keyboard": [
+            [("💰 TOP UP BALANCE", "buy_stars"), ("🎮 OTHER GAMES", "games_menu")],
+            [("🎮 DEMO MODE", "demo_lucky2"), ("« BACK", "games_menu")]
+        ]
+    },
+
+    "lucky2_info": {
+        "text": """
+🎨 *LUCKY2 - RULES*
+
+*How to play:*
+1. Choose a color to bet on:
+   • 🔵 Blue (60% chance) → x2
+   • 🔴 Red (5% chance) → x5
+   • 🟣 Purple (35% chance) → x2
+2. Choose your bet (from 25 stars)
+3. Spin the wheel
+4. Land on your color - you win!
+
+*Features:*
+• Red is rare but pays x5
+• A losing bet is lost
+• You can bet on several colors at once
+• Maximum bet: 1000 stars
+
+*Probabilities:*
+🔵 Blue: 60%
+🔴 Red: 5%
+🟣 Purple: 35%
+
+⭐ *Your stars:* {stars_balance}
+""",
+        "keyboard": [
+            [{"text": "🎨 START GAME", "web_app": "{webapp_url}/lucky2.html"}],
+            [("💰 TOP UP BALANCE", "buy_stars"), ("📖 FULL RULES", "lucky2_rules")],
+            [("« BACK", "games_menu")]
+        ]
+    },
+
+    "buy": {
+        "text": """
+🛒 *SHOP*
+
+*STARS (for Lucky2 and purchases):*
+⭐ *50 stars* - 88 ₽ (1 star = 1.76 ₽)
+⭐ *250 stars* - 400 ₽ (1 star = 1.6 ₽) *-9%*
+⭐ *500 stars* - 750 ₽ (1 star = 1.5 ₽) *-15%*
+⭐ *1000 stars* - 1400 ₽ (1 star = 1.4 ₽) *-20%*
+💎 *2500 stars* - 3200 ₽ (1 star = 1.28 ₽) *-27%*
+
+*SPINS (for Mono and Roulette):*
+🎰 1 spin = 50 stars
+
+*Choose a product:*
+""",
+        "keyboard": [
+            [("⭐ 50 STARS - 88 ₽", "buy_50_stars"), ("⭐ 250 STARS - 400 ₽", "buy_250_stars")],
+            [("⭐ 500 STARS - 750 ₽", "buy_500_stars"), ("⭐ 1000 STARS - 1400 ₽", "buy_1000_stars")],
+            [("💎 2500 STARS - 3200 ₽", "buy_2500_stars"), ("🎰 BUY SPINS", "buy_spins_menu")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "buy_spins": {
+        "text": """
+🎰 *SPIN SHOP*
+
+*For Mono and Roulette:*
+🎰 *1 spin* - 50 stars
+🎰 *5 spins* - 225 stars (-10%)
+🎰 *10 spins* - 400 stars (-20%)
+🎰 *25 spins* - 900 stars (-28%)
+🎰 *50 spins* - 1600 stars (-36%)
+💎 *100 spins* - 3000 stars (-40%)
+
+🎁 *Bonus NFT for every 5 spins purchased!*
+
+*Choose a pack:*
+""",
+        "keyboard": [
+            [("🎰 1 SPIN - 50 STARS", "buy_1_spin"), ("🎰 5 SPINS - 225 STARS", "buy_5_spins")],
+            [("🎰 10 SPINS - 400 STARS", "buy_10_spins"), ("🎰 25 SPINS - 900 STARS", "buy_25_spins")],
+            [("🎰 50 SPINS - 1600 STARS", "buy_50_spins"), ("💎 100 SPINS - 3000 STARS", "buy_100_spins")],
+            [("« BACK TO SHOP", "buy_stars")]
+        ]
+    },
+
+    "balance": {
+        "text": """
+👛 *YOUR BALANCE*
+
+💰 *Stars:* {stars_balance}
+   For: Lucky2, buying spins, shop
+
+🎰 *Spins:* {spins_balance}
+   For: Mono, Roulette (1 spin = 50 stars)
+
+📈 *Total deposited:* {total_deposited} stars
+📅 *Playing since:* {registration_date}
+
+*Quick actions:*
+""",
+        "keyboard": [
+            [("💰 TOP UP STARS", "buy_stars"), ("🎰 BUY SPINS", "buy_spins_menu")],
+            [("🔄 EXCHANGE STARS→SPINS", "exchange_stars"), ("💱 RATE: 50 STARS = 1 SPIN", "exchange_rate")],
+            [("📊 DETAILED STATS", "detailed_stats"), ("« BACK", "main_menu")]
+        ]
+    },
+
+    "profile": {
+        "text": """
+👤 *PLAYER PROFILE*
+
+*General:*
+ID: `{user_id}`
+Name: {first_name}
+Username: @{username}
+
+*Statistics:*
+🏆 Level: {level}
+⭐ Rating: {rating}
+🎮 Games played: {total_games}
+💰 Won: {total_won} stars
+📅 Playing for: {days_in_game} days
+
+*Balances:*
+🎰 Spins: {spins_balance}
+⭐ Stars: {stars_balance}
+
+*Achievements:* {achievements}
+""",
+        "keyboard": [
+            [("📊 FULL STATS", "full_stats"), ("🏆 ACHIEVEMENTS", "achievements")],
+            [{"text": "👥 SHARE PROFILE", "switch_inline_query": "My profile at Casino Royale!"},
+             ("🎁 MY NFTS", "my_nfts")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "stats": {
+        "text": """
+📊 *GAME STATISTICS*
+
+*Overall:*
+👥 Total players: {total_users}
+🎰 Total spins: {total_spins}
+💰 Total won: {total_won} stars
+🎁 NFTs awarded: {total_nfts}
+
+*Top 5 wins today:*
+{top_wins}
+
+*Your statistics:*
+🎰 Your spins: {user_spins}
+💰 Your winnings: {user_won} stars
+📊 Win Rate: {win_rate}%
+🥇 Rank: #{rank}
+""",
+        "keyboard": [
+            [("🏆 TOP PLAYERS", "top_players"), ("📈 CHARTS", "charts")],
+            [("🎮 MY STATS", "my_stats"), ("📊 STATS BY GAME", "games_stats")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "demo": {
+        "text": """
+🎮 *DEMO MODE*
+
+*All games available:*
+🎯 Mono - 10 demo spins
+🎨 Lucky2 - 1000 demo stars
+🎡 Roulette - 10 demo spins
+
+*Demo features:*
+• Virtual currency
+• Everything works as in the real game
+• No NFTs are awarded
+• Statistics are not saved
+
+*Goal:* Get to know the games before playing for real!
+""",
+        "keyboard": [
+            [{"text": "🎮 PLAY DEMO", "web_app": "{webapp_url}/demo.html?token={demo_token}"}],
+            [("📖 TUTORIAL", "tutorial"), ("💰 PLAY FOR REAL", "buy_stars")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "admin": {
+        "text": """
+⚙️ *ADMIN PANEL*
+
+*Functions:*
+📊 *Bot statistics* - general information
+👥 *Users* - search and management
+💰 *Finance* - revenue, payments
+🎁 *NFT* - gift statistics
+⚙️ *Settings* - game configuration
+
+*Quick commands:*
+/add_stars [user_id] [amount] - add stars
+/add_spins [user_id] [amount] - add spins
+/user_info [user_id] - user information
+/bot_stats - bot statistics
+""",
+        "keyboard": [
+            [("📊 BOT STATS", "admin_stats"), ("👥 USER MANAGEMENT", "admin_users")],
+            [("💰 FINANCE", "admin_finance"), ("🎁 NFT MANAGEMENT", "admin_nfts")],
+            [("⚙️ SETTINGS", "admin_settings"), ("📋 LOGS", "admin_logs")],
+            [("📉 HOUSE EXPOSURE", "admin_exposure"), ("🔥 PROFILING", "admin_profile")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "admin_stats": {
+        "text": """
+📊 *BOT STATS* - {period}
+
+👥 Active players: {active_users}
+🆕 New users: {new_users}
+
+🎰 Games: {games} (wins: {wins})
+💰 Wagered: {wagered} stars
+🏆 Paid out: {won} stars
+📈 GGR: {ggr} stars
+🎁 NFTs awarded: {nfts}
+
+*By game:*
+{per_game}
+
+_From rollups in {elapsed_ms} ms_
+""",
+        "keyboard": [
+            [("Today", "admin_stats_1"), ("7 days", "admin_stats_7"), ("30 days", "admin_stats_30")],
+            [("💰 FINANCE", "admin_finance"), ("« BACK", "main_menu")]
+        ]
+    },
+
+    "admin_finance": {
+        "text": """
+💰 *FINANCE* - {period}
+
+💳 Payments: {payments}
+💵 Revenue: {revenue}
+🎁 NFTs paid out: {nfts}
+
+*By product:*
+{per_product}
+
+_From rollups in {elapsed_ms} ms_
+""",
+        "keyboard": [
+            [("Today", "admin_finance_1"), ("7 days", "admin_finance_7"), ("30 days", "admin_finance_30")],
+            [("📊 STATS", "admin_stats"), ("« BACK", "main_menu")]
+        ]
+    },
+
+    "admin_exposure": {
+        "text": """
+📉 *HOUSE EXPOSURE*
+
+Bot and API wagers and payouts by minute, from the settlement log.
+Result is the house win (wagered minus paid).
+
+{windows}
+
+🏆 Largest payout since start: {largest} stars
+
+*Owner alerts:*
+💸 payout above {max_payout} stars
+📉 loss above {max_loss} stars in {loss_window} min
+🎰 RTP above {max_rtp} in {rtp_window} min
+""",
+        "keyboard": [
+            [("🔄 REFRESH", "admin_exposure"), ("💰 FINANCE", "admin_finance")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "admin_profile": {
+        "text": """
+🔥 *PROFILING*
+
+The sampling profiler records stacks of the running bot,
+including awaiting asyncio tasks. The result is sent as a
+collapsed stacks file (flamegraph.pl, speedscope).
+
+Owner only, one session at a time.
+""",
+        "keyboard": [
+            [("10 sec", "admin_profile_10"), ("30 sec", "admin_profile_30"), ("60 sec", "admin_profile_60")],
+            [("« BACK", "main_menu")]
+        ]
+    },
+
+    "exchange": {
+        "text": """
+🔄 *EXCHANGE STARS FOR SPINS*
+
+*Exchange rate:*
+50 stars = 1 spin
+1 spin = 50 stars
+
+*Your balance:*
+⭐ Stars: {stars_balance}
+🎰 Spins: {spins_balance}
+
+*Choose how many spins to buy:*
+""",
+        "keyboard": [
+            [("🎰 1 SPIN (50⭐)", "exchange_1"), ("🎰 5 SPINS (225⭐)", "exchange_5")],
+            [("🎰 10 SPINS (400⭐)", "exchange_10"), ("🎰 25 SPINS (900⭐)", "exchange_25")],
+            [("« BACK", "wallet")]
+        ]
+    }
+}
+
+# Short strings
+STRINGS = {
+    "no_admin_rights": "⛔ You do not have admin rights!",
+    "no_data": "No data",
+    "top_win": "{place}. @{username} - {multiplier}x",
+    "username_hidden": "hidden",
+    "no_achievements": "No achievements",
+    "period_today": "today",
+    "period_days": "last {days} days",
+    "stats_game_line": "• {game}: {games} games, wagered {wagered}, GGR {ggr} stars",
+    "finance_product_line": "• {product}: {payments} payments, {product_amount} units, {amount}",
+    "exposure_line": "• {game} {window}: {bets} bets, {wagered} → {paid}, result {result}, RTP {rtp}, max {max_payout}",
+    "achievement_unlocked": "{emoji} *New achievement: {name}*",
+    "daily_bonus_unlocked": "{emoji} *Daily bonus: {name}*",
+    "achievement_reward": "Reward: {stars} ⭐",
+    "profiler_owner_only": "⛔ Profiling is available to the owner only",
+    "profiler_busy": "⏳ Profiling is already running, wait for the result",
+    "profiler_started": "🔥 Profiling started for {seconds} sec",
+    "profiler_done": "🔥 Profile for {seconds} sec, samples: {samples}\nMost often running:\n{top}"
+}
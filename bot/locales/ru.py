@@ -0,0 +1,486 @@
+# Экраны бота на русском языке.
+# Текст - шаблон str.format с именованными полями, клавиатура - ряды кнопок:
+# (текст, callback_data) или словарь с web_app / switch_inline_query.
+
+SCREENS = {
+    "start": {
+        "text": """
+🎰 *Добро пожаловать в Casino Royale!*
+
+👤 *{first_name}*, рады видеть вас в нашем казино!
+
+*Доступные игры:*
+🎯 *МОНО* - Увеличивайте шанс выигрыша свайпом (1-65%)
+🎨 *LUCKY2* - Ставки на цвета с множителями до 5x
+🎡 *РУЛЕТКА* - Классическая игра
+
+*Ваш баланс:*
+🎰 Спины: {spins_balance}
+⭐ Stars: {stars_balance}
+
+*Используйте команды:*
+/menu - Главное меню
+/games - Выбор игры
+/buy - Пополнить баланс
+/balance - Проверить баланс
+""",
+        "keyboard": [
+            [("🎮 ГЛАВНОЕ МЕНЮ", "main_menu"), ("💰 ПОПОЛНИТЬ", "buy_stars")],
+            [("🎯 ИГРАТЬ В МОНО", "play_mono"), ("🎨 ИГРАТЬ В LUCKY2", "play_lucky2")],
+            [("📊 СТАТИСТИКА", "stats"), ("ℹ️ ПОМОЩЬ", "help")]
+        ]
+    },
+
+    "menu": {
+        "text": """
+🏠 *ГЛАВНОЕ МЕНЮ*
+
+👤 *{first_name}* | ID: `{user_id}`
+💰 Баланс: {stars_balance} stars
+🎰 Спины: {spins_balance}
+
+*Выберите действие:*
+""",
+        "keyboard": [
+            [("🎮 ИГРЫ", "games_menu"), ("👛 КОШЕЛЕК", "wallet")],
+            [("📊 ПРОФИЛЬ", "profile"), ("🏆 ЛИДЕРЫ", "leaders")],
+            [("🔄 ПОПОЛНИТЬ", "buy_stars"), ("🎁 ДЕМО", "demo_mode")],
+            [("📖 ПРАВИЛА", "rules"), ("👨‍💼 ПОДДЕРЖКА", "support")]
+        ]
+    },
+
+    "games": {
+        "text": """
+🎮 *ДОСТУПНЫЕ ИГРЫ*
+
+1️⃣ *МОНО* 🎯
+   Увеличивайте шанс выигрыша свайпом!
+   • Шанс: от 1% до 65%
+   • Множитель: от 1.54x до 100x
+   • NFT шанс: 0.5% при победе
+
+2️⃣ *LUCKY2* 🎨
+   Ставьте на цвета!
+   • Минимальная ставка: 25 stars
+   • Синий/Фиолетовый: x2
+   • Красный: x5 (редкий)
+
+3️⃣ *РУЛЕТКА* 🎡
+   Классическая игра
+   • 16 секторов
+   • Множители до 10x
+   • NFT каждые 5 спинов
+
+Выберите игру:
+""",
+        "keyboard": [
+            [("🎯 МОНО", "play_mono"), ("🎨 LUCKY2", "play_lucky2")],
+            [("🎡 РУЛЕТКА", "play_roulette"), ("🎮 ДЕМО ИГРЫ", "demo_games")],
+            [("📊 СТАТИСТИКА ИГР", "games_stats"), ("🏆 ТОП ИГРОКИ", "top_players")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "mono_no_spins": {
+        "text": """
+⚠️ *У вас нет спинов!*
+
+Для игры в Моно нужны спины:
+🎰 1 спин = 50 stars
+
+*Ваш баланс:*
+⭐ Stars: {stars_balance}
+🎰 Спины: {spins_balance}
+
+Выберите действие:
+""",
+        "keyboard": [
+            [("💰 КУПИТЬ СПИНЫ", "buy_spins"), ("🔄 ОБМЕНЯТЬ STARS", "exchange_stars")],
+            [("🎮 ДЕМО-РЕЖИМ", "demo_mono"), ("« НАЗАД", "games_menu")]
+        ]
+    },
+
+    "mono_info": {
+        "text": """
+🎯 *ИГРА МОНО - ПРАВИЛА*
+
+*Как играть:*
+1. Выберите шанс выигрыша от 1% до 65%
+2. Установите ставку (мин. зависит от шанса)
+3. Крутите колесо
+4. Если выпадает зеленый сектор - победа!
+
+*Минимальные ставки:*
+1% - 4 stars     15% - 60 stars
+3% - 12 stars    20% - 80 stars
+5% - 20 stars    25% - 100 stars
+7% - 28 stars    30% - 120 stars
+10% - 40 stars   65% - 260 stars
+
+*Множители:*
+1% = 100x    20% = 5x
+3% = 33x     25% = 4x
+5% = 20x     30% = 3.33x
+7% = 14.3x   40% = 2.5x
+10% = 10x    50% = 2x
+15% = 6.67x  65% = 1.54x
+
+🎰 *Ваш баланс спинов:* {spins_balance}
+""",
+        "keyboard": [
+            [{"text": "🎯 НАЧАТЬ ИГРУ", "web_app": "{webapp_url}/mono.html"}],
+            [("💰 КУПИТЬ СПИНЫ", "buy_spins"), ("📖 ПОДРОБНЫЕ ПРАВИЛА", "mono_rules")],
+            [("« НАЗАД", "games_menu")]
+        ]
+    },
+
+    "lucky2_no_stars": {
+        "text": """
+⚠️ *Недостаточно stars!*
+
+Для игры в Lucky2 нужно минимум 25 stars.
+
+*Ваш баланс:*
+⭐ Stars: {stars_balance}
+🎰 Спины: {spins_balance}
+
+Выберите действие:
+""",
+        "keyboard": [
+            [("💰 ПОПОЛНИТЬ BALANCE", "buy_stars"), ("🎮 ДРУГИЕ ИГРЫ", "games_menu")],
+            [("🎮 ДЕМО-РЕЖИМ", "demo_lucky2"), ("« НАЗАД", "games_menu")]
+        ]
+    },
+
+    "lucky2_info": {
+        "text": """
+🎨 *ИГРА LUCKY2 - ПРАВИЛА*
+
+*Как играть:*
+1. Выберите цвет для ставки:
+   • 🔵 Синий (60% шанс) → x2
+   • 🔴 Красный (5% шанс) → x5
+   • 🟣 Фиолетовый (35% шанс) → x2
+2. Выберите сумму ставки (от 25 stars)
+3. Крутите колесо
+4. Если выпадает ваш цвет - вы побеждаете!
+
+*Особенности:*
+• Красный цвет редкий, но дает x5
+• При проигрыше ставка сгорает
+• Можно ставить на несколько цветов одновременно
+• Максимальная ставка: 1000 stars
+
+*Вероятности:*
+🔵 Синий: 60%
+🔴 Красный: 5%
+🟣 Фиолетовый: 35%
+
+⭐ *Ваш баланс stars:* {stars_balance}
+""",
+        "keyboard": [
+            [{"text": "🎨 НАЧАТЬ ИГРУ", "web_app": "{webapp_url}/lucky2.html"}],
+            [("💰 ПОПОЛНИТЬ BALANCE", "buy_stars"), ("📖 ПОДРОБНЫЕ ПРАВИЛА", "lucky2_rules")],
+            [("« НАЗАД", "games_menu")]
+        ]
+    },
+
+    "buy": {
+        "text": """
+🛒 *МАГАЗИН*
+
+*STARS (для Lucky2 и покупок):*
+⭐ *50 stars* - 88 ₽ (1 star = 1.76 ₽)
+⭐ *250 stars* - 400 ₽ (1 star = 1.6 ₽) *-9%*
+⭐ *500 stars* - 750 ₽ (1 star = 1.5 ₽) *-15%*
+⭐ *1000 stars* - 1400 ₽ (1 star = 1.4 ₽) *-20%*
+💎 *2500 stars* - 3200 ₽ (1 star = 1.28 ₽) *-27%*
+
+*СПИНЫ (для Моно и Рулетки):*
+🎰 1 спин = 50 stars
+
+*Выберите продукт:*
+""",
+        "keyboard": [
+            [("⭐ 50 STARS - 88 ₽", "buy_50_stars"), ("⭐ 250 STARS - 400 ₽", "buy_250_stars")],
+            [("⭐ 500 STARS - 750 ₽", "buy_500_stars"), ("⭐ 1000 STARS - 1400 ₽", "buy_1000_stars")],
+            [("💎 2500 STARS - 3200 ₽", "buy_2500_stars"), ("🎰 КУПИТЬ СПИНЫ", "buy_spins_menu")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "buy_spins": {
+        "text": """
+🎰 *МАГАЗИН СПИНОВ*
+
+*Для игр Моно и Рулетка:*
+🎰 *1 спин* - 50 stars
+🎰 *5 спинов* - 225 stars (-10%)
+🎰 *10 спинов* - 400 stars (-20%)
+🎰 *25 спинов* - 900 stars (-28%)
+🎰 *50 спинов* - 1600 stars (-36%)
+💎 *100 спинов* - 3000 stars (-40%)
+
+🎁 *Бонус NFT за каждые 5 купленных спинов!*
+
+*Выберите пакет:*
+""",
+        "keyboard": [
+            [("🎰 1 СПИН - 50 STARS", "buy_1_spin"), ("🎰 5 СПИНОВ - 225 STARS", "buy_5_spins")],
+            [("🎰 10 СПИНОВ - 400 STARS", "buy_10_spins"), ("🎰 25 СПИНОВ - 900 STARS", "buy_25_spins")],
+            [("🎰 50 СПИНОВ - 1600 STARS", "buy_50_spins"), ("💎 100 СПИНОВ - 3000 STARS", "buy_100_spins")],
+            [("« НАЗАД В МАГАЗИН", "buy_stars")]
+        ]
+    },
+
+    "balance": {
+        "text": """
+👛 *ВАШ БАЛАНС*
+
+💰 *Stars:* {stars_balance}
+   Для: Lucky2, покупки спинов, магазин
+
+🎰 *Спины:* {spins_balance}
+   Для: Моно, Рулетка (1 спин = 50 stars)
+
+📈 *Всего пополнено:* {total_deposited} stars
+📅 *Играет с:* {registration_date}
+
+*Быстрые действия:*
+""",
+        "keyboard": [
+            [("💰 ПОПОЛНИТЬ STARS", "buy_stars"), ("🎰 КУПИТЬ СПИНЫ", "buy_spins_menu")],
+            [("🔄 ОБМЕНЯТЬ STARS→СПИНЫ", "exchange_stars"), ("💱 КУРС: 50 STARS = 1 СПИН", "exchange_rate")],
+            [("📊 ПОДРОБНАЯ СТАТИСТИКА", "detailed_stats"), ("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "profile": {
+        "text": """
+👤 *ПРОФИЛЬ ИГРОКА*
+
+*Основное:*
+ID: `{user_id}`
+Имя: {first_name}
+Юзернейм: @{username}
+
+*Статистика:*
+🏆 Уровень: {level}
+⭐ Рейтинг: {rating}
+🎮 Всего игр: {total_games}
+💰 Выиграно: {total_won} stars
+📅 В игре: {days_in_game} дней
+
+*Балансы:*
+🎰 Спины: {spins_balance}
+⭐ Stars: {stars_balance}
+
+*Достижения:* {achievements}
+""",
+        "keyboard": [
+            [("📊 ПОЛНАЯ СТАТИСТИКА", "full_stats"), ("🏆 ДОСТИЖЕНИЯ", "achievements")],
+            [{"text": "👥 ПОДЕЛИТЬСЯ ПРОФИЛЕМ", "switch_inline_query": "Мой профиль в Casino Royale!"},
+             ("🎁 МОИ NFT", "my_nfts")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "stats": {
+        "text": """
+📊 *СТАТИСТИКА ИГРЫ*
+
+*Общая статистика:*
+👥 Всего игроков: {total_users}
+🎰 Всего спинов: {total_spins}
+💰 Общий выигрыш: {total_won} stars
+🎁 Выдано NFT: {total_nfts}
+
+*Топ-5 побед за сегодня:*
+{top_wins}
+
+*Ваша статистика:*
+🎰 Ваши спины: {user_spins}
+💰 Ваш выигрыш: {user_won} stars
+📊 Win Rate: {win_rate}%
+🥇 Место в рейтинге: #{rank}
+""",
+        "keyboard": [
+            [("🏆 ТОП ИГРОКИ", "top_players"), ("📈 ГРАФИКИ", "charts")],
+            [("🎮 МОЯ СТАТИСТИКА", "my_stats"), ("📊 СТАТИСТИКА ПО ИГРАМ", "games_stats")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "demo": {
+        "text": """
+🎮 *ДЕМО-РЕЖИМ*
+
+*Доступны все игры:*
+🎯 Моно - 10 демо-спинов
+🎨 Lucky2 - 1000 демо-stars
+🎡 Рулетка - 10 демо-спинов
+
+*Особенности демо:*
+• Виртуальная валюта
+• Все функции как в реальной игре
+• NFT не начисляются
+• Статистика не сохраняется
+
+*Цель:* Познакомиться с играми перед реальной игрой!
+""",
+        "keyboard": [
+            [{"text": "🎮 ИГРАТЬ В ДЕМО-РЕЖИМЕ", "web_app": "{webapp_url}/demo.html?token={demo_token}"}],
+            [("📖 ОБУЧЕНИЕ", "tutorial"), ("💰 ИГРАТЬ НА РЕАЛ", "buy_stars")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "admin": {
+        "text": """
+⚙️ *АДМИН-ПАНЕЛЬ*
+
+*Доступные функции:*
+📊 *Статистика бота* - общая информация
+👥 *Пользователи* - поиск и управление
+💰 *Финансы* - доходы, платежи
+🎁 *NFT* - статистика подарков
+⚙️ *Настройки* - конфигурация игры
+
+*Быстрые команды:*
+/add_stars [user_id] [amount] - добавить stars
+/add_spins [user_id] [amount] - добавить спины
+/user_info [user_id] - информация о пользователе
+/bot_stats - статистика бота
+""",
+        "keyboard": [
+            [("📊 СТАТИСТИКА БОТА", "admin_stats"), ("👥 УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ", "admin_users")],
+            [("💰 ФИНАНСОВАЯ СТАТИСТИКА", "admin_finance"), ("🎁 УПРАВЛЕНИЕ NFT", "admin_nfts")],
+            [("⚙️ НАСТРОЙКИ", "admin_settings"), ("📋 ЛОГИ", "admin_logs")],
+            [("📉 РИСК КАЗИНО", "admin_exposure"), ("🔥 ПРОФИЛИРОВАНИЕ", "admin_profile")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "admin_stats": {
+        "text": """
+📊 *СТАТИСТИКА БОТА* - {period}
+
+👥 Активных игроков: {active_users}
+🆕 Новых пользователей: {new_users}
+
+🎰 Игр: {games} (побед: {wins})
+💰 Ставки: {wagered} stars
+🏆 Выплаты: {won} stars
+📈 GGR: {ggr} stars
+🎁 Выдано NFT: {nfts}
+
+*По играм:*
+{per_game}
+
+_Из сводок за {elapsed_ms} мс_
+""",
+        "keyboard": [
+            [("Сегодня", "admin_stats_1"), ("7 дней", "admin_stats_7"), ("30 дней", "admin_stats_30")],
+            [("💰 ФИНАНСЫ", "admin_finance"), ("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "admin_finance": {
+        "text": """
+💰 *ФИНАНСОВАЯ СТАТИСТИКА* - {period}
+
+💳 Платежей: {payments}
+💵 Выручка: {revenue}
+🎁 Выплачено NFT: {nfts}
+
+*По продуктам:*
+{per_product}
+
+_Из сводок за {elapsed_ms} мс_
+""",
+        "keyboard": [
+            [("Сегодня", "admin_finance_1"), ("7 дней", "admin_finance_7"), ("30 дней", "admin_finance_30")],
+            [("📊 СТАТИСТИКА", "admin_stats"), ("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "admin_exposure": {
+        "text": """
+📉 *РИСК КАЗИНО*
+
+Ставки и выплаты бота и API по минутам из журнала расчетов.
+Результат - выигрыш казино (ставки минус выплаты).
+
+{windows}
+
+🏆 Крупнейшая выплата с запуска: {largest} stars
+
+*Алерты владельцу:*
+💸 выплата больше {max_payout} stars
+📉 убыток больше {max_loss} stars за {loss_window} мин
+🎰 RTP выше {max_rtp} за {rtp_window} мин
+""",
+        "keyboard": [
+            [("🔄 ОБНОВИТЬ", "admin_exposure"), ("💰 ФИНАНСЫ", "admin_finance")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "admin_profile": {
+        "text": """
+🔥 *ПРОФИЛИРОВАНИЕ*
+
+Семплирующий профайлер снимает стеки работающего бота,
+включая ожидающие задачи asyncio. Результат придет файлом
+в формате collapsed stacks (flamegraph.pl, speedscope).
+
+Доступно только владельцу, одна сессия за раз.
+""",
+        "keyboard": [
+            [("10 сек", "admin_profile_10"), ("30 сек", "admin_profile_30"), ("60 сек", "admin_profile_60")],
+            [("« НАЗАД", "main_menu")]
+        ]
+    },
+
+    "exchange": {
+        "text": """
+🔄 *ОБМЕН STARS НА СПИНЫ*
+
+*Курс обмена:*
+50 stars = 1 спин
+1 спин = 50 stars
+
+*Ваш баланс:*
+⭐ Stars: {stars_balance}
+🎰 Спины: {spins_balance}
+
+*Выберите количество спинов для покупки:*
+""",
+        "keyboard": [
+            [("🎰 1 СПИН (50⭐)", "exchange_1"), ("🎰 5 СПИНОВ (225⭐)", "exchange_5")],
+            [("🎰 10 СПИНОВ (400⭐)", "exchange_10"), ("🎰 25 СПИНОВ (900⭐)", "exchange_25")],
+            [("« НАЗАД", "wallet")]
+        ]
+    }
+}
+
+# Короткие строки
+STRINGS = {
+    "no_admin_rights": "⛔ У вас нет прав администратора!",
+    "no_data": "Нет данных",
+    "top_win": "{place}. @{username} - {multiplier}x",
+    "username_hidden": "скрыт",
+    "no_achievements": "Нет достижений",
+    "period_today": "сегодня",
+    "period_days": "за {days} дн.",
+    "stats_game_line": "• {game}: {games} игр, ставки {wagered}, GGR {ggr} stars",
+    "finance_product_line": "• {product}: {payments} платежей, {product_amount} ед., {amount}",
+    "exposure_line": "• {game} {window}: {bets} ставок, {wagered} → {paid}, результат {result}, RTP {rtp}, макс. {max_payout}",
+    "achievement_unlocked": "{emoji} *Новое достижение: {name}*",
+    "daily_bonus_unlocked": "{emoji} *Ежедневный бонус: {name}*",
+    "achievement_reward": "Награда: {stars} ⭐",
+    "profiler_owner_only": "⛔ Профилирование доступно только владельцу",
+    "profiler_busy": "⏳ Профилирование уже идет, дождитесь результата",
+    "profiler_started": "🔥 Профилирование запущено на {seconds} сек",
+    "profiler_done": "🔥 Профиль за {seconds} сек, семплов: {samples}\nЧаще всего выполнялись:\n{top}"
+}
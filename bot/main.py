@@ -3,7 +3,7 @@ import logging
 import asyncio
 import json
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from telegram import (
     Update, 
@@ -23,12 +23,35 @@ from telegram.ext import (
     MessageHandler,
     filters,
     ContextTypes,
-    ConversationHandler
+    ConversationHandler,
+    TypeHandler
 )
+from telegram.request import BaseRequest, HTTPXRequest
+
+import redis.asyncio as aioredis
 
 from config import Config
 from database import Database
+from cache import BalanceCache
+from leaderboard import Leaderboard
+from rollups import StatsRollup
+from exposure import ExposureConsumer, create_exposure_monitor
+from events import EventPipeline, HistoryConsumer, LeaderboardConsumer, NotificationConsumer
+from achievements import AchievementConsumer
+from state_store import create_state_store
+from rate_limit import create_rate_limiter
 from payments import PaymentSystem
+from sender import MessageSender
+from push import create_push_service
+from webapp_data import WebAppDataHandler
+from metrics import CasinoMetrics, MetricsServer
+from tracing import create_tracer
+from query_inspector import create_query_inspector
+from profiler import ProfilerSessions, MAX_SECONDS as MAX_PROFILE_SECONDS
+from router import CallbackRouter
+from templates import TemplateRenderer
+from webhook import PerUserUpdateProcessor, WebhookServer
+from inventory import InventorySystem
 from games.mono import MonoGame
 from games.lucky2 import Lucky2Game
 
@@ -39,30 +62,176 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Самый длинный период статистики в админ-панели, дни
+MAX_STATS_DAYS = 366
+
+
+def format_amount(amount: int, currency: Optional[str]) -> str:
+    """Сумма платежей: копейки -> рубли, Telegram Stars без дробной части"""
+    if currency == "XTR":
+        return f"{amount} ⭐"
+    return f"{amount / 100:,.2f} {currency or ''}".strip()
+
 # Состояния для ConversationHandler
 SELECTING_GAME, SELECTING_BET, CONFIRMING_SPIN = range(3)
 
 class CasinoBot:
-    def __init__(self):
+    def __init__(self, request: Optional[BaseRequest] = None):
         self.config = Config()
-        self.db = Database(self.config.DB_URL)
-        self.payments = PaymentSystem(self.config.PROVIDER_TOKEN, self.db)
-        self.mono_game = MonoGame(self.db)
+        
+        # Трассировка обновлений: без TRACE_FILE и TRACE_OTLP_URL выключена
+        self.tracer = create_tracer(os.getenv("TRACE_FILE"), os.getenv("TRACE_OTLP_URL"))
+        
+        # Redis: кэш балансов и профилей перед Postgres
+        redis_url = os.getenv("REDIS_URL")
+        self.redis = aioredis.from_url(redis_url) if redis_url else None
+        self.tracer.instrument_redis(self.redis)
+        self.cache = BalanceCache(self.redis) if self.redis else None
+        
+        self.db = Database(self.config.DB_URL, cache=self.cache)
+        self.tracer.instrument_database(self.db)
+        
+        # Изменения балансов публикуются в WebSocket клиентов API через Redis
+        self.push = create_push_service(self.redis) if self.redis else None
+        if self.push:
+            self.db.row_listeners.append(self.push.balance_changed)
+        
+        # Лидерборды на отсортированных множествах Redis
+        self.leaderboard = Leaderboard(self.redis, self.db) if self.redis else None
+        
+        # Почасовые и дневные сводки для /bot_stats и финансовой статистики
+        self.rollups = StatsRollup(self.db)
+        
+        self.inventory = InventorySystem(self.db)
+        self.mono_game = MonoGame(self.db, self.inventory)
         self.lucky2_game = Lucky2Game(self.db)
         
+        # Журнал расчетов: история, статистика, лидерборд и уведомления
+        # обновляются потребителями вне транзакции ставки
+        self.events = EventPipeline(self.db, [HistoryConsumer(self.db)])
+        if self.leaderboard:
+            self.events.add(LeaderboardConsumer(self.leaderboard))
+        if self.push:
+            self.events.add(NotificationConsumer(self.push))
+        
+        # Достижения и ежедневные бонусы по счетчикам из журнала расчетов
+        self.achievements = AchievementConsumer(self.db)
+        self.achievements.unlock_listeners.append(self.achievement_unlocked)
+        self.events.add(self.achievements)
+        
+        # Риск казино: ставки и выплаты по минутам из журнала расчетов,
+        # то есть и ставки, сделанные через API
+        self.exposure = create_exposure_monitor()
+        self.exposure_consumer = ExposureConsumer(self.exposure)
+        self.events.add(self.exposure_consumer)
+        
+        # Метрики Prometheus: без METRICS_PORT обертки не ставятся вовсе
+        self.metrics_port = os.getenv("METRICS_PORT")
+        self.metrics = CasinoMetrics(enabled=bool(self.metrics_port))
+        self.metrics_server: Optional[MetricsServer] = None
+        self.metrics.instrument_database(self.db)
+        self.metrics.instrument_game(self.mono_game, "mono", ("spin",))
+        self.metrics.instrument_game(self.lucky2_game, "lucky2", ("bet", "multi_bet"))
+        
+        # Данные из WebApp (sendData): проверка и запуск игрового действия
+        self.web_app_data = WebAppDataHandler(self.mono_game, push=self.push)
+        
+        # Параллельная обработка обновлений: разные пользователи - одновременно,
+        # обновления одного пользователя - по порядку
+        self.update_processor = PerUserUpdateProcessor(
+            int(os.getenv("MAX_CONCURRENT_UPDATES", "64")),
+            tracer=self.tracer
+        )
+        
+        # Повторяющиеся и медленные запросы к БД (только DEV_MODE)
+        self.query_inspector = create_query_inspector()
+        if self.query_inspector.enabled:
+            self.update_processor.update_hooks.append(self.query_inspector.inspect_update)
+        
+        # Профилирование работающего процесса по кнопке владельца
+        self.profiler_sessions = ProfilerSessions()
+        
         # Инициализация приложения Telegram
-        self.application = Application.builder() \
+        builder = Application.builder() \
             .token(self.config.BOT_TOKEN) \
-            .build()
+            .concurrent_updates(self.update_processor) \
+            .post_init(self.post_init)
+        
+        # Свой транспорт Bot API (нагрузочные прогоны без сети)
+        if self.tracer.enabled:
+            request = self.tracer.wrap_request(request or HTTPXRequest(connection_pool_size=256))
+        if request is not None:
+            builder = builder.request(request)
+        
+        # Альтернативный Bot API (локальный сервер или фейковый Telegram для тестов)
+        api_url = os.getenv("TELEGRAM_API_URL")
+        if api_url:
+            builder = builder \
+                .base_url(f"{api_url}/bot") \
+                .base_file_url(f"{api_url}/file/bot")
+        
+        self.application = builder.build()
+        
+        # Платежи используют бота приложения и его пул соединений
+        self.payments = PaymentSystem(
+            self.config.PROVIDER_TOKEN,
+            self.db,
+            bot=self.application.bot
+        )
+        self.metrics.instrument_payments(self.payments)
+        self.payments.review_listeners.append(
+            lambda text: self.sender.notify(self.config.OWNER_ID, text, coalesce=False)
+        )
         
-        # Состояния пользователей
-        self.user_states = {}
+        # Уведомления и рассылки идут через общую очередь с лимитами Telegram
+        self.sender = MessageSender(self.application.bot)
+        self.metrics.gauge("casino_sender_messages", "Счетчики очереди исходящих сообщений",
+                           lambda: self.sender.stats, labelnames=("event",))
+        self.metrics.gauge("casino_update_backlog", "Обновления в обработке",
+                           lambda: self.update_processor.pending)
+        self.metrics.gauge("casino_event_consumer_processed", "Обработанные события журнала расчетов",
+                           lambda: self.events.processed, labelnames=("consumer",))
+        self.metrics.gauge("casino_event_consumer_dead_letters", "События, отложенные в event_dead_letters",
+                           lambda: self.events.dead_lettered, labelnames=("consumer",))
+        
+        # Алерты риска владельцу и в метрики
+        self.exposure.alert_listeners.append(
+            lambda text: self.sender.notify(self.config.OWNER_ID, text, coalesce=False)
+        )
+        self.metrics.instrument_exposure(self.exposure)
+        
+        # Маршрутизатор callback кнопок
+        self.router = CallbackRouter()
+        
+        # Экраны бота компилируются один раз при запуске
+        self.templates = TemplateRenderer(
+            default_language=os.getenv("DEFAULT_LANGUAGE", "ru")
+        )
+        
+        # Ограничение частоты команд, кнопок и игровых действий
+        self.rate_limiter = create_rate_limiter(self.redis)
+        
+        # Состояния пользователей: ограниченное хранилище с TTL,
+        # общее для всех процессов бота при наличии Redis
+        self.user_states = create_state_store(
+            self.redis,
+            ttl=int(os.getenv("USER_STATE_TTL", "3600"))
+        )
+        # Размер, вытеснения и попадания хранилища (для Redis - только попадания и ошибки)
+        self.metrics.gauge("casino_user_states", "Счетчики хранилища состояний пользователей",
+                           lambda: {
+                               stat: value for stat, value in self.user_states.stats().items()
+                               if isinstance(value, (int, float))
+                           }, labelnames=("stat",))
         
         logger.info("Casino Bot инициализирован")
     
     def setup_handlers(self):
         """Регистрация всех обработчиков"""
         
+        # Лимитер запускается до всех обработчиков
+        self.application.add_handler(TypeHandler(Update, self.rate_limiter), group=-1)
+        
         # Обработчики команд
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
@@ -84,6 +253,7 @@ class CasinoBot:
         ))
         
         # Обработчики callback кнопок
+        self.setup_callback_routes()
         self.application.add_handler(CallbackQueryHandler(self.button_handler))
         
         # Обработчики Web App данных
@@ -96,371 +266,169 @@ class CasinoBot:
         self.application.add_handler(CommandHandler("add_spins", self.add_spins_command))
         self.application.add_handler(CommandHandler("user_info", self.user_info_command))
         self.application.add_handler(CommandHandler("bot_stats", self.bot_stats_command))
+        self.application.add_handler(CommandHandler("broadcast", self.broadcast_command))
+        
+        self.metrics.instrument_handlers(self.application)
+        self.tracer.instrument_handlers(self.application)
         
         logger.info("Обработчики зарегистрированы")
     
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик команды /start"""
-        user = update.effective_user
-        user_id = user.id
+    async def post_init(self, application: Application):
+        """Фоновые задачи после инициализации приложения"""
+        if self.leaderboard:
+            application.create_task(self.leaderboard.run_nightly_rebuild())
         
-        logger.info(f"Новый пользователь: {user_id} - {user.first_name}")
+        application.create_task(self.rollups.run_periodically())
         
-        # Регистрируем пользователя в базе данных
-        await self.db.register_user(user_id, user.username, user.first_name)
-        
-        # Устанавливаем меню кнопку Web App
-        await self.setup_webapp_menu(user_id)
-        
-        # Отправляем приветственное сообщение
-        welcome_text = f"""
-🎰 *Добро пожаловать в Casino Royale!*
-
-👤 *{user.first_name}*, рады видеть вас в нашем казино!
-
-*Доступные игры:*
-🎯 *МОНО* - Увеличивайте шанс выигрыша свайпом (1-65%)
-🎨 *LUCKY2* - Ставки на цвета с множителями до 5x
-🎡 *РУЛЕТКА* - Классическая игра
-
-*Ваш баланс:*
-🎰 Спины: {await self.db.get_spins_balance(user_id)}
-⭐ Stars: {await self.db.get_stars_balance(user_id)}
-
-*Используйте команды:*
-/menu - Главное меню
-/games - Выбор игры
-/buy - Пополнить баланс
-/balance - Проверить баланс
-        """
-        
-        # Создаем клавиатуру с кнопками
-        keyboard = [
-            [
-                InlineKeyboardButton("🎮 ГЛАВНОЕ МЕНЮ", callback_data="main_menu"),
-                InlineKeyboardButton("💰 ПОПОЛНИТЬ", callback_data="buy_stars")
-            ],
-            [
-                InlineKeyboardButton("🎯 ИГРАТЬ В МОНО", callback_data="play_mono"),
-                InlineKeyboardButton("🎨 ИГРАТЬ В LUCKY2", callback_data="play_lucky2")
-            ],
-            [
-                InlineKeyboardButton("📊 СТАТИСТИКА", callback_data="stats"),
-                InlineKeyboardButton("ℹ️ ПОМОЩЬ", callback_data="help")
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(
-            welcome_text,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
+        # Монитор риска в памяти: заново набираем его окна из журнала
+        try:
+            await self.exposure_consumer.rewind(self.events)
+        except Exception as e:
+            logger.error(f"Ошибка перемотки монитора риска: {e}")
+        application.create_task(self.events.run())
+        
+        if self.metrics_port and self.metrics_server is None:
+            self.metrics_server = MetricsServer(
+                self.metrics.registry,
+                host=os.getenv("METRICS_HOST", "127.0.0.1"),
+                port=int(self.metrics_port)
+            )
+            await self.metrics_server.start()
+    
+    async def run_webhook(self):
+        """Запуск бота в режиме webhook"""
+        webhook_url = os.getenv("WEBHOOK_URL")
+        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+        secret_token = os.getenv("WEBHOOK_SECRET")
+        
+        await self.db.initialize()
+        self.tracer.instrument_pool(self.db)
+        self.query_inspector.instrument_pool(self.db)
+        self.setup_handlers()
+        
+        server = WebhookServer(
+            self.application,
+            self.update_processor,
+            path=webhook_path,
+            secret_token=secret_token,
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT", "8443")),
+            max_pending=int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))
         )
         
-        logger.info(f"Приветственное сообщение отправлено пользователю {user_id}")
+        async with self.application:
+            await self.post_init(self.application)
+            await self.application.start()
+            
+            if webhook_url:
+                await self.application.bot.set_webhook(
+                    url=f"{webhook_url}{webhook_path}",
+                    secret_token=secret_token,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            
+            await server.start()
+            logger.info("Бот запущен в режиме webhook")
+            
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await server.stop()
+                self.events.stop()
+                await self.payments.close()
+                await self.sender.close()
+                if self.metrics_server:
+                    await self.metrics_server.stop()
+                await self.tracer.close()
+                await self.application.stop()
+                await self.query_inspector.close()
+                await self.db.close()
     
-    async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Команда /menu - главное меню"""
-        user = update.effective_user
-        user_id = user.id
-        
-        # Получаем баланс пользователя
-        stars_balance = await self.db.get_stars_balance(user_id)
-        spins_balance = await self.db.get_spins_balance(user_id)
-        
-        menu_text = f"""
-🏠 *ГЛАВНОЕ МЕНЮ*
-
-👤 *{user.first_name}* | ID: `{user_id}`
-💰 Баланс: {stars_balance} stars
-🎰 Спины: {spins_balance}
-
-*Выберите действие:*
+    async def load_user_data(self, update: Update) -> Tuple[str, Dict]:
         """
+        Язык и данные пользователя для экранов
         
-        keyboard = [
-            [
-                InlineKeyboardButton("🎮 ИГРЫ", callback_data="games_menu"),
-                InlineKeyboardButton("👛 КОШЕЛЕК", callback_data="wallet")
-            ],
-            [
-                InlineKeyboardButton("📊 ПРОФИЛЬ", callback_data="profile"),
-                InlineKeyboardButton("🏆 ЛИДЕРЫ", callback_data="leaders")
-            ],
-            [
-                InlineKeyboardButton("🔄 ПОПОЛНИТЬ", callback_data="buy_stars"),
-                InlineKeyboardButton("🎁 ДЕМО", callback_data="demo_mode")
-            ],
-            [
-                InlineKeyboardButton("📖 ПРАВИЛА", callback_data="rules"),
-                InlineKeyboardButton("👨‍💼 ПОДДЕРЖКА", callback_data="support")
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        Строка users читается одним запросом (через кэш балансов),
+        вместо отдельных запросов на каждое поле.
+        """
+        user = update.effective_user
+        row = await self.db.get_user_row(user.id) or {}
+        
+        data = {
+            "stars_balance": 0,
+            "spins_balance": 0,
+            "total_deposited": 0,
+            "total_won": 0,
+            "total_games": 0,
+            **row,
+            "user_id": user.id,
+            "first_name": user.first_name,
+            "username": user.username,
+            "webapp_url": self.config.WEBAPP_URL
+        }
+        return self.templates.language(user.language_code), data
+    
+    async def send_screen(self, update: Update, screen: str, language: str,
+                          data: Optional[Dict] = None):
+        """Отправить экран: отредактировать сообщение кнопки или ответить на команду"""
+        text, reply_markup = self.templates.render(screen, language, data)
         
         if update.callback_query:
             await update.callback_query.edit_message_text(
-                menu_text,
+                text,
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
         else:
-            await update.message.reply_text(
-                menu_text,
+            await update.effective_message.reply_text(
+                text,
                 reply_markup=reply_markup,
                 parse_mode='Markdown'
             )
     
-    async def games_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Команда /games - меню игр"""
-        games_text = """
-🎮 *ДОСТУПНЫЕ ИГРЫ*
-
-1️⃣ *МОНО* 🎯
-   Увеличивайте шанс выигрыша свайпом!
-   • Шанс: от 1% до 65%
-   • Множитель: от 1.54x до 100x
-   • NFT шанс: 0.5% при победе
-
-2️⃣ *LUCKY2* 🎨
-   Ставьте на цвета!
-   • Минимальная ставка: 25 stars
-   • Синий/Фиолетовый: x2
-   • Красный: x5 (редкий)
-
-3️⃣ *РУЛЕТКА* 🎡
-   Классическая игра
-   • 16 секторов
-   • Множители до 10x
-   • NFT каждые 5 спинов
-
-Выберите игру:
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("🎯 МОНО", callback_data="play_mono"),
-                InlineKeyboardButton("🎨 LUCKY2", callback_data="play_lucky2")
-            ],
-            [
-                InlineKeyboardButton("🎡 РУЛЕТКА", callback_data="play_roulette"),
-                InlineKeyboardButton("🎮 ДЕМО ИГРЫ", callback_data="demo_games")
-            ],
-            [
-                InlineKeyboardButton("📊 СТАТИСТИКА ИГР", callback_data="games_stats"),
-                InlineKeyboardButton("🏆 ТОП ИГРОКИ", callback_data="top_players")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
-        
-        if update.callback_query:
-            await update.callback_query.edit_message_text(
-                games_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        else:
-            await update.message.reply_text(
-                games_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-    
-    async def mono_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Команда /mono - запуск игры Моно"""
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /start"""
         user = update.effective_user
         user_id = user.id
         
-        # Проверяем баланс спинов
-        spins_balance = await self.db.get_spins_balance(user_id)
+        logger.info(f"Новый пользователь: {user_id} - {user.first_name}")
         
-        if spins_balance <= 0:
-            # У пользователя нет спинов
-            no_spins_text = """
-⚠️ *У вас нет спинов!*
-
-Для игры в Моно нужны спины:
-🎰 1 спин = 50 stars
-
-*Ваш баланс:*
-⭐ Stars: {stars_balance}
-🎰 Спины: {spins_balance}
-
-Выберите действие:
-            """.format(
-                stars_balance=await self.db.get_stars_balance(user_id),
-                spins_balance=spins_balance
-            )
-            
-            keyboard = [
-                [
-                    InlineKeyboardButton("💰 КУПИТЬ СПИНЫ", callback_data="buy_spins"),
-                    InlineKeyboardButton("🔄 ОБМЕНЯТЬ STARS", callback_data="exchange_stars")
-                ],
-                [
-                    InlineKeyboardButton("🎮 ДЕМО-РЕЖИМ", callback_data="demo_mono"),
-                    InlineKeyboardButton("« НАЗАД", callback_data="games_menu")
-                ]
-            ]
-            
-            await update.message.reply_text(
-                no_spins_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-            return
+        # Регистрируем пользователя в базе данных
+        await self.db.register_user(user_id, user.username, user.first_name)
         
-        # У пользователя есть спины - открываем Web App
-        web_app_url = f"{self.config.WEBAPP_URL}/mono.html?user_id={user_id}"
+        # Устанавливаем меню кнопку Web App
+        await self.setup_webapp_menu(user_id)
         
-        # Информация об игре Моно
-        mono_info = """
-🎯 *ИГРА МОНО - ПРАВИЛА*
-
-*Как играть:*
-1. Выберите шанс выигрыша от 1% до 65%
-2. Установите ставку (мин. зависит от шанса)
-3. Крутите колесо
-4. Если выпадает зеленый сектор - победа!
-
-*Минимальные ставки:*
-1% - 4 stars     15% - 60 stars
-3% - 12 stars    20% - 80 stars
-5% - 20 stars    25% - 100 stars
-7% - 28 stars    30% - 120 stars
-10% - 40 stars   65% - 260 stars
-
-*Множители:*
-1% = 100x    20% = 5x
-3% = 33x     25% = 4x
-5% = 20x     30% = 3.33x
-7% = 14.3x   40% = 2.5x
-10% = 10x    50% = 2x
-15% = 6.67x  65% = 1.54x
-
-🎰 *Ваш баланс спинов:* {spins_balance}
-        """.format(spins_balance=spins_balance)
-        
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎯 НАЧАТЬ ИГРУ",
-                    web_app=WebAppInfo(url=web_app_url)
-                )
-            ],
-            [
-                InlineKeyboardButton("💰 КУПИТЬ СПИНЫ", callback_data="buy_spins"),
-                InlineKeyboardButton("📖 ПОДРОБНЫЕ ПРАВИЛА", callback_data="mono_rules")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="games_menu")
-            ]
-        ]
+        language, data = await self.load_user_data(update)
+        await self.send_screen(update, "start", language, data)
         
-        await update.message.reply_text(
-            mono_info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        logger.info(f"Приветственное сообщение отправлено пользователю {user_id}")
+    
+    async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /menu - главное меню"""
+        language, data = await self.load_user_data(update)
+        await self.send_screen(update, "menu", language, data)
+    
+    async def games_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /games - меню игр"""
+        language = self.templates.language(update.effective_user.language_code)
+        await self.send_screen(update, "games", language)
+    
+    async def mono_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /mono - запуск игры Моно"""
+        language, data = await self.load_user_data(update)
+        
+        # Без спинов предлагаем купить или обменять stars, иначе - открыть Web App
+        screen = "mono_info" if data["spins_balance"] > 0 else "mono_no_spins"
+        await self.send_screen(update, screen, language, data)
     
     async def lucky2_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /lucky2 - запуск игры Lucky2"""
-        user = update.effective_user
-        user_id = user.id
-        
-        # Проверяем баланс stars
-        stars_balance = await self.db.get_stars_balance(user_id)
-        
-        if stars_balance < 25:
-            # У пользователя недостаточно stars
-            no_stars_text = """
-⚠️ *Недостаточно stars!*
-
-Для игры в Lucky2 нужно минимум 25 stars.
-
-*Ваш баланс:*
-⭐ Stars: {stars_balance}
-🎰 Спины: {spins_balance}
-
-Выберите действие:
-            """.format(
-                stars_balance=stars_balance,
-                spins_balance=await self.db.get_spins_balance(user_id)
-            )
-            
-            keyboard = [
-                [
-                    InlineKeyboardButton("💰 ПОПОЛНИТЬ BALANCE", callback_data="buy_stars"),
-                    InlineKeyboardButton("🎮 ДРУГИЕ ИГРЫ", callback_data="games_menu")
-                ],
-                [
-                    InlineKeyboardButton("🎮 ДЕМО-РЕЖИМ", callback_data="demo_lucky2"),
-                    InlineKeyboardButton("« НАЗАД", callback_data="games_menu")
-                ]
-            ]
-            
-            await update.message.reply_text(
-                no_stars_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-            return
-        
-        # У пользователя достаточно stars - открываем Web App
-        web_app_url = f"{self.config.WEBAPP_URL}/lucky2.html?user_id={user_id}"
+        language, data = await self.load_user_data(update)
         
-        # Информация об игре Lucky2
-        lucky2_info = """
-🎨 *ИГРА LUCKY2 - ПРАВИЛА*
-
-*Как играть:*
-1. Выберите цвет для ставки:
-   • 🔵 Синий (60% шанс) → x2
-   • 🔴 Красный (5% шанс) → x5
-   • 🟣 Фиолетовый (35% шанс) → x2
-2. Выберите сумму ставки (от 25 stars)
-3. Крутите колесо
-4. Если выпадает ваш цвет - вы побеждаете!
-
-*Особенности:*
-• Красный цвет редкий, но дает x5
-• При проигрыше ставка сгорает
-• Можно ставить на несколько цветов одновременно
-• Максимальная ставка: 1000 stars
-
-*Вероятности:*
-🔵 Синий: 60%
-🔴 Красный: 5% 
-🟣 Фиолетовый: 35%
-
-⭐ *Ваш баланс stars:* {stars_balance}
-        """.format(stars_balance=stars_balance)
-        
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎨 НАЧАТЬ ИГРУ",
-                    web_app=WebAppInfo(url=web_app_url)
-                )
-            ],
-            [
-                InlineKeyboardButton("💰 ПОПОЛНИТЬ BALANCE", callback_data="buy_stars"),
-                InlineKeyboardButton("📖 ПОДРОБНЫЕ ПРАВИЛА", callback_data="lucky2_rules")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="games_menu")
-            ]
-        ]
-        
-        await update.message.reply_text(
-            lucky2_info,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        # Минимальная ставка - 25 stars
+        screen = "lucky2_info" if data["stars_balance"] >= 25 else "lucky2_no_stars"
+        await self.send_screen(update, screen, language, data)
     
     async def buy_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /buy - покупка валюты"""
@@ -468,356 +436,157 @@ class CasinoBot:
     
     async def show_buy_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать меню покупки"""
-        buy_text = """
-🛒 *МАГАЗИН*
-
-*STARS (для Lucky2 и покупок):*
-⭐ *50 stars* - 88 ₽ (1 star = 1.76 ₽)
-⭐ *250 stars* - 400 ₽ (1 star = 1.6 ₽) *-9%*
-⭐ *500 stars* - 750 ₽ (1 star = 1.5 ₽) *-15%*
-⭐ *1000 stars* - 1400 ₽ (1 star = 1.4 ₽) *-20%*
-💎 *2500 stars* - 3200 ₽ (1 star = 1.28 ₽) *-27%*
-
-*СПИНЫ (для Моно и Рулетки):*
-🎰 1 спин = 50 stars
-
-*Выберите продукт:*
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("⭐ 50 STARS - 88 ₽", callback_data="buy_50_stars"),
-                InlineKeyboardButton("⭐ 250 STARS - 400 ₽", callback_data="buy_250_stars")
-            ],
-            [
-                InlineKeyboardButton("⭐ 500 STARS - 750 ₽", callback_data="buy_500_stars"),
-                InlineKeyboardButton("⭐ 1000 STARS - 1400 ₽", callback_data="buy_1000_stars")
-            ],
-            [
-                InlineKeyboardButton("💎 2500 STARS - 3200 ₽", callback_data="buy_2500_stars"),
-                InlineKeyboardButton("🎰 КУПИТЬ СПИНЫ", callback_data="buy_spins_menu")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
-        
-        if update.callback_query:
-            await update.callback_query.edit_message_text(
-                buy_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        else:
-            await update.message.reply_text(
-                buy_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
+        language = self.templates.language(update.effective_user.language_code)
+        await self.send_screen(update, "buy", language)
     
     async def show_buy_spins_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать меню покупки спинов"""
-        spins_text = """
-🎰 *МАГАЗИН СПИНОВ*
-
-*Для игр Моно и Рулетка:*
-🎰 *1 спин* - 50 stars
-🎰 *5 спинов* - 225 stars (-10%)
-🎰 *10 спинов* - 400 stars (-20%)
-🎰 *25 спинов* - 900 stars (-28%)
-🎰 *50 спинов* - 1600 stars (-36%)
-💎 *100 спинов* - 3000 stars (-40%)
-
-🎁 *Бонус NFT за каждые 5 купленных спинов!*
-
-*Выберите пакет:*
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("🎰 1 СПИН - 50 STARS", callback_data="buy_1_spin"),
-                InlineKeyboardButton("🎰 5 СПИНОВ - 225 STARS", callback_data="buy_5_spins")
-            ],
-            [
-                InlineKeyboardButton("🎰 10 СПИНОВ - 400 STARS", callback_data="buy_10_spins"),
-                InlineKeyboardButton("🎰 25 СПИНОВ - 900 STARS", callback_data="buy_25_spins")
-            ],
-            [
-                InlineKeyboardButton("🎰 50 СПИНОВ - 1600 STARS", callback_data="buy_50_spins"),
-                InlineKeyboardButton("💎 100 СПИНОВ - 3000 STARS", callback_data="buy_100_spins")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД В МАГАЗИН", callback_data="buy_stars")
-            ]
-        ]
-        
-        await update.callback_query.edit_message_text(
-            spins_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        language = self.templates.language(update.effective_user.language_code)
+        await self.send_screen(update, "buy_spins", language)
     
     async def balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /balance - проверка баланса"""
-        user = update.effective_user
-        user_id = user.id
+        language, data = await self.load_user_data(update)
         
-        # Получаем балансы
-        stars_balance = await self.db.get_stars_balance(user_id)
-        spins_balance = await self.db.get_spins_balance(user_id)
-        total_deposited = await self.db.get_total_deposited(user_id)
-        
-        balance_text = f"""
-👛 *ВАШ БАЛАНС*
-
-💰 *Stars:* {stars_balance}
-   Для: Lucky2, покупки спинов, магазин
-
-🎰 *Спины:* {spins_balance}
-   Для: Моно, Рулетка (1 спин = 50 stars)
-
-📈 *Всего пополнено:* {total_deposited} stars
-📅 *Играет с:* {await self.db.get_registration_date(user_id)}
-
-*Быстрые действия:*
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("💰 ПОПОЛНИТЬ STARS", callback_data="buy_stars"),
-                InlineKeyboardButton("🎰 КУПИТЬ СПИНЫ", callback_data="buy_spins_menu")
-            ],
-            [
-                InlineKeyboardButton("🔄 ОБМЕНЯТЬ STARS→СПИНЫ", callback_data="exchange_stars"),
-                InlineKeyboardButton("💱 КУРС: 50 STARS = 1 СПИН", callback_data="exchange_rate")
-            ],
-            [
-                InlineKeyboardButton("📊 ПОДРОБНАЯ СТАТИСТИКА", callback_data="detailed_stats"),
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
+        created_at = data.get("created_at")
+        data["registration_date"] = (
+            datetime.fromisoformat(created_at).strftime("%d.%m.%Y") if created_at else "-"
+        )
         
-        if update.callback_query:
-            await update.callback_query.edit_message_text(
-                balance_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
-        else:
-            await update.message.reply_text(
-                balance_text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='Markdown'
-            )
+        await self.send_screen(update, "balance", language, data)
     
     async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /profile - профиль пользователя"""
-        user = update.effective_user
-        user_id = user.id
-        
-        # Получаем профиль пользователя
-        profile = await self.db.get_user_profile(user_id)
+        user_id = update.effective_user.id
         
-        profile_text = f"""
-👤 *ПРОФИЛЬ ИГРОКА*
-
-*Основное:*
-ID: `{user_id}`
-Имя: {user.first_name}
-Юзернейм: @{user.username if user.username else 'скрыт'}
-
-*Статистика:*
-🏆 Уровень: {profile.get('level', 1)}
-⭐ Рейтинг: {profile.get('rating', 1000)}
-🎮 Всего игр: {profile.get('total_games', 0)}
-💰 Выиграно: {profile.get('total_won', 0)} stars
-📅 В игре: {profile.get('days_in_game', 0)} дней
-
-*Балансы:*
-🎰 Спины: {await self.db.get_spins_balance(user_id)}
-⭐ Stars: {await self.db.get_stars_balance(user_id)}
-
-*Достижения:* {', '.join(profile.get('achievements', ['Нет достижений']))[:50]}
-        """
+        # Строка пользователя и профиль загружаются параллельно
+        (language, data), profile = await asyncio.gather(
+            self.load_user_data(update),
+            self.db.get_user_profile(user_id)
+        )
         
-        keyboard = [
-            [
-                InlineKeyboardButton("📊 ПОЛНАЯ СТАТИСТИКА", callback_data="full_stats"),
-                InlineKeyboardButton("🏆 ДОСТИЖЕНИЯ", callback_data="achievements")
-            ],
-            [
-                InlineKeyboardButton("👥 ПОДЕЛИТЬСЯ ПРОФИЛЕМ", 
-                                   switch_inline_query=f"Мой профиль в Casino Royale!"),
-                InlineKeyboardButton("🎁 МОИ NFT", callback_data="my_nfts")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
+        achievements = profile.get('achievements') or [
+            self.templates.text("no_achievements", language)
         ]
         
-        await update.message.reply_text(
-            profile_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
+        data.update(
+            username=data["username"] or self.templates.text("username_hidden", language),
+            level=profile.get('level', 1),
+            rating=profile.get('rating', 1000),
+            total_games=profile.get('total_games', data["total_games"]),
+            total_won=profile.get('total_won', data["total_won"]),
+            days_in_game=profile.get('days_in_game', 0),
+            achievements=', '.join(achievements)[:50]
         )
+        
+        await self.send_screen(update, "profile", language, data)
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /stats - статистика игры"""
         user = update.effective_user
         user_id = user.id
-        
-        # Получаем статистику
-        stats = await self.db.get_game_stats()
-        user_stats = await self.db.get_user_stats(user_id)
-        
-        stats_text = f"""
-📊 *СТАТИСТИКА ИГРЫ*
-
-*Общая статистика:*
-👥 Всего игроков: {stats.get('total_users', 0)}
-🎰 Всего спинов: {stats.get('total_spins', 0)}
-💰 Общий выигрыш: {stats.get('total_won', 0)} stars
-🎁 Выдано NFT: {stats.get('total_nfts', 0)}
-
-*Топ-5 побед за сегодня:*
-{self.format_top_wins(stats.get('top_wins_today', []))}
-
-*Ваша статистика:*
-🎰 Ваши спины: {user_stats.get('user_spins', 0)}
-💰 Ваш выигрыш: {user_stats.get('user_won', 0)} stars
-📊 Win Rate: {user_stats.get('win_rate', 0)}%
-🥇 Место в рейтинге: #{user_stats.get('rank', 0)}
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("🏆 ТОП ИГРОКИ", callback_data="top_players"),
-                InlineKeyboardButton("📈 ГРАФИКИ", callback_data="charts")
-            ],
-            [
-                InlineKeyboardButton("🎮 МОЯ СТАТИСТИКА", callback_data="my_stats"),
-                InlineKeyboardButton("📊 СТАТИСТИКА ПО ИГРАМ", callback_data="games_stats")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
-        
-        await update.message.reply_text(
-            stats_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        language = self.templates.language(user.language_code)
+        
+        # Все источники статистики запрашиваются одновременно
+        requests = [self.db.get_game_stats(), self.db.get_user_stats(user_id)]
+        if self.leaderboard:
+            requests.append(self.leaderboard.rank(user_id))
+        stats, user_stats, *rank = await asyncio.gather(*requests)
+        
+        # Место в рейтинге берем из лидерборда
+        if rank:
+            user_stats['rank'] = rank[0]
+        
+        top_wins = await self.format_top_wins(stats.get('top_wins_today', []), language)
+        
+        await self.send_screen(update, "stats", language, {
+            "total_users": stats.get('total_users', 0),
+            "total_spins": stats.get('total_spins', 0),
+            "total_won": stats.get('total_won', 0),
+            "total_nfts": stats.get('total_nfts', 0),
+            "top_wins": top_wins,
+            "user_spins": user_stats.get('user_spins', 0),
+            "user_won": user_stats.get('user_won', 0),
+            "win_rate": user_stats.get('win_rate', 0),
+            "rank": user_stats.get('rank', 0)
+        })
     
-    def format_top_wins(self, top_wins):
-        """Форматирование топ-побед"""
-        if not top_wins:
-            return "Нет данных"
+    async def format_top_wins(self, top_wins=None, language: str = "ru"):
+        """Форматирование топ-побед за сегодня"""
+        if self.leaderboard:
+            top_wins = await self.leaderboard.top("multiplier", period="daily", limit=5)
         
-        result = ""
-        for i, win in enumerate(top_wins[:5], 1):
-            result += f"{i}. @{win.get('username', 'user')} - {win.get('multiplier', 0)}x\n"
-        return result
+        if not top_wins:
+            return self.templates.text("no_data", language)
+        
+        return "\n".join(
+            self.templates.text(
+                "top_win", language,
+                place=i,
+                username=win.get('username', 'user'),
+                multiplier=win.get('multiplier', 0)
+            )
+            for i, win in enumerate(top_wins[:5], 1)
+        )
     
     async def demo_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /demo - демо-режим"""
         user = update.effective_user
-        user_id = user.id
         
         # Создаем демо-сессию
-        demo_token = await self.db.create_demo_session(user_id)
-        
-        demo_text = """
-🎮 *ДЕМО-РЕЖИМ*
-
-*Доступны все игры:*
-🎯 Моно - 10 демо-спинов
-🎨 Lucky2 - 1000 демо-stars
-🎡 Рулетка - 10 демо-спинов
-
-*Особенности демо:*
-• Виртуальная валюта
-• Все функции как в реальной игре
-• NFT не начисляются
-• Статистика не сохраняется
-
-*Цель:* Познакомиться с играми перед реальной игрой!
-        """
+        demo_token = await self.db.create_demo_session(user.id)
         
-        web_app_url = f"{self.config.WEBAPP_URL}/demo.html?token={demo_token}"
-        
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎮 ИГРАТЬ В ДЕМО-РЕЖИМЕ",
-                    web_app=WebAppInfo(url=web_app_url)
-                )
-            ],
-            [
-                InlineKeyboardButton("📖 ОБУЧЕНИЕ", callback_data="tutorial"),
-                InlineKeyboardButton("💰 ИГРАТЬ НА РЕАЛ", callback_data="buy_stars")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
-        
-        await update.message.reply_text(
-            demo_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        await self.send_screen(update, "demo", self.templates.language(user.language_code), {
+            "webapp_url": self.config.WEBAPP_URL,
+            "demo_token": demo_token
+        })
     
     async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /admin - админ-панель"""
         user = update.effective_user
         user_id = user.id
+        language = self.templates.language(user.language_code)
         
         # Проверяем права админа
         if user_id not in self.config.ADMINS and user_id != self.config.OWNER_ID:
-            await update.message.reply_text("⛔ У вас нет прав администратора!")
+            await update.effective_message.reply_text(
+                self.templates.text("no_admin_rights", language)
+            )
             return
         
-        admin_text = """
-⚙️ *АДМИН-ПАНЕЛЬ*
-
-*Доступные функции:*
-📊 *Статистика бота* - общая информация
-👥 *Пользователи* - поиск и управление
-💰 *Финансы* - доходы, платежи
-🎁 *NFT* - статистика подарков
-⚙️ *Настройки* - конфигурация игры
-
-*Быстрые команды:*
-/add_stars [user_id] [amount] - добавить stars
-/add_spins [user_id] [amount] - добавить спины
-/user_info [user_id] - информация о пользователе
-/bot_stats - статистика бота
-        """
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("📊 СТАТИСТИКА БОТА", callback_data="admin_stats"),
-                InlineKeyboardButton("👥 УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ", callback_data="admin_users")
-            ],
-            [
-                InlineKeyboardButton("💰 ФИНАНСОВАЯ СТАТИСТИКА", callback_data="admin_finance"),
-                InlineKeyboardButton("🎁 УПРАВЛЕНИЕ NFT", callback_data="admin_nfts")
-            ],
-            [
-                InlineKeyboardButton("⚙️ НАСТРОЙКИ", callback_data="admin_settings"),
-                InlineKeyboardButton("📋 ЛОГИ", callback_data="admin_logs")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="main_menu")
-            ]
-        ]
-        
-        await update.message.reply_text(
-            admin_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        await self.send_screen(update, "admin", language)
+    
+    def setup_callback_routes(self):
+        """Регистрация маршрутов callback кнопок"""
+        router = self.router
+        
+        # Точные значения
+        router.exact("main_menu", self.menu_command)
+        router.exact("games_menu", self.games_command)
+        router.exact("play_mono", self.mono_command)
+        router.exact("play_lucky2", self.lucky2_command)
+        router.exact("buy_stars", self.show_buy_menu)
+        router.exact("buy_spins_menu", self.show_buy_spins_menu)
+        router.exact("wallet", self.balance_command)
+        router.exact("profile", self.profile_command)
+        router.exact("stats", self.stats_command)
+        router.exact("demo_mode", self.demo_command)
+        router.exact("help", self.help_command)
+        router.exact("exchange_stars", self.exchange_stars)
+        router.exact("mono_rules", self.on_mono_rules)
+        router.exact("lucky2_rules", self.on_lucky2_rules)
+        router.exact("admin_profile", self.on_admin_profile_menu)
+        router.exact("admin_stats", self.on_admin_stats)
+        router.exact("admin_finance", self.on_admin_finance)
+        router.exact("admin_exposure", self.on_admin_exposure)
+        
+        # Параметризованные: buy_50_stars, exchange_5, admin_stats_7, admin_users
+        router.prefix("buy_", self.on_buy, (str, str))
+        router.prefix("exchange_", self.on_exchange, (int,))
+        router.prefix("admin_profile_", self.on_admin_profile, (int,))
+        router.prefix("admin_stats_", self.on_admin_stats, (int,))
+        router.prefix("admin_finance_", self.on_admin_finance, (int,))
+        router.prefix("admin_", self.on_admin, (str,))
     
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик callback кнопок"""
@@ -826,59 +595,233 @@ ID: `{user_id}`
         
         data = query.data
         
-        logger.info(f"Callback query от {query.from_user.id}: {data}")
+        logger.debug(f"Callback query от {query.from_user.id}: {data}")
         
-        # Обработка основных действий
-        if data == "main_menu":
-            await self.menu_command(update, context)
-        
-        elif data == "games_menu":
-            await self.games_command(update, context)
+        await self.router.dispatch(data, update, context)
+    
+    async def on_buy(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                     amount: str, product: str):
+        """Кнопки покупки buy_{amount}_{product}"""
+        await self.process_purchase(update.callback_query, amount, product)
+    
+    async def on_exchange(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                          spins: int):
+        """Кнопки обмена exchange_{spins} - покупка спинов за stars"""
+        await self.process_purchase(
+            update.callback_query, str(spins), "spin" if spins == 1 else "spins"
+        )
+    
+    async def on_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                       action: str):
+        """Кнопки админ-панели admin_{action}"""
+        await self.handle_admin_callback(update, context, f"admin_{action}")
+    
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.config.ADMINS or user_id == self.config.OWNER_ID
+    
+    async def bot_stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /bot_stats [дней] - статистика бота из сводок"""
+        days = 1
+        if context.args and context.args[0].isdigit():
+            days = int(context.args[0])
+        await self.on_admin_stats(update, context, days)
+    
+    async def load_period_stats(self, update: Update, days: int):
+        """Проверить права и загрузить статистику за days дней"""
+        language = self.templates.language(update.effective_user.language_code)
         
-        elif data == "play_mono":
-            await self.mono_command(update, context)
+        if not self.is_admin(update.effective_user.id):
+            await update.effective_message.reply_text(
+                self.templates.text("no_admin_rights", language)
+            )
+            return language, None
         
-        elif data == "play_lucky2":
-            await self.lucky2_command(update, context)
+        days = max(1, min(days, MAX_STATS_DAYS))
+        totals = await self.rollups.period_totals(days)
+        totals["period"] = (
+            self.templates.text("period_today", language) if days == 1
+            else self.templates.text("period_days", language, days=days)
+        )
+        return language, totals
+    
+    async def on_admin_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                             days: int = 1):
+        """Кнопки admin_stats и admin_stats_{days} - игроки и игры за период"""
+        language, totals = await self.load_period_stats(update, days)
+        if totals is None:
+            return
         
-        elif data == "buy_stars":
-            await self.show_buy_menu(update, context)
+        games = totals["games"].values()
+        wagered = sum(game["wagered_stars"] for game in games)
+        won = sum(game["won_stars"] for game in games)
+        per_game = "\n".join(
+            self.templates.text(
+                "stats_game_line", language,
+                game=name,
+                games=game["games"],
+                wagered=game["wagered_stars"],
+                ggr=game["wagered_stars"] - game["won_stars"]
+            )
+            for name, game in sorted(totals["games"].items())
+        )
         
-        elif data == "buy_spins_menu":
-            await self.show_buy_spins_menu(update, context)
+        await self.send_screen(update, "admin_stats", language, {
+            "period": totals["period"],
+            "active_users": totals["active_users"],
+            "new_users": totals["new_users"],
+            "games": sum(game["games"] for game in games),
+            "wins": sum(game["wins"] for game in games),
+            "wagered": wagered,
+            "won": won,
+            "ggr": wagered - won,
+            "nfts": sum(game["nfts"] for game in games),
+            "per_game": per_game or self.templates.text("no_data", language),
+            "elapsed_ms": totals["elapsed_ms"]
+        })
+    
+    async def on_admin_finance(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                               days: int = 1):
+        """Кнопки admin_finance и admin_finance_{days} - платежи за период"""
+        language, totals = await self.load_period_stats(update, days)
+        if totals is None:
+            return
         
-        elif data == "wallet":
-            await self.balance_command(update, context)
+        revenue: Dict[str, int] = {}
+        for (_, currency), payment in totals["payments"].items():
+            revenue[currency] = revenue.get(currency, 0) + payment["amount"]
+        
+        per_product = "\n".join(
+            self.templates.text(
+                "finance_product_line", language,
+                product=product_type,
+                payments=payment["payments"],
+                product_amount=payment["product_amount"],
+                amount=format_amount(payment["amount"], currency)
+            )
+            for (product_type, currency), payment in sorted(
+                totals["payments"].items(), key=lambda item: tuple(map(str, item[0]))
+            )
+        )
         
-        elif data == "profile":
-            await self.profile_command(update, context)
+        await self.send_screen(update, "admin_finance", language, {
+            "period": totals["period"],
+            "payments": sum(payment["payments"] for payment in totals["payments"].values()),
+            "revenue": ", ".join(
+                format_amount(amount, currency) for currency, amount in sorted(revenue.items())
+            ) or "0",
+            "per_product": per_product or self.templates.text("no_data", language),
+            "nfts": sum(game["nfts"] for game in totals["games"].values()),
+            "elapsed_ms": totals["elapsed_ms"]
+        })
+    
+    async def on_admin_exposure(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Кнопка admin_exposure - ставки, выплаты и RTP по играм из памяти"""
+        language = self.templates.language(update.effective_user.language_code)
         
-        elif data == "stats":
-            await self.stats_command(update, context)
+        if not self.is_admin(update.effective_user.id):
+            await update.effective_message.reply_text(
+                self.templates.text("no_admin_rights", language)
+            )
+            return
         
-        elif data == "demo_mode":
-            await self.demo_command(update, context)
+        snapshot = self.exposure.snapshot()
+        lines = []
+        for game, windows in snapshot.items():
+            for window, summary in windows.items():
+                if not summary["bets"]:
+                    continue
+                lines.append(self.templates.text(
+                    "exposure_line", language,
+                    game=game,
+                    window=window,
+                    bets=summary["bets"],
+                    wagered=f"{summary['wagered']:.0f}",
+                    paid=f"{summary['paid']:.0f}",
+                    result=f"{summary['house_result']:+.0f}",
+                    rtp=f"{summary['rtp']:.1%}" if summary["rtp"] is not None else "-",
+                    max_payout=f"{summary['max_payout']:.0f}"
+                ))
+        
+        largest = max(self.exposure.largest.values(), key=lambda entry: entry["payout"],
+                      default=None)
+        
+        await self.send_screen(update, "admin_exposure", language, {
+            "windows": "\n".join(lines) or self.templates.text("no_data", language),
+            "largest": f"{largest['payout']:.0f}" if largest else "0",
+            "max_payout": f"{self.exposure.max_payout:.0f}",
+            "max_loss": f"{self.exposure.max_loss:.0f}",
+            "loss_window": self.exposure.loss_window,
+            "max_rtp": f"{self.exposure.max_rtp:.0%}",
+            "rtp_window": self.exposure.rtp_window
+        })
+    
+    async def on_admin_profile_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Кнопка профилирования в админ-панели - только владелец"""
+        language = self.templates.language(update.effective_user.language_code)
         
-        elif data == "help":
-            await self.help_command(update, context)
+        if update.effective_user.id != self.config.OWNER_ID:
+            await update.effective_message.reply_text(
+                self.templates.text("profiler_owner_only", language)
+            )
+            return
         
-        elif data.startswith("buy_"):
-            # Обработка покупки
-            parts = data.split("_")
-            if len(parts) >= 3:
-                await self.process_purchase(query, parts[1], parts[2])
+        await self.send_screen(update, "admin_profile", language)
+    
+    async def on_admin_profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                               seconds: int):
+        """Кнопки admin_profile_{seconds} - профилировать процесс и прислать профиль"""
+        user_id = update.effective_user.id
+        language = self.templates.language(update.effective_user.language_code)
+        
+        if user_id != self.config.OWNER_ID:
+            await update.effective_message.reply_text(
+                self.templates.text("profiler_owner_only", language)
+            )
+            return
         
-        elif data == "exchange_stars":
-            await self.exchange_stars(update, context)
+        if self.profiler_sessions.running:
+            await update.effective_message.reply_text(
+                self.templates.text("profiler_busy", language)
+            )
+            return
         
-        elif data == "mono_rules":
-            await self.show_mono_rules(query)
+        seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
         
-        elif data == "lucky2_rules":
-            await self.show_lucky2_rules(query)
+        async def run_profile():
+            try:
+                profiler = await self.profiler_sessions.profile(seconds)
+            except RuntimeError:
+                # Другая сессия успела начаться между проверкой и запуском
+                self.sender.notify(user_id, self.templates.text("profiler_busy", language))
+                return
+            
+            top = "\n".join(
+                f"{entry['share'] * 100:.1f}% {entry['function']}" for entry in profiler.top()
+            )
+            await self.application.bot.send_document(
+                chat_id=user_id,
+                document=profiler.collapsed().encode(),
+                filename=f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded",
+                caption=self.templates.text(
+                    "profiler_done", language,
+                    seconds=seconds, samples=profiler.samples, top=top or "-"
+                )
+            )
+            logger.info(f"Профилирование {seconds} сек: {profiler.samples} семплов")
         
-        elif data.startswith("admin_"):
-            await self.handle_admin_callback(update, context, data)
+        # Сессия идет в фоне: обработка обновлений продолжается и попадает в профиль
+        self.application.create_task(run_profile())
+        await update.effective_message.reply_text(
+            self.templates.text("profiler_started", language, seconds=seconds)
+        )
+    
+    async def on_mono_rules(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Кнопка подробных правил Моно"""
+        await self.show_mono_rules(update.callback_query)
+    
+    async def on_lucky2_rules(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Кнопка подробных правил Lucky2"""
+        await self.show_lucky2_rules(update.callback_query)
     
     async def process_purchase(self, query, product_type: str, amount: str):
         """Обработка покупки продукта"""
@@ -942,9 +885,8 @@ ID: `{user_id}`
                         parse_mode='Markdown'
                     )
                     
-                    # Начисляем NFT
-                    for _ in range(bonus_nft):
-                        await self.award_random_nft(user_id)
+                    # Начисляем NFT одним уведомлением
+                    await self.award_random_nft(user_id, bonus_nft)
                 else:
                     await query.edit_message_text(
                         f"✅ *Покупка успешна!*\n\n"
@@ -970,62 +912,73 @@ ID: `{user_id}`
                 bonus_nft=product.get("bonus_nft", 0)
             )
     
-    async def award_random_nft(self, user_id: int):
-        """Наградить случайным NFT"""
+    async def award_random_nft(self, user_id: int, count: int = 1):
+        """Наградить случайными NFT"""
         # В реальном проекте здесь будет логика выдачи NFT
-        # Для демо просто отправляем сообщение
-        try:
-            await self.application.bot.send_message(
-                chat_id=user_id,
-                text="🎁 *Вы получили случайный NFT подарок!*\n\n"
-                     "Поздравляем! 🎉\n"
-                     "Посмотреть в инвентаре: /inventory",
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Ошибка отправки NFT уведомления: {e}")
+        # Для демо просто отправляем уведомление через очередь отправки
+        title = (
+            "🎁 *Вы получили случайный NFT подарок!*" if count == 1
+            else f"🎁 *Вы получили {count} случайных NFT подарков!*"
+        )
+        if self.push:
+            self.push.nft_awarded(user_id, {"count": count})
+        
+        self.sender.notify(
+            user_id,
+            f"{title}\n\n"
+            "Поздравляем! 🎉\n"
+            "Посмотреть в инвентаре: /inventory",
+            parse_mode='Markdown'
+        )
     
-    async def exchange_stars(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обмен stars на спины"""
-        query = update.callback_query
-        user_id = query.from_user.id
+    def achievement_unlocked(self, user_id: int, rule):
+        """Сообщить игроку о достижении или ежедневном бонусе"""
+        if self.push:
+            self.push.achievement_unlocked(user_id, {
+                "id": rule.id,
+                "name": rule.name,
+                "emoji": rule.emoji,
+                "daily": rule.daily,
+                "reward_stars": rule.reward_stars
+            })
+        
+        # Язык игрока не хранится: событие журнала приходит без update
+        language = self.templates.default_language
+        key = "daily_bonus_unlocked" if rule.daily else "achievement_unlocked"
+        text = self.templates.text(key, language, emoji=rule.emoji, name=rule.name)
+        if rule.reward_stars:
+            text += "\n" + self.templates.text("achievement_reward", language, stars=rule.reward_stars)
+        self.sender.notify(user_id, text, parse_mode='Markdown')
+    
+    async def broadcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /broadcast [текст] - рассылка всем пользователям"""
+        user_id = update.effective_user.id
         
-        exchange_text = """
-🔄 *ОБМЕН STARS НА СПИНЫ*
-
-*Курс обмена:*
-50 stars = 1 спин
-1 спин = 50 stars
-
-*Ваш баланс:*
-⭐ Stars: {stars_balance}
-🎰 Спины: {spins_balance}
-
-*Выберите количество спинов для покупки:*
-        """.format(
-            stars_balance=await self.db.get_stars_balance(user_id),
-            spins_balance=await self.db.get_spins_balance(user_id)
-        )
+        if user_id not in self.config.ADMINS and user_id != self.config.OWNER_ID:
+            await update.message.reply_text("⛔ У вас нет прав администратора!")
+            return
         
-        keyboard = [
-            [
-                InlineKeyboardButton("🎰 1 СПИН (50⭐)", callback_data="exchange_1"),
-                InlineKeyboardButton("🎰 5 СПИНОВ (225⭐)", callback_data="exchange_5")
-            ],
-            [
-                InlineKeyboardButton("🎰 10 СПИНОВ (400⭐)", callback_data="exchange_10"),
-                InlineKeyboardButton("🎰 25 СПИНОВ (900⭐)", callback_data="exchange_25")
-            ],
-            [
-                InlineKeyboardButton("« НАЗАД", callback_data="wallet")
-            ]
-        ]
+        text = update.message.text.partition(" ")[2].strip()
+        if not text:
+            await update.message.reply_text("Использование: /broadcast [текст]")
+            return
         
-        await query.edit_message_text(
-            exchange_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+        async def run_broadcast():
+            result = await self.sender.broadcast(self.db, text, parse_mode='Markdown')
+            self.sender.notify(
+                user_id,
+                f"📢 Рассылка завершена: {result['sent']} из {result['recipients']} "
+                f"за {result['seconds']} сек"
+            )
+        
+        # Рассылка идет в фоне, не блокируя обработку обновлений
+        self.application.create_task(run_broadcast())
+        await update.message.reply_text("📢 Рассылка запущена")
+    
+    async def exchange_stars(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обмен stars на спины"""
+        language, data = await self.load_user_data(update)
+        await self.send_screen(update, "exchange", language, data)
     
     async def show_mono_rules(self, query):
         """Показать подробные правила Моно"""
@@ -0,0 +1,365 @@
+import time
+import inspect
+import logging
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from telegram.ext import ApplicationHandlerStop
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовая метрика с набором меток"""
+    
+    type = "untyped"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+    
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence, float]]:
+        """(суффикс имени, имена меток, значения меток, значение)"""
+        return ()
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+    
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self):
+        for labels, value in self._values.items():
+            yield "", self.labelnames, labels, value
+
+
+class Gauge(Metric):
+    """
+    Текущее значение
+    
+    Если передан func, значение читается при каждом сборе: число или
+    словарь {значение метки (или кортеж значений): число}.
+    """
+    
+    type = "gauge"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 func: Optional[Callable] = None):
+        super().__init__(name, help, labelnames)
+        self.func = func
+        self._values: Dict[tuple, float] = {}
+    
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+    
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+    
+    def samples(self):
+        values = self._values
+        if self.func is not None:
+            try:
+                current = self.func()
+            except Exception as e:
+                logger.warning(f"Ошибка чтения метрики {self.name}: {e}")
+                return
+            if current is None:
+                return
+            if isinstance(current, dict):
+                values = {
+                    key if isinstance(key, tuple) else (key,): value
+                    for key, value in current.items()
+                }
+            else:
+                values = {(): current}
+        
+        for labels, value in values.items():
+            yield "", self.labelnames, labels, value
+
+
+class Histogram(Metric):
+    type = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счетчики по корзинам (последняя - +Inf), сумма, количество]
+        self._values: Dict[tuple, list] = {}
+    
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+    
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        bounds = self.buckets + (float("inf"),)
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                yield "_bucket", bucket_names, labels + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, labels, total
+            yield "_count", self.labelnames, labels, count
+
+
+class Registry:
+    """Набор метрик процесса"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+    
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (),
+              func: Optional[Callable] = None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, func))
+    
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+    
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def timed(func: Callable, histogram: Histogram, errors: Counter, labels: tuple,
+          expected: Tuple[type, ...] = ()) -> Callable:
+    """Обернуть корутину замером времени и подсчетом ошибок"""
+    
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except expected:
+            raise
+        except Exception:
+            errors.inc(*labels)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, *labels)
+    
+    return wrapper
+
+
+def public_coroutines(obj) -> List[str]:
+    """Публичные async методы объекта"""
+    return [
+        name for name, member in inspect.getmembers(type(obj), inspect.iscoroutinefunction)
+        if not name.startswith("_")
+    ]
+
+
+class CasinoMetrics:
+    """
+    Метрики бота: обработчики, запросы к БД, игры, платежи и инвентарь
+    
+    Выключенные метрики не ставят ни одной обертки, так что без
+    METRICS_PORT код работает как без инструментирования.
+    """
+    
+    def __init__(self, enabled: bool = False, registry: Optional[Registry] = None):
+        self.enabled = enabled
+        self.registry = registry or Registry()
+        registry = self.registry
+        
+        self.handler_seconds = registry.histogram(
+            "casino_handler_seconds", "Время обработчика обновления", ("handler",)
+        )
+        self.handler_errors = registry.counter(
+            "casino_handler_errors_total", "Исключения в обработчиках", ("handler",)
+        )
+        self.db_seconds = registry.histogram(
+            "casino_db_query_seconds", "Время метода Database", ("method",)
+        )
+        self.db_errors = registry.counter(
+            "casino_db_errors_total", "Исключения в методах Database", ("method",)
+        )
+        self.settlement_seconds = registry.histogram(
+            "casino_game_settlement_seconds", "Время расчета игры", ("game", "method")
+        )
+        self.settlement_errors = registry.counter(
+            "casino_game_errors_total", "Исключения при расчете игры", ("game", "method")
+        )
+        self.settlements = registry.counter(
+            "casino_game_settlements_total", "Расчеты игр по исходу", ("game", "outcome")
+        )
+        self.payment_seconds = registry.histogram(
+            "casino_payment_seconds", "Время метода PaymentSystem", ("method",)
+        )
+        self.payment_errors = registry.counter(
+            "casino_payment_errors_total", "Исключения в PaymentSystem", ("method",)
+        )
+        self.inventory_seconds = registry.histogram(
+            "casino_inventory_seconds", "Время метода InventorySystem", ("method",)
+        )
+        self.inventory_errors = registry.counter(
+            "casino_inventory_errors_total", "Исключения в InventorySystem", ("method",)
+        )
+    
+    def _wrap(self, obj, methods: Iterable[str], histogram: Histogram, errors: Counter,
+              labels: tuple = ()):
+        for name in methods:
+            setattr(obj, name, timed(getattr(obj, name), histogram, errors, labels + (name,)))
+    
+    def instrument_database(self, db):
+        """Все публичные запросы Database и заполненность пула"""
+        if not self.enabled:
+            return
+        self._wrap(db, public_coroutines(db), self.db_seconds, self.db_errors)
+        
+        def pool(read):
+            return lambda: read(db.pool) if db.pool is not None else None
+        
+        self.registry.gauge("casino_db_pool_size", "Открытые соединения пула",
+                            func=pool(lambda p: p.get_size()))
+        self.registry.gauge("casino_db_pool_idle", "Свободные соединения пула",
+                            func=pool(lambda p: p.get_idle_size()))
+        self.registry.gauge("casino_db_pool_max", "Максимальный размер пула",
+                            func=lambda: db.pool_max_size)
+    
+    def instrument_game(self, game, name: str, methods: Sequence[str]):
+        """Расчет игры: время и исход (won/lost/rejected)"""
+        if not self.enabled:
+            return
+        self._wrap(game, methods, self.settlement_seconds, self.settlement_errors, (name,))
+        
+        settlements = self.settlements
+        for method in methods:
+            func = getattr(game, method)
+            
+            async def counted(*args, _func=func, **kwargs):
+                result = await _func(*args, **kwargs)
+                if not result.get("success"):
+                    outcome = "rejected"
+                else:
+                    outcome = "won" if result.get("won") else "lost"
+                settlements.inc(name, outcome)
+                return result
+            
+            setattr(game, method, wraps(func)(counted))
+    
+    def instrument_payments(self, payments):
+        if self.enabled:
+            self._wrap(payments, public_coroutines(payments), self.payment_seconds, self.payment_errors)
+    
+    def instrument_inventory(self, inventory):
+        if self.enabled:
+            self._wrap(inventory, public_coroutines(inventory), self.inventory_seconds, self.inventory_errors)
+    
+    def instrument_handlers(self, application):
+        """Обработчики приложения; вызывать после регистрации всех обработчиков"""
+        if not self.enabled:
+            return
+        
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                callback = getattr(handler, "callback", None)
+                if callback is None:
+                    continue
+                label = getattr(callback, "__name__", None) or type(callback).__name__
+                handler.callback = timed(
+                    callback, self.handler_seconds, self.handler_errors, (label,),
+                    expected=(ApplicationHandlerStop,)
+                )
+    
+    def instrument_exposure(self, exposure):
+        """Ставки, выплаты и RTP по играм и окнам из ExposureMonitor"""
+        fields = {
+            "wagered": "Ставки за окно, stars",
+            "paid": "Выплаты игрокам за окно, stars",
+            "house_result": "Результат казино за окно, stars",
+            "rtp": "Доля ставок, выплаченная игрокам за окно",
+            "max_payout": "Самая крупная выплата за окно, stars"
+        }
+        for field, help in fields.items():
+            self.gauge(f"casino_exposure_{field}", help,
+                       lambda field=field: exposure.metric(field), labelnames=("game", "window"))
+    
+    def gauge(self, name: str, help: str, func: Callable, labelnames: Sequence[str] = ()):
+        """Значение, читаемое при сборе (очереди, счетчики компонентов)"""
+        if self.enabled:
+            self.registry.gauge(name, help, labelnames, func)
+
+
+class MetricsServer:
+    """HTTP сервер aiohttp с метриками в формате Prometheus"""
+    
+    def __init__(self, registry: Registry, host: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+    
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+    
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,24 +1,85 @@
+import asyncio
+import json
 import logging
-from typing import Dict, Optional
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
 from telegram import LabeledPrice
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut, NetworkError
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True)
+class InvoicePayload:
+    """Данные, зашитые в payload счета"""
+    product_type: str
+    amount: int
+    user_id: int
+    bonus_nft: int = 0
+    
+    # Короткие ключи: Telegram ограничивает payload 128 байтами
+    _KEYS = {"product_type": "t", "amount": "a", "user_id": "u", "bonus_nft": "n"}
+    
+    def encode(self) -> str:
+        """Сериализовать payload для send_invoice"""
+        data = {self._KEYS[key]: value for key, value in asdict(self).items()}
+        return json.dumps(data, separators=(",", ":"))
+    
+    @classmethod
+    def decode(cls, raw: str) -> "InvoicePayload":
+        """Разобрать payload из successful_payment"""
+        if raw.startswith("{"):
+            data = json.loads(raw)
+            return cls(
+                product_type=str(data["t"]),
+                amount=int(data["a"]),
+                user_id=int(data["u"]),
+                bonus_nft=int(data.get("n", 0))
+            )
+        
+        # Старый формат "{type}_{amount}_{chat_id}" для уже выставленных счетов
+        product_type, amount, user_id = raw.split("_")[:3]
+        return cls(product_type=product_type, amount=int(amount), user_id=int(user_id))
+
+
 class PaymentSystem:
     """Система обработки платежей"""
     
-    def __init__(self, provider_token: str, db):
+    def __init__(self, provider_token: str, db, bot=None,
+                 provider_name: str = "yookassa", currency: str = "RUB",
+                 queue_size: int = 1000, send_rate: float = 25.0,
+                 max_retries: int = 5):
         self.provider_token = provider_token
         self.db = db
+        
+        # Провайдер, которому принадлежит provider_token, и валюта счетов
+        self.provider_name = provider_name
+        self.currency = currency
+        
+        # Бот приложения (Application.bot) с общим пулом соединений
+        self.bot = bot
+        
+        # Очередь отправки счетов
+        self.queue_size = queue_size
+        self.send_interval = 1.0 / send_rate
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._last_send = 0.0
+        
+        # Слушатели платежей, требующих ручной проверки: listener(text)
+        self.review_listeners: List[Callable[[str], None]] = []
     
     async def create_invoice(self, chat_id: int, product_type: str, 
-                            amount: int, price: int, currency: str = "RUB"):
+                            amount: int, price: int, currency: Optional[str] = None,
+                            bonus_nft: int = 0) -> bool:
         """Создать счет для оплаты"""
-        from telegram import Bot
+        currency = currency or self.currency
         
-        # Получаем бота из контекста или создаем новый
-        # В реальном проекте нужно передать бота
-        bot = Bot(token="YOUR_BOT_TOKEN")  # Замените на ваш токен
+        if self.bot is None:
+            logger.error("PaymentSystem не получил бота приложения")
+            return False
         
         title = ""
         description = ""
@@ -30,69 +91,138 @@ class PaymentSystem:
             title = f"Покупка {amount} спинов"
             description = f"Покупка {amount} спинов для игры в Моно"
         
-        payload = f"{product_type}_{amount}_{chat_id}"
+        payload = InvoicePayload(
+            product_type=product_type,
+            amount=amount,
+            user_id=chat_id,
+            bonus_nft=bonus_nft
+        )
         prices = [LabeledPrice(title, price * 100)]  # в копейках
         
+        invoice = {
+            "chat_id": chat_id,
+            "title": title,
+            "description": description,
+            "payload": payload.encode(),
+            "provider_token": self.provider_token,
+            "currency": currency,
+            "prices": prices,
+            "need_name": False,
+            "need_phone_number": False,
+            "need_email": False,
+            "need_shipping_address": False,
+            "is_flexible": False
+        }
+        
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        
         try:
-            await bot.send_invoice(
-                chat_id=chat_id,
-                title=title,
-                description=description,
-                payload=payload,
-                provider_token=self.provider_token,
-                currency=currency,
-                prices=prices,
-                need_name=False,
-                need_phone_number=False,
-                need_email=False,
-                need_shipping_address=False,
-                is_flexible=False
-            )
-            
+            self._queue.put_nowait((invoice, future))
+        except asyncio.QueueFull:
+            logger.warning(f"Очередь счетов переполнена, счет для {chat_id} отклонен")
+            return False
+        
+        try:
+            await future
             logger.info(f"Счет создан для {chat_id}: {title}")
+            return True
             
         except Exception as e:
             logger.error(f"Ошибка создания счета для {chat_id}: {e}")
+            return False
+    
+    def _ensure_worker(self):
+        """Запустить обработчик очереди счетов"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._send_loop())
+    
+    async def _send_loop(self):
+        """Последовательно отправлять счета с учетом лимитов Telegram"""
+        while True:
+            invoice, future = await self._queue.get()
+            try:
+                await self._send_with_retry(invoice)
+                if not future.done():
+                    future.set_result(True)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+    
+    async def _send_with_retry(self, invoice: Dict):
+        """Отправить счет, повторяя попытки с экспоненциальной задержкой"""
+        delay = 0.5
+        
+        for attempt in range(self.max_retries + 1):
+            # Глобальный лимит частоты отправки
+            wait = self._last_send + self.send_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_send = time.monotonic()
+            
+            try:
+                return await self.bot.send_invoice(**invoice)
+            
+            except (BadRequest, Forbidden):
+                # Подклассы NetworkError, но повтор не поможет: неверные
+                # параметры или бот заблокирован пользователем
+                raise
+            
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Flood control при отправке счета, ждем {e.retry_after} сек")
+                await asyncio.sleep(float(e.retry_after))
+            
+            except (TimedOut, NetworkError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Сетевая ошибка при отправке счета ({e}), повтор через {delay} сек")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+    
+    async def close(self):
+        """Дождаться отправки очереди и остановить обработчик"""
+        if self._queue is not None:
+            await self._queue.join()
+        
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
     
     async def process_successful_payment(self, user_id: int, 
                                         telegram_payment_charge_id: str,
                                         provider_payment_charge_id: str,
                                         total_amount: int,
-                                        invoice_payload: str) -> Dict:
+                                        invoice_payload: str,
+                                        currency: Optional[str] = None) -> Dict:
         """Обработать успешный платеж"""
         
-        # Проверяем, не обрабатывался ли уже этот платеж
-        existing_payment = await self.db.get_payment_by_telegram_id(
-            telegram_payment_charge_id
-        )
-        
-        if existing_payment:
-            logger.warning(f"Платеж {telegram_payment_charge_id} уже обработан")
-            return {
-                "success": False,
-                "error": "Платеж уже обработан"
-            }
-        
         # Парсим payload для определения типа продукта
         try:
-            parts = invoice_payload.split("_")
-            if len(parts) >= 2:
-                product_type = parts[0]
-                amount = int(parts[1])
-            else:
-                product_type = "stars"
-                amount = total_amount
-        except:
-            product_type = "stars"
-            amount = total_amount
-        
-        # Сохраняем платеж в БД
-        payment_id = await self.db.add_payment(
+            payload = InvoicePayload.decode(invoice_payload)
+        except (ValueError, KeyError, TypeError):
+            # total_amount в копейках, а не в stars: без payload начислять нечего
+            return await self._hold_for_review(
+                user_id, telegram_payment_charge_id, provider_payment_charge_id,
+                total_amount, invoice_payload, currency
+            )
+        product_type = payload.product_type
+        amount = payload.amount
+        
+        # Сохраняем платеж и начисляем продукт в одной транзакции.
+        # Повторная доставка того же платежа отсекается уникальным индексом.
+        payment = await self.db.add_payment_and_credit(
             user_id=user_id,
             amount=total_amount,
-            currency="RUB",
-            provider="yookassa",  # или другой провайдер
-            provider_payment_charge_id=provider_payment_charge_id,
+            currency=currency or self.currency,
+            provider=self.provider_name,
+            provider_payment_id=provider_payment_charge_id,
             telegram_payment_charge_id=telegram_payment_charge_id,
             status="completed",
             product_type=product_type,
@@ -100,11 +230,66 @@ class PaymentSystem:
             invoice_payload=invoice_payload
         )
         
+        if payment is None:
+            logger.warning(f"Платеж {telegram_payment_charge_id} уже обработан")
+            return {
+                "success": False,
+                "error": "Платеж уже обработан"
+            }
+        
+        payment_id = payment["payment_id"]
         logger.info(f"Платеж {payment_id} сохранен для пользователя {user_id}")
         
         return {
             "success": True,
             "payment_id": payment_id,
             "product_type": product_type,
-            "amount": amount
+            "amount": amount,
+            "stars_balance": payment["stars_balance"],
+            "spins_balance": payment["spins_balance"]
+        }
+    
+    async def _hold_for_review(self, user_id: int, telegram_payment_charge_id: str,
+                               provider_payment_charge_id: str, total_amount: int,
+                               invoice_payload: str, currency: Optional[str]) -> Dict:
+        """Сохранить платеж без начисления и сообщить владельцу"""
+        currency = currency or self.currency
+        
+        # Тип "unknown" ничего не начисляет, уникальный индекс отсекает повторы
+        payment = await self.db.add_payment_and_credit(
+            user_id=user_id,
+            amount=total_amount,
+            currency=currency,
+            provider=self.provider_name,
+            provider_payment_id=provider_payment_charge_id,
+            telegram_payment_charge_id=telegram_payment_charge_id,
+            status="needs_review",
+            product_type="unknown",
+            product_amount=0,
+            invoice_payload=invoice_payload
+        )
+        
+        if payment is None:
+            logger.warning(f"Платеж {telegram_payment_charge_id} уже обработан")
+            return {
+                "success": False,
+                "error": "Платеж уже обработан"
+            }
+        
+        text = (
+            f"⚠️ Платеж {payment['payment_id']} от {user_id} на {total_amount / 100:.2f} {currency} "
+            f"не зачислен: не разобран payload {invoice_payload[:64]!r}"
+        )
+        logger.error(text)
+        for listener in self.review_listeners:
+            try:
+                listener(text)
+            except Exception as e:
+                logger.error(f"Ошибка слушателя проверки платежей: {e}")
+        
+        return {
+            "success": False,
+            "needs_review": True,
+            "payment_id": payment["payment_id"],
+            "error": "Платеж передан на проверку"
         }
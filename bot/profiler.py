@@ -0,0 +1,165 @@
+"""
+Семплирующий профайлер работающего процесса бота
+
+Отдельный поток с заданным интервалом снимает стек потока event loop
+(что выполняется сейчас) и цепочки await всех ожидающих задач asyncio
+(где задачи стоят). Стеки складываются в формат collapsed stacks,
+который понимают flamegraph.pl, speedscope и inferno.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Самая долгая сессия профилирования, секунды
+MAX_SECONDS = 120
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _thread_stack(frame) -> List[str]:
+    """Стек потока от корня к текущей функции"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_chain(coro) -> List[str]:
+    """Цепочка await задачи: корутина задачи -> ... -> самая вложенная"""
+    stack = []
+    while coro is not None:
+        code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None)
+        if code is None:
+            # Future или другой awaitable без кода - конец цепочки
+            stack.append(type(coro).__name__)
+            break
+        stack.append(_frame_name(code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class SamplingProfiler:
+    """
+    Профайлер event loop
+    
+    Выполняющийся код попадает в стеки с корнем "running", ожидающие
+    задачи - с корнем "awaiting;<имя задачи>". Поток семплирования не
+    трогает event loop, поэтому накладные расходы - чтение стеков
+    раз в interval секунд.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = 0.005,
+                 include_awaiting: bool = True):
+        self.loop = loop
+        self.interval = interval
+        self.include_awaiting = include_awaiting
+        
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        
+        self._loop_thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Запускать из потока event loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started_at
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+    
+    def sample(self):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is not None:
+            self.stacks[";".join(["running"] + _thread_stack(frame))] += 1
+        
+        if self.include_awaiting:
+            try:
+                tasks = asyncio.all_tasks(self.loop)
+            except RuntimeError:
+                # Множество задач изменилось во время чтения - пропускаем
+                tasks = ()
+            for task in tasks:
+                coro = task.get_coro()
+                # Выполняющаяся задача уже видна в стеке потока
+                if coro is None or getattr(coro, "cr_running", False):
+                    continue
+                chain = _await_chain(coro)
+                if chain:
+                    self.stacks[";".join(["awaiting", task.get_name()] + chain)] += 1
+        
+        self.samples += 1
+    
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed: "a;b;c количество" на строку"""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in sorted(self.stacks.items())
+        )
+    
+    def top(self, limit: int = 5) -> List[Dict]:
+        """Функции, чаще всего бывшие на вершине выполняющегося стека"""
+        leaves: Counter = Counter()
+        running = 0
+        for stack, count in self.stacks.items():
+            if stack.startswith("running;"):
+                leaves[stack.rsplit(";", 1)[-1]] += count
+                running += count
+        return [
+            {"function": name, "share": round(count / running, 3)}
+            for name, count in leaves.most_common(limit)
+        ] if running else []
+
+
+class ProfilerSessions:
+    """Не больше одной сессии профилирования одновременно"""
+    
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._running = False
+    
+    @property
+    def running(self) -> bool:
+        return self._running
+    
+    async def profile(self, seconds: float) -> SamplingProfiler:
+        """
+        Профилировать процесс seconds секунд
+        
+        Raises:
+            RuntimeError: если сессия уже идет
+        """
+        if self._running:
+            raise RuntimeError("Профилирование уже запущено")
+        
+        self._running = True
+        profiler = SamplingProfiler(asyncio.get_running_loop(), self.interval)
+        try:
+            profiler.start()
+            await asyncio.sleep(min(seconds, MAX_SECONDS))
+        finally:
+            # join короткий: поток просыпается каждые interval секунд
+            profiler.stop()
+            self._running = False
+        return profiler
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional, Set
+
+import ujson
+from aiohttp import WSCloseCode, web
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# События, из которых клиенту нужно только последнее (старые заменяются)
+LATEST_ONLY_EVENTS = frozenset(("balance",))
+
+
+class PushConnection:
+    """
+    WebSocket соединение с собственным буфером отправки
+    
+    События складываются в буфер и отправляются отдельной задачей,
+    поэтому медленный клиент не задерживает публикацию. Если буфер
+    переполнен, соединение закрывается - клиент переподключится и
+    запросит актуальное состояние через API.
+    """
+    
+    def __init__(self, ws: web.WebSocketResponse, user_id: int, max_buffer: int = 100):
+        self.ws = ws
+        self.user_id = user_id
+        self.max_buffer = max_buffer
+        self._buffer: deque = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._overflow = False
+        self.dropped = 0
+    
+    def push(self, event: Dict) -> bool:
+        """Поставить событие в буфер соединения"""
+        if self._closed:
+            return False
+        
+        event_type = event.get("type")
+        if event_type in LATEST_ONLY_EVENTS:
+            # Баланс устаревает сразу - держим в буфере только последний
+            for i, pending in enumerate(self._buffer):
+                if pending.get("type") == event_type:
+                    del self._buffer[i]
+                    break
+        
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            self._overflow = True
+            logger.warning(f"Буфер WebSocket {self.user_id} переполнен, соединение закрывается")
+            self.close()
+            return False
+        
+        self._buffer.append(event)
+        self._ready.set()
+        return True
+    
+    def close(self):
+        self._closed = True
+        self._ready.set()
+    
+    async def run_writer(self):
+        """Отправлять события из буфера, пока соединение открыто"""
+        try:
+            while not self._closed:
+                await self._ready.wait()
+                self._ready.clear()
+                
+                while self._buffer and not self._closed:
+                    event = self._buffer.popleft()
+                    # send_str ждет, пока транспорт примет данные (backpressure)
+                    await self.ws.send_str(ujson.dumps(event, ensure_ascii=False))
+        except (ConnectionResetError, RuntimeError) as e:
+            logger.debug(f"WebSocket {self.user_id} закрыт при отправке: {e}")
+        finally:
+            self._closed = True
+            if not self.ws.closed:
+                if self._overflow:
+                    await self.ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b"slow consumer")
+                else:
+                    await self.ws.close(code=WSCloseCode.GOING_AWAY)
+
+
+class PushHub:
+    """Соединения этого процесса и доставка им событий"""
+    
+    def __init__(self, max_buffer: int = 100, max_connections_per_user: int = 5):
+        self.max_buffer = max_buffer
+        self.max_connections_per_user = max_connections_per_user
+        # Соединения пользователя в порядке подключения (dict как
+        # упорядоченное множество): первое - самое старое
+        self.connections: Dict[int, Dict[PushConnection, None]] = {}
+        
+        self.stats = {"connections": 0, "delivered": 0, "broadcasts": 0}
+    
+    def add(self, connection: PushConnection):
+        connections = self.connections.setdefault(connection.user_id, {})
+        while len(connections) >= self.max_connections_per_user:
+            # Самое старое соединение уступает место новому
+            oldest = next(iter(connections))
+            del connections[oldest]
+            oldest.close()
+        connections[connection] = None
+        self.stats["connections"] += 1
+    
+    def remove(self, connection: PushConnection):
+        connections = self.connections.get(connection.user_id)
+        if connections is not None:
+            connections.pop(connection, None)
+            if not connections:
+                del self.connections[connection.user_id]
+    
+    def deliver(self, user_id: Optional[int], event: Dict):
+        """Доставить событие пользователю (None - всем подключенным)"""
+        if user_id is None:
+            self.stats["broadcasts"] += 1
+            targets = [c for connections in self.connections.values() for c in connections]
+        else:
+            targets = list(self.connections.get(user_id, ()))
+        
+        for connection in targets:
+            if connection.push(event):
+                self.stats["delivered"] += 1
+
+
+class LocalBroker:
+    """Брокер событий внутри одного процесса"""
+    
+    def __init__(self, hub: PushHub):
+        self.hub = hub
+    
+    def publish(self, user_id: Optional[int], event: Dict):
+        self.hub.deliver(user_id, event)
+    
+    async def start(self):
+        pass
+    
+    async def stop(self):
+        pass
+
+
+class RedisBroker:
+    """
+    Брокер событий через Redis pub/sub
+    
+    Каждый процесс (бот, API) публикует события в общий канал и
+    доставляет полученные события своим соединениям.
+    """
+    
+    def __init__(self, redis, hub: PushHub, channel: str = "casino:push"):
+        self.redis = redis
+        self.hub = hub
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+    
+    def publish(self, user_id: Optional[int], event: Dict):
+        """Опубликовать событие, не дожидаясь Redis"""
+        task = asyncio.create_task(self._publish(user_id, event))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _publish(self, user_id: Optional[int], event: Dict):
+        try:
+            await self.redis.publish(self.channel, ujson.dumps(
+                {"user_id": user_id, "event": event}, default=str
+            ))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка публикации события в Redis: {e}")
+    
+    async def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = ujson.loads(message["data"])
+                    self.hub.deliver(data["user_id"], data["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Подписка на события Redis прервана: {e}")
+                await asyncio.sleep(1)
+    
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+
+class PushService:
+    """Публикация событий для WebApp: балансы, результаты игр, NFT, достижения, общие раунды"""
+    
+    def __init__(self, broker):
+        self.broker = broker
+    
+    def balance_changed(self, user_id: int, fields: Dict):
+        """Слушатель изменений баланса в Database"""
+        balances = {
+            key: fields[key] for key in ("stars_balance", "spins_balance") if key in fields
+        }
+        if balances:
+            self.broker.publish(user_id, {"type": "balance", **balances})
+    
+    def spin_result(self, user_id: int, game: str, result: Dict):
+        self.broker.publish(user_id, {"type": "spin_result", "game": game, "result": result})
+    
+    def nft_awarded(self, user_id: int, nft: Dict):
+        self.broker.publish(user_id, {"type": "nft", "nft": nft})
+    
+    def achievement_unlocked(self, user_id: int, achievement: Dict):
+        self.broker.publish(user_id, {"type": "achievement", "achievement": achievement})
+    
+    def round_event(self, event: Dict):
+        """Событие общего раунда - всем подключенным игрокам"""
+        self.broker.publish(None, {"type": "round", **event})
+
+
+def create_push_service(redis=None, hub: Optional[PushHub] = None) -> PushService:
+    """События через Redis, если он доступен, иначе внутри процесса"""
+    hub = hub or PushHub()
+    broker = RedisBroker(redis, hub) if redis is not None else LocalBroker(hub)
+    return PushService(broker)
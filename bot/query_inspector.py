@@ -0,0 +1,302 @@
+"""
+Проверка запросов к БД в режиме разработки (DEV_MODE=1)
+
+Пул Database оборачивается и каждый запрос относится к текущему
+обновлению бота или запросу API. Отмечаются:
+  - повторы запроса одной формы в пределах обновления (N+1, лишние
+    перечитывания баланса);
+  - запросы дольше порога, с планом EXPLAIN ANALYZE.
+
+При остановке отчет пишется в QUERY_REPORT_FILE (JSON) и кратко в лог.
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import ujson
+
+logger = logging.getLogger(__name__)
+
+# Повторы одной формы запроса в обновлении, начиная с которых это находка
+REPEAT_THRESHOLD = 2
+
+# Запросы, для которых EXPLAIN ANALYZE имеет смысл
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Строки и числа, но не параметры $1
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![$\w.])\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+_scope: contextvars.ContextVar[Optional["QueryScope"]] = contextvars.ContextVar(
+    "query_scope", default=None
+)
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def query_shape(query: str) -> str:
+    """Форма запроса: без литералов и лишних пробелов"""
+    return _SPACES.sub(" ", _LITERALS.sub("?", query)).strip()
+
+
+def _callers() -> Dict[str, str]:
+    """Метод Database и код, который его вызвал"""
+    db_method = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if os.path.abspath(filename) != _THIS_FILE and "asyncio" not in filename:
+            location = f"{os.path.basename(filename)}:{frame.f_code.co_name}"
+            if filename.endswith("database.py"):
+                db_method = db_method or frame.f_code.co_name
+            elif not filename.endswith(("metrics.py", "tracing.py")):
+                return {"db_method": db_method, "caller": location}
+        frame = frame.f_back
+    return {"db_method": db_method, "caller": None}
+
+
+class QueryScope:
+    """Запросы одного обновления или запроса API"""
+    
+    __slots__ = ("label", "shapes", "queries")
+    
+    def __init__(self, label: str):
+        self.label = label
+        # форма -> [количество, суммарное время, места вызова]
+        self.shapes: Dict[str, list] = {}
+        self.queries = 0
+
+
+class QueryInspector:
+    """
+    Поиск повторяющихся и медленных запросов
+    
+    Выключенный инспектор ничего не оборачивает.
+    """
+    
+    QUERY_METHODS = ("fetch", "fetchrow", "fetchval", "execute", "executemany")
+    
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 100.0,
+                 repeat_threshold: int = REPEAT_THRESHOLD,
+                 report_file: str = "query_report.json"):
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        self.report_file = report_file
+        
+        self.pool = None
+        self.scopes = 0
+        self.queries = 0
+        # (метка, форма) -> сводка повторов
+        self.repeats: Dict[tuple, Dict] = {}
+        # форма -> сводка медленных запросов
+        self.slow: Dict[str, Dict] = {}
+        self._explaining: List[asyncio.Task] = []
+    
+    def instrument_pool(self, db):
+        """Обернуть пул после Database.connect"""
+        if not self.enabled or db.pool is None:
+            return
+        self.pool = db.pool
+        db.pool = InspectingPool(db.pool, self)
+    
+    @contextmanager
+    def scope(self, label: str):
+        """Все запросы внутри относятся к одному обновлению или запросу API"""
+        scope = QueryScope(label)
+        token = _scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _scope.reset(token)
+            self._finish(scope)
+    
+    async def inspect_update(self, update: object, coroutine):
+        """Обертка для PerUserUpdateProcessor.update_hooks"""
+        with self.scope(self._update_label(update)):
+            await coroutine
+    
+    @staticmethod
+    def _update_label(update: object) -> str:
+        message = getattr(update, "message", None)
+        callback_query = getattr(update, "callback_query", None)
+        if callback_query is not None:
+            # Параметры кнопки (buy_50_stars) не важны для формы обработки
+            return f"callback:{(callback_query.data or '').split('_')[0]}"
+        if message is not None:
+            if message.web_app_data:
+                return "web_app_data"
+            if message.successful_payment:
+                return "successful_payment"
+            if message.text and message.text.startswith("/"):
+                return f"command:{message.text.split()[0]}"
+            return "message"
+        return type(update).__name__
+    
+    def record(self, query: str, args: tuple, elapsed: float, method: str):
+        self.queries += 1
+        scope = _scope.get()
+        shape = query_shape(query)
+        callers = None
+        
+        if scope is not None:
+            scope.queries += 1
+            entry = scope.shapes.get(shape)
+            if entry is None:
+                entry = scope.shapes[shape] = [0, 0.0, set()]
+            entry[0] += 1
+            entry[1] += elapsed
+            # Места вызова нужны только для повторов
+            if entry[0] >= self.repeat_threshold:
+                callers = _callers()
+                entry[2].add(f"{callers['caller']} -> {callers['db_method']}")
+        
+        if elapsed >= self.slow_query_seconds:
+            callers = callers or _callers()
+            self._record_slow(shape, query, args, elapsed, method, callers,
+                              scope.label if scope else None)
+    
+    def _record_slow(self, shape: str, query: str, args: tuple, elapsed: float,
+                     method: str, callers: Dict, label: Optional[str]):
+        entry = self.slow.get(shape)
+        if entry is None:
+            entry = self.slow[shape] = {
+                "shape": shape,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "callers": set(),
+                "scopes": set(),
+                "plan": None
+            }
+            # План снимается один раз на форму; executemany не объясняется
+            if method != "executemany" and shape.upper().startswith(EXPLAINABLE):
+                task = asyncio.get_running_loop().create_task(self._explain(entry, query, args))
+                self._explaining.append(task)
+        
+        entry["count"] += 1
+        entry["total_ms"] += elapsed * 1000
+        entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+        entry["callers"].add(f"{callers['caller']} -> {callers['db_method']}")
+        if label:
+            entry["scopes"].add(label)
+    
+    async def _explain(self, entry: Dict, query: str, args: tuple):
+        """EXPLAIN ANALYZE в откатываемой транзакции: изменения не сохраняются"""
+        try:
+            async with self.pool.acquire() as conn:
+                transaction = conn.transaction()
+                await transaction.start()
+                try:
+                    rows = await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {query}", *args)
+                    entry["plan"] = [row[0] for row in rows]
+                finally:
+                    await transaction.rollback()
+        except Exception as e:
+            entry["plan"] = [f"EXPLAIN не выполнен: {type(e).__name__}: {e}"]
+    
+    def _finish(self, scope: QueryScope):
+        self.scopes += 1
+        for shape, (count, total, callers) in scope.shapes.items():
+            if count < self.repeat_threshold:
+                continue
+            entry = self.repeats.get((scope.label, shape))
+            if entry is None:
+                entry = self.repeats[(scope.label, shape)] = {
+                    "scope": scope.label,
+                    "shape": shape,
+                    "occurrences": 0,
+                    "max_repeats": 0,
+                    "total_ms": 0.0,
+                    "callers": set()
+                }
+            entry["occurrences"] += 1
+            entry["max_repeats"] = max(entry["max_repeats"], count)
+            entry["total_ms"] += total * 1000
+            entry["callers"] |= callers
+    
+    def report(self) -> Dict:
+        def plain(entry: Dict) -> Dict:
+            return {
+                key: sorted(value) if isinstance(value, set)
+                else round(value, 3) if isinstance(value, float)
+                else value
+                for key, value in entry.items()
+            }
+        
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "scopes": self.scopes,
+            "queries": self.queries,
+            "slow_query_ms": self.slow_query_seconds * 1000,
+            "repeated_queries": [
+                plain(entry) for entry in sorted(
+                    self.repeats.values(),
+                    key=lambda e: (e["occurrences"] * e["max_repeats"]), reverse=True
+                )
+            ],
+            "slow_queries": [
+                plain(entry) for entry in sorted(
+                    self.slow.values(), key=lambda e: e["total_ms"], reverse=True
+                )
+            ]
+        }
+    
+    async def close(self):
+        """Дождаться планов и записать отчет"""
+        if not self.enabled:
+            return
+        if self._explaining:
+            await asyncio.gather(*self._explaining, return_exceptions=True)
+        
+        report = self.report()
+        with open(self.report_file, "w") as f:
+            f.write(ujson.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        
+        logger.info(
+            f"Отчет по запросам: {self.report_file} - обработок {report['scopes']}, "
+            f"запросов {report['queries']}, повторов {len(report['repeated_queries'])}, "
+            f"медленных {len(report['slow_queries'])}"
+        )
+        for entry in report["repeated_queries"][:5]:
+            logger.warning(
+                f"Повтор x{entry['max_repeats']} в {entry['scope']}: {entry['shape'][:120]}"
+            )
+
+
+class InspectingPool:
+    """Пул asyncpg, передающий каждый запрос в QueryInspector"""
+    
+    def __init__(self, pool, inspector: QueryInspector):
+        self._pool = pool
+        for name in QueryInspector.QUERY_METHODS:
+            setattr(self, name, self._inspected(name, getattr(pool, name), inspector))
+    
+    @staticmethod
+    def _inspected(name: str, method, inspector: QueryInspector):
+        async def wrapper(query, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(query, *args, **kwargs)
+            finally:
+                inspector.record(query, args, time.perf_counter() - started, name)
+        return wrapper
+    
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+def create_query_inspector() -> QueryInspector:
+    """Инспектор из окружения: DEV_MODE, SLOW_QUERY_MS, QUERY_REPORT_FILE"""
+    return QueryInspector(
+        enabled=os.getenv("DEV_MODE", "").lower() in ("1", "true", "yes"),
+        slow_query_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+        report_file=os.getenv("QUERY_REPORT_FILE", "query_report.json")
+    )
@@ -0,0 +1,193 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Лимиты по классам действий: (токенов в секунду, емкость корзины)
+DEFAULT_LIMITS = {
+    "command": (1.0, 5),
+    "callback": (3.0, 10),
+    "game": (2.0, 5),
+    "global": (500.0, 1000)
+}
+
+# Корзина для проверки: (ключ, скорость, емкость)
+Bucket = Tuple[str, float, float]
+
+# Атомарная проверка нескольких корзин: токен списывается из всех
+# корзин сразу или ни из одной. Время берется из Redis, чтобы часы
+# разных процессов бота не влияли на результат.
+_TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local states = {}
+
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local burst = tonumber(ARGV[i * 2])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or burst
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    if tokens < 1 then
+        return 0
+    end
+    states[i] = {tokens, rate, burst}
+end
+
+for i, key in ipairs(KEYS) do
+    local state = states[i]
+    redis.call('HSET', key, 'tokens', state[1] - 1, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(state[3] / state[2] * 1000) + 1000)
+end
+return 1
+"""
+
+
+class LocalRateLimiter:
+    """Token bucket в памяти процесса"""
+    
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        # ключ -> [токены, время последнего пополнения]
+        self._buckets: OrderedDict = OrderedDict()
+    
+    async def allow(self, buckets: List[Bucket]) -> bool:
+        """Списать по токену из всех корзин, если во всех они есть"""
+        now = time.monotonic()
+        states = []
+        
+        for key, rate, burst in buckets:
+            state = self._buckets.get(key)
+            if state is None:
+                state = [burst, now]
+            else:
+                state = [min(burst, state[0] + (now - state[1]) * rate), now]
+            
+            if state[0] < 1:
+                return False
+            states.append((key, state))
+        
+        for key, state in states:
+            state[0] -= 1
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+        
+        # Давно не использованные корзины полные - их можно забыть
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        
+        return True
+
+
+class RedisRateLimiter:
+    """Token bucket в Redis для нескольких процессов бота"""
+    
+    def __init__(self, redis, key_prefix: str = "casino:rl:"):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self._script = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+    
+    async def allow(self, buckets: List[Bucket]) -> bool:
+        """Списать по токену из всех корзин, если во всех они есть"""
+        keys = [f"{self.key_prefix}{key}" for key, _, _ in buckets]
+        args = []
+        for _, rate, burst in buckets:
+            args.extend((rate, burst))
+        
+        return bool(await self._script(keys=keys, args=args))
+
+
+class RateLimitMiddleware:
+    """
+    Ограничение частоты запросов перед обработчиками
+    
+    Регистрируется как TypeHandler(Update) в группе -1 и останавливает
+    обработку обновления, если у пользователя или у бота в целом
+    закончились токены.
+    """
+    
+    def __init__(self, limiter, limits: Optional[Dict] = None):
+        self.limiter = limiter
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        
+        self.allowed: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.errors = 0
+    
+    @staticmethod
+    def classify(update: Update) -> Optional[str]:
+        """Класс действия обновления (None - без ограничений)"""
+        if update.callback_query:
+            return "callback"
+        
+        message = update.effective_message
+        if message is None or update.pre_checkout_query:
+            return None
+        
+        # Платежи никогда не ограничиваем
+        if message.successful_payment:
+            return None
+        if message.web_app_data:
+            return "game"
+        if message.text and message.text.startswith("/"):
+            return "command"
+        
+        return None
+    
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        action = self.classify(update)
+        user = update.effective_user
+        if action is None or user is None:
+            return
+        
+        rate, burst = self.limits[action]
+        global_rate, global_burst = self.limits["global"]
+        buckets = [
+            (f"{action}:{user.id}", rate, burst),
+            ("global", global_rate, global_burst)
+        ]
+        
+        try:
+            allowed = await self.limiter.allow(buckets)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            # Недоступный Redis не должен останавливать бота
+            self.errors += 1
+            logger.warning(f"Ошибка лимитера, запрос пропущен: {e}")
+            return
+        
+        if allowed:
+            self.allowed[action] = self.allowed.get(action, 0) + 1
+            return
+        
+        self.rejected[action] = self.rejected.get(action, 0) + 1
+        logger.debug(f"Превышен лимит {action} для {user.id}")
+        
+        if update.callback_query:
+            try:
+                await update.callback_query.answer("⏳ Слишком часто, подождите немного")
+            except Exception:
+                pass
+        
+        raise ApplicationHandlerStop
+    
+    def stats(self) -> Dict:
+        """Счетчики пропущенных и отклоненных запросов"""
+        return {
+            "allowed": dict(self.allowed),
+            "rejected": dict(self.rejected),
+            "errors": self.errors
+        }
+
+
+def create_rate_limiter(redis=None, limits: Optional[Dict] = None) -> RateLimitMiddleware:
+    """Лимитер на Redis, если он доступен, иначе локальный"""
+    limiter = RedisRateLimiter(redis) if redis is not None else LocalRateLimiter()
+    return RateLimitMiddleware(limiter, limits)
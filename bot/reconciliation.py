@@ -0,0 +1,322 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Форматы CSV-выгрузок провайдеров: порядок колонок в файле и
+# соответствие колонкам таблицы provider_reports
+REPORT_FORMATS = {
+    "yookassa": {
+        "columns": ["payment_id", "status", "amount", "currency", "created_at", "description"],
+        "provider_payment_id": "payment_id",
+        "amount": "amount",
+        "currency": "currency",
+        "status": "status",
+        "paid_at": "created_at",
+        "amount_scale": 100,  # рубли в отчете -> копейки в payments.amount
+        "success_statuses": ["succeeded"],
+        "delimiter": ","
+    }
+}
+
+MISMATCH_KINDS = ["missing_in_db", "missing_in_report", "duplicate", "amount_differs"]
+
+
+def _ident(name: str) -> str:
+    """Экранировать имя колонки для SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _affected(status: str) -> int:
+    """Количество строк из статуса команды asyncpg ("INSERT 0 5")"""
+    try:
+        return int(status.split()[-1])
+    except (ValueError, IndexError):
+        return 0
+
+
+class PaymentReconciliation:
+    """Сверка таблицы payments с отчетами платежных провайдеров"""
+    
+    def __init__(self, db, provider: str, report_format: Optional[Dict] = None):
+        self.db = db
+        self.provider = provider
+        self.format = report_format or REPORT_FORMATS[provider]
+    
+    async def import_report(self, path: str) -> int:
+        """
+        Загрузить CSV-выгрузку провайдера в provider_reports
+        
+        Файл передается в COPY потоком, поэтому размер не ограничен.
+        Строки, уже загруженные из этого или другого файла, не дублируются:
+        выгрузку под прежним именем можно загружать снова.
+        
+        Args:
+            path: Путь к CSV файлу
+        
+        Returns:
+            Количество новых строк отчета
+        """
+        fmt = self.format
+        columns = fmt["columns"]
+        source_file = os.path.basename(path)
+        
+        column_defs = ", ".join(f"{_ident(column)} TEXT" for column in columns)
+        
+        async with self.db.pool.acquire() as conn:
+            async with conn.transaction():
+                # line_no заполняется последовательностью в порядке строк файла
+                await conn.execute(f'''
+                    CREATE TEMP TABLE report_import (
+                        line_no BIGSERIAL,
+                        {column_defs}
+                    ) ON COMMIT DROP
+                ''')
+                
+                await conn.copy_to_table(
+                    'report_import',
+                    source=path,
+                    columns=columns,
+                    format='csv',
+                    header=True,
+                    delimiter=fmt.get("delimiter", ",")
+                )
+                
+                # row_hash - содержимое строки и номер ее повтора в файле:
+                # строки, уже загруженные из прошлой выгрузки (под тем же
+                # или другим именем), пропускаются, новые - добавляются
+                status = await conn.execute(f'''
+                    INSERT INTO provider_reports
+                    (provider, source_file, line_no, row_hash, provider_payment_id,
+                     amount, currency, status, paid_at)
+                    SELECT $1, $2, r.line_no,
+                           md5(ROW(r.provider_payment_id, r.amount, r.currency, r.status, r.paid_at)::text)
+                           || ':' || ROW_NUMBER() OVER (
+                               PARTITION BY r.provider_payment_id, r.amount, r.currency, r.status, r.paid_at
+                               ORDER BY r.line_no
+                           ),
+                           r.provider_payment_id, r.amount, r.currency, r.status, r.paid_at
+                    FROM (
+                        SELECT line_no,
+                               NULLIF(TRIM({_ident(fmt["provider_payment_id"])}), '') AS provider_payment_id,
+                               ROUND(REPLACE(NULLIF(TRIM({_ident(fmt["amount"])}), ''), ',', '.')::numeric * $3)::int AS amount,
+                               UPPER(TRIM({_ident(fmt["currency"])})) AS currency,
+                               LOWER(TRIM({_ident(fmt["status"])})) AS status,
+                               NULLIF(TRIM({_ident(fmt["paid_at"])}), '')::timestamp AS paid_at
+                        FROM report_import
+                    ) r
+                    ON CONFLICT (provider, row_hash) DO NOTHING
+                ''', self.provider, source_file, fmt.get("amount_scale", 1))
+        
+        imported = _affected(status)
+        logger.info(f"Отчет {source_file} ({self.provider}) загружен: {imported} новых строк")
+        return imported
+    
+    async def reconcile(self, incremental: bool = True) -> Dict:
+        """
+        Сверить строки отчетов с платежами
+        
+        Args:
+            incremental: Обрабатывать только строки, загруженные после
+                         предыдущей сверки
+        
+        Returns:
+            Количество найденных расхождений по видам
+        """
+        success_statuses = self.format.get("success_statuses", [])
+        result = {kind: 0 for kind in MISMATCH_KINDS}
+        
+        async with self.db.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute('''
+                    INSERT INTO reconciliation_checkpoints (provider)
+                    VALUES ($1)
+                    ON CONFLICT (provider) DO NOTHING
+                ''', self.provider)
+                
+                # Блокировка не дает двум сверкам обработать одну пачку
+                last_row_id = await conn.fetchval('''
+                    SELECT last_report_row_id FROM reconciliation_checkpoints
+                    WHERE provider = $1
+                    FOR UPDATE
+                ''', self.provider)
+                
+                if not incremental:
+                    last_row_id = 0
+                
+                max_row_id = await conn.fetchval('''
+                    SELECT MAX(report_row_id) FROM provider_reports
+                    WHERE provider = $1 AND report_row_id > $2
+                ''', self.provider, last_row_id)
+                
+                if max_row_id is None:
+                    logger.info(f"Сверка {self.provider}: новых строк отчета нет")
+                    return result
+                
+                # Строки пачки: ($2, $3] по report_row_id
+                args = (self.provider, last_row_id, max_row_id, success_statuses)
+                
+                # Платежи, появившиеся в отчете, больше не считаются пропущенными
+                await conn.execute('''
+                    DELETE FROM reconciliation_mismatches m
+                    USING provider_reports r
+                    WHERE m.provider = $1
+                      AND m.kind = 'missing_in_report'
+                      AND r.provider = $1
+                      AND r.report_row_id > $2 AND r.report_row_id <= $3
+                      AND r.status = ANY($4::text[])
+                      AND r.provider_payment_id = m.provider_payment_id
+                ''', *args)
+                
+                status = await conn.execute('''
+                    INSERT INTO reconciliation_mismatches
+                    (provider, kind, provider_payment_id, report_amount)
+                    SELECT DISTINCT ON (r.provider_payment_id)
+                           $1, 'missing_in_db', r.provider_payment_id, r.amount
+                    FROM provider_reports r
+                    WHERE r.provider = $1
+                      AND r.report_row_id > $2 AND r.report_row_id <= $3
+                      AND r.status = ANY($4::text[])
+                      AND r.provider_payment_id IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM payments p
+                          WHERE p.provider = $1
+                            AND p.provider_payment_id = r.provider_payment_id
+                      )
+                    ON CONFLICT (provider, kind, provider_payment_id) DO NOTHING
+                ''', *args)
+                result["missing_in_db"] = _affected(status)
+                
+                status = await conn.execute('''
+                    INSERT INTO reconciliation_mismatches
+                    (provider, kind, provider_payment_id, report_count)
+                    SELECT $1, 'duplicate', r.provider_payment_id, COUNT(*)
+                    FROM provider_reports r
+                    WHERE r.provider = $1
+                      AND r.status = ANY($4::text[])
+                      AND r.provider_payment_id IN (
+                          SELECT provider_payment_id FROM provider_reports
+                          WHERE provider = $1
+                            AND report_row_id > $2 AND report_row_id <= $3
+                      )
+                    GROUP BY r.provider_payment_id
+                    HAVING COUNT(*) > 1
+                    ON CONFLICT (provider, kind, provider_payment_id) DO UPDATE
+                    SET report_count = EXCLUDED.report_count,
+                        detected_at = NOW()
+                ''', *args)
+                result["duplicate"] = _affected(status)
+                
+                status = await conn.execute('''
+                    INSERT INTO reconciliation_mismatches
+                    (provider, kind, provider_payment_id, payment_id,
+                     report_amount, db_amount)
+                    SELECT DISTINCT ON (r.provider_payment_id)
+                           $1, 'amount_differs', r.provider_payment_id,
+                           p.payment_id, r.amount, p.amount
+                    FROM provider_reports r
+                    JOIN payments p
+                      ON p.provider = $1
+                     AND p.provider_payment_id = r.provider_payment_id
+                    WHERE r.provider = $1
+                      AND r.report_row_id > $2 AND r.report_row_id <= $3
+                      AND r.status = ANY($4::text[])
+                      AND r.amount IS DISTINCT FROM p.amount
+                    ON CONFLICT (provider, kind, provider_payment_id) DO NOTHING
+                ''', *args)
+                result["amount_differs"] = _affected(status)
+                
+                # Платежи из периода, покрытого пачкой, которых нет в отчетах
+                status = await conn.execute('''
+                    WITH period AS (
+                        SELECT MIN(paid_at) AS period_start, MAX(paid_at) AS period_end
+                        FROM provider_reports
+                        WHERE provider = $1
+                          AND report_row_id > $2 AND report_row_id <= $3
+                    )
+                    INSERT INTO reconciliation_mismatches
+                    (provider, kind, provider_payment_id, payment_id, db_amount)
+                    SELECT $1, 'missing_in_report', p.provider_payment_id,
+                           p.payment_id, p.amount
+                    FROM payments p, period
+                    WHERE p.provider = $1
+                      AND p.status = 'completed'
+                      AND p.created_at BETWEEN period.period_start AND period.period_end
+                      AND NOT EXISTS (
+                          SELECT 1 FROM provider_reports r
+                          WHERE r.provider = $1
+                            AND r.provider_payment_id = p.provider_payment_id
+                            AND r.status = ANY($4::text[])
+                      )
+                    ON CONFLICT (provider, kind, provider_payment_id) DO NOTHING
+                ''', *args)
+                result["missing_in_report"] = _affected(status)
+                
+                await conn.execute('''
+                    UPDATE reconciliation_checkpoints
+                    SET last_report_row_id = GREATEST(last_report_row_id, $2),
+                        updated_at = NOW()
+                    WHERE provider = $1
+                ''', self.provider, max_row_id)
+        
+        logger.info(f"Сверка {self.provider} до строки {max_row_id}: {result}")
+        return result
+    
+    async def run(self, paths: List[str], incremental: bool = True) -> Dict:
+        """Загрузить выгрузки и выполнить сверку"""
+        imported = 0
+        for path in paths:
+            imported += await self.import_report(path)
+        
+        mismatches = await self.reconcile(incremental=incremental)
+        
+        return {
+            "provider": self.provider,
+            "imported_rows": imported,
+            "mismatches": mismatches
+        }
+    
+    async def get_mismatches(self, kind: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Получить найденные расхождения"""
+        rows = await self.db.pool.fetch('''
+            SELECT * FROM reconciliation_mismatches
+            WHERE provider = $1 AND ($2::text IS NULL OR kind = $2)
+            ORDER BY detected_at DESC
+            LIMIT $3
+        ''', self.provider, kind, limit)
+        
+        return [dict(row) for row in rows]
+
+
+async def main(provider: str, paths: List[str], incremental: bool = True):
+    """Запуск сверки из командной строки"""
+    from config import Config
+    from database import Database
+    
+    db = Database(Config().DB_URL)
+    await db.initialize()
+    
+    try:
+        result = await PaymentReconciliation(db, provider).run(paths, incremental=incremental)
+        print(result)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    parser = argparse.ArgumentParser(description="Сверка платежей с отчетами провайдера")
+    parser.add_argument("provider", choices=sorted(REPORT_FORMATS))
+    parser.add_argument("reports", nargs="+", help="CSV-выгрузки провайдера")
+    parser.add_argument("--full", action="store_true", help="Пересверить все строки отчетов")
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.provider, args.reports, incremental=not args.full))
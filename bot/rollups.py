@@ -0,0 +1,369 @@
+"""
+Почасовые и дневные сводки для админ-статистики
+
+Сводки строятся из журнала расчетов settlement_events (все игры), payments
+и users инкрементально:
+позиция хранится в rollup_checkpoints, каждая пачка часов пересчитывается
+целиком (DELETE + INSERT в одной транзакции), поэтому повторный прогон
+ничего не удваивает, а после простоя бот догоняет пропущенные часы.
+
+Запрос статистики за период читает дневные строки для целых дней,
+почасовые - для краев периода и считает напрямую из таблиц только
+хвост после последнего свернутого часа.
+
+Полная пересборка:
+    python rollups.py --rebuild
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Новая позиция при смене источников: сводки пересобираются с первого часа
+CHECKPOINT = "stats_v2"
+
+# Расчеты игр: журнал пишется в транзакции ставки, поэтому закрытый час
+# в нем полон, в отличие от mono_history, которую догоняет потребитель.
+# Строки mono_history без event_id - история до появления журнала
+SETTLEMENTS = """
+    SELECT game, user_id, created_at, bet_stars, win_stars,
+           COALESCE((details->>'won')::boolean, win_stars > 0) AS won,
+           COALESCE((details->>'nft_awarded')::boolean, FALSE) AS nft_awarded
+    FROM settlement_events
+    UNION ALL
+    SELECT 'mono', user_id, created_at, bet_stars, win_stars, won, nft_awarded
+    FROM mono_history
+    WHERE event_id IS NULL
+"""
+
+# Сводка -> (ключевые колонки, суммируемые колонки)
+ROLLUPS = {
+    "games": (("game",), ("games", "wins", "wagered_stars", "won_stars", "nfts")),
+    "payments": (("product_type", "currency"), ("payments", "amount", "product_amount")),
+    "users": ((), ("new_users",))
+}
+
+# Единица сводки -> выражение корзины
+UNITS = {
+    "hourly": "date_trunc('hour', created_at)",
+    "daily": "date_trunc('day', created_at)"
+}
+
+
+def _floor_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil_day(moment: datetime) -> datetime:
+    day = _floor_day(moment)
+    return day if day == moment else day + timedelta(days=1)
+
+
+def _source_queries(rollup: str, bucket: str) -> List[str]:
+    """SELECT по таблицам-источникам: корзина, ключи, значения; диапазон $1..$2"""
+    if rollup == "games":
+        return [f'''
+            SELECT {bucket} AS bucket, game,
+                   COUNT(*) AS games,
+                   COUNT(*) FILTER (WHERE won) AS wins,
+                   COALESCE(SUM(bet_stars), 0) AS wagered_stars,
+                   COALESCE(SUM(win_stars), 0) AS won_stars,
+                   COUNT(*) FILTER (WHERE nft_awarded) AS nfts
+            FROM ({SETTLEMENTS}) AS settlements
+            WHERE created_at >= $1 AND created_at < $2
+            GROUP BY 1, 2
+        ''']
+    
+    if rollup == "payments":
+        return [f'''
+            SELECT {bucket} AS bucket, product_type, currency,
+                   COUNT(*) AS payments,
+                   COALESCE(SUM(amount), 0) AS amount,
+                   COALESCE(SUM(product_amount), 0) AS product_amount
+            FROM payments
+            WHERE created_at >= $1 AND created_at < $2 AND status = 'completed'
+            GROUP BY 1, 2, 3
+        ''']
+    
+    return [f'''
+        SELECT {bucket} AS bucket, COUNT(*) AS new_users
+        FROM users
+        WHERE created_at >= $1 AND created_at < $2
+        GROUP BY 1
+    ''']
+
+
+def _activity_queries() -> List[str]:
+    """Пары (день, пользователь) из игр и платежей; диапазон $1..$2"""
+    return [
+        f"SELECT user_id, created_at FROM ({SETTLEMENTS}) AS settlements "
+        "WHERE created_at >= $1 AND created_at < $2",
+        "SELECT user_id, created_at FROM payments "
+        "WHERE created_at >= $1 AND created_at < $2 AND status = 'completed'"
+    ]
+
+
+class StatsRollup:
+    """Инкрементальные сводки и статистика за период по ним"""
+    
+    def __init__(self, db, batch_hours: int = 24 * 7, settle_seconds: int = 60):
+        self.db = db
+        # Часов в одной транзакции при догоне
+        self.batch_hours = batch_hours
+        # Час сворачивается, когда с его конца прошло settle_seconds:
+        # транзакции, начатые до границы часа, успевают зафиксироваться
+        self.settle_seconds = settle_seconds
+    
+    async def refresh(self) -> int:
+        """
+        Свернуть закрытые часы после последней позиции
+        
+        Returns:
+            Количество свернутых часов
+        """
+        rolled = 0
+        while True:
+            async with self.db.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute('''
+                        INSERT INTO rollup_checkpoints (name)
+                        VALUES ($1)
+                        ON CONFLICT (name) DO NOTHING
+                    ''', CHECKPOINT)
+                    
+                    # Блокировка не дает двум процессам свернуть одну пачку
+                    last_hour = await conn.fetchval('''
+                        SELECT last_hour FROM rollup_checkpoints
+                        WHERE name = $1
+                        FOR UPDATE
+                    ''', CHECKPOINT)
+                    
+                    closed_hour = await conn.fetchval('''
+                        SELECT date_trunc('hour', LOCALTIMESTAMP - make_interval(secs => $1))
+                    ''', self.settle_seconds)
+                    
+                    if last_hour is None:
+                        last_hour = await self._first_hour(conn)
+                        if last_hour is None:
+                            return rolled
+                    
+                    if last_hour >= closed_hour:
+                        return rolled
+                    
+                    batch_end = min(closed_hour, last_hour + timedelta(hours=self.batch_hours))
+                    await self._roll(conn, last_hour, batch_end)
+                    
+                    await conn.execute('''
+                        UPDATE rollup_checkpoints
+                        SET last_hour = $2, updated_at = NOW()
+                        WHERE name = $1
+                    ''', CHECKPOINT, batch_end)
+            
+            hours = int((batch_end - last_hour).total_seconds() // 3600)
+            rolled += hours
+            logger.info(f"Сводки свернуты до {batch_end:%Y-%m-%d %H:00} (+{hours} ч)")
+    
+    async def _first_hour(self, conn) -> Optional[datetime]:
+        """Час самой ранней строки в источниках"""
+        tables = ["settlement_events", "mono_history", "payments", "users"]
+        first = None
+        for table in tables:
+            moment = await conn.fetchval(f'SELECT MIN(created_at) FROM {table}')
+            if moment is not None and (first is None or moment < first):
+                first = moment
+        return first.replace(minute=0, second=0, microsecond=0) if first else None
+    
+    async def _roll(self, conn, start: datetime, end: datetime):
+        """Пересчитать сводки за [start, end) - часы целиком, дни с начала суток"""
+        for unit, bucket in UNITS.items():
+            # Дневная строка последнего дня пачки частичная до следующей пачки
+            unit_start = _floor_day(start) if unit == "daily" else start
+            
+            for rollup, (keys, values) in ROLLUPS.items():
+                table = f"stats_{unit}_{rollup}"
+                columns = ", ".join(("bucket",) + keys + values)
+                
+                await conn.execute(
+                    f'DELETE FROM {table} WHERE bucket >= $1 AND bucket < $2',
+                    unit_start, end
+                )
+                for query in _source_queries(rollup, bucket):
+                    await conn.execute(
+                        f'INSERT INTO {table} ({columns}) {query}', unit_start, end
+                    )
+        
+        for query in _activity_queries():
+            await conn.execute(f'''
+                INSERT INTO stats_daily_active_users (bucket, user_id)
+                SELECT DISTINCT date_trunc('day', created_at), user_id
+                FROM ({query}) AS activity
+                WHERE user_id IS NOT NULL
+                ON CONFLICT DO NOTHING
+            ''', start, end)
+    
+    async def rebuild(self):
+        """Удалить сводки и свернуть все заново"""
+        async with self.db.pool.acquire() as conn:
+            async with conn.transaction():
+                for unit in UNITS:
+                    for rollup in ROLLUPS:
+                        await conn.execute(f'TRUNCATE stats_{unit}_{rollup}')
+                await conn.execute('TRUNCATE stats_daily_active_users')
+                await conn.execute('DELETE FROM rollup_checkpoints WHERE name = $1', CHECKPOINT)
+        
+        return await self.refresh()
+    
+    async def run_periodically(self, interval: float = 300):
+        """Сворачивать новые часы каждые interval секунд"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка сворачивания сводок: {e}")
+            
+            await asyncio.sleep(interval)
+    
+    @staticmethod
+    def _segments(start: datetime, end: datetime,
+                  rolled_until: Optional[datetime]) -> List[Tuple[str, datetime, datetime]]:
+        """
+        Разбить период на части: daily - целые дни, hourly - края,
+        live - все после последнего свернутого часа
+        """
+        full_start, full_end = _ceil_day(start), _floor_day(end)
+        if full_start < full_end:
+            parts = [("hourly", start, full_start), ("daily", full_start, full_end),
+                     ("hourly", full_end, end)]
+        else:
+            parts = [("hourly", start, end)]
+        
+        rolled_until = rolled_until or start
+        segments = []
+        for unit, part_start, part_end in parts:
+            if part_start >= part_end:
+                continue
+            if part_start < rolled_until:
+                segments.append((unit, part_start, min(part_end, rolled_until)))
+            if part_end > rolled_until:
+                live_start = max(part_start, rolled_until)
+                # Соседние живые части читаются одним запросом
+                if segments and segments[-1][0] == "live" and segments[-1][2] == live_start:
+                    live_start = segments.pop()[1]
+                segments.append(("live", live_start, part_end))
+        return segments
+    
+    async def totals(self, start: datetime, end: Optional[datetime] = None) -> Dict:
+        """
+        Статистика за [start, end), по умолчанию до текущего момента
+        
+        Начало периода округляется до часа, конец свернутой части - до
+        часа вверх. Активные игроки считаются по дням.
+        """
+        started = time.perf_counter()
+        start = start.replace(minute=0, second=0, microsecond=0)
+        
+        async with self.db.pool.acquire() as conn:
+            if end is None:
+                end = await conn.fetchval('SELECT LOCALTIMESTAMP')
+            rolled_until = await conn.fetchval(
+                'SELECT last_hour FROM rollup_checkpoints WHERE name = $1', CHECKPOINT
+            )
+            segments = self._segments(start, end, rolled_until)
+            
+            result = {}
+            for rollup, (keys, values) in ROLLUPS.items():
+                merged: Dict[tuple, Dict] = {}
+                for unit, segment_start, segment_end in segments:
+                    for row in await self._read(conn, rollup, unit, segment_start, segment_end):
+                        entry = merged.setdefault(
+                            tuple(row[key] for key in keys), dict.fromkeys(values, 0)
+                        )
+                        for value in values:
+                            entry[value] += row[value] or 0
+                result[rollup] = merged
+            
+            result["active_users"] = await self._active_users(conn, start, end, rolled_until)
+        
+        return {
+            "start": start,
+            "end": end,
+            "rolled_until": rolled_until,
+            "games": {key[0]: entry for key, entry in result["games"].items()},
+            "payments": result["payments"],
+            "new_users": result["users"].get((), {}).get("new_users", 0),
+            "active_users": result["active_users"],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    
+    async def _read(self, conn, rollup: str, unit: str, start: datetime, end: datetime):
+        """Суммы по ключам сводки из таблицы сводок или, для live, из источников"""
+        keys, values = ROLLUPS[rollup]
+        group = ", ".join(keys)
+        sums = ", ".join(f"SUM({value})::bigint AS {value}" for value in values)
+        select = f"{group}, {sums}" if keys else sums
+        group_by = f"GROUP BY {group}" if keys else ""
+        
+        if unit == "live":
+            source = " UNION ALL ".join(_source_queries(rollup, UNITS["hourly"]))
+        else:
+            source = f"SELECT * FROM stats_{unit}_{rollup} WHERE bucket >= $1 AND bucket < $2"
+        
+        return await conn.fetch(
+            f"SELECT {select} FROM ({source}) AS source {group_by}", start, end
+        )
+    
+    async def _active_users(self, conn, start: datetime, end: datetime,
+                            rolled_until: Optional[datetime]) -> int:
+        """Уникальные игроки и плательщики: свернутые дни плюс живой хвост"""
+        tail_start = max(start, rolled_until or start)
+        live = " UNION ".join(
+            f"SELECT user_id FROM ({query}) AS activity" for query in _activity_queries()
+        ).replace("$1", "$3")
+        
+        return await conn.fetchval(f'''
+            SELECT COUNT(*) FROM (
+                SELECT user_id FROM stats_daily_active_users
+                WHERE bucket >= $1 AND bucket < $2
+                UNION
+                {live}
+            ) AS active
+        ''', _floor_day(start), end, tail_start)
+    
+    async def period_totals(self, days: int) -> Dict:
+        """Статистика с начала суток days - 1 дней назад до текущего момента"""
+        today = await self.db.pool.fetchval("SELECT date_trunc('day', LOCALTIMESTAMP)")
+        return await self.totals(today - timedelta(days=days - 1))
+
+
+async def main(rebuild: bool = False):
+    """Запуск сворачивания из командной строки"""
+    from config import Config
+    from database import Database
+    
+    db = Database(Config().DB_URL)
+    await db.initialize()
+    
+    try:
+        rollup = StatsRollup(db)
+        hours = await (rollup.rebuild() if rebuild else rollup.refresh())
+        print({"rolled_hours": hours})
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    parser = argparse.ArgumentParser(description="Почасовые и дневные сводки статистики")
+    parser.add_argument("--rebuild", action="store_true", help="Пересобрать сводки с нуля")
+    args = parser.parse_args()
+    
+    asyncio.run(main(rebuild=args.rebuild))
@@ -0,0 +1,140 @@
+import time
+import logging
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ключ узла префиксного дерева, под которым хранится маршрут
+_ROUTE = None
+
+
+class Route:
+    """Маршрут callback-кнопки со статистикой вызовов"""
+    
+    __slots__ = ("name", "handler", "arg_types", "calls", "errors", "total_time", "max_time")
+    
+    def __init__(self, name: str, handler: Callable, arg_types: Sequence[type] = ()):
+        self.name = name
+        self.handler = handler
+        self.arg_types = tuple(arg_types)
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+    
+    def parse_args(self, tail: str) -> Optional[Tuple]:
+        """Разобрать параметры из хвоста callback_data"""
+        if not self.arg_types:
+            return () if not tail else None
+        
+        parts = tail.split("_", len(self.arg_types) - 1)
+        if len(parts) != len(self.arg_types):
+            return None
+        
+        try:
+            return tuple(arg_type(part) for arg_type, part in zip(self.arg_types, parts))
+        except ValueError:
+            return None
+    
+    def stats(self) -> Dict:
+        """Статистика маршрута"""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": (self.total_time / self.calls * 1000) if self.calls else 0,
+            "max_ms": self.max_time * 1000
+        }
+
+
+class CallbackRouter:
+    """
+    Маршрутизатор callback_data
+    
+    Точные значения ищутся в словаре, параметризованные (buy_*, exchange_*,
+    admin_*) - по префиксному дереву с выбором самого длинного префикса.
+    """
+    
+    def __init__(self):
+        self.exact_routes: Dict[str, Route] = {}
+        self.prefix_tree: Dict = {}
+        self.unmatched = 0
+    
+    def exact(self, data: str, handler: Callable):
+        """Зарегистрировать обработчик точного значения callback_data"""
+        self.exact_routes[data] = Route(data, handler)
+    
+    def prefix(self, prefix: str, handler: Callable, arg_types: Sequence[type] = (str,)):
+        """
+        Зарегистрировать обработчик параметризованного callback_data
+        
+        Args:
+            prefix: Общий префикс, например "buy_"
+            handler: Корутина handler(update, context, *args)
+            arg_types: Типы параметров, разделенных "_" после префикса
+        """
+        node = self.prefix_tree
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[_ROUTE] = Route(prefix + "*", handler, arg_types)
+    
+    def resolve(self, data: str) -> Tuple[Optional[Route], Tuple]:
+        """Найти маршрут и параметры для callback_data"""
+        route = self.exact_routes.get(data)
+        if route is not None:
+            return route, ()
+        
+        # Собираем все подходящие префиксы, пробуем от самого длинного
+        candidates = []
+        node = self.prefix_tree
+        for index, char in enumerate(data):
+            node = node.get(char)
+            if node is None:
+                break
+            if _ROUTE in node:
+                candidates.append((index + 1, node[_ROUTE]))
+        
+        for end, route in reversed(candidates):
+            args = route.parse_args(data[end:])
+            if args is not None:
+                return route, args
+        
+        return None, ()
+    
+    async def dispatch(self, data: str, update, context) -> bool:
+        """Вызвать обработчик для callback_data"""
+        route, args = self.resolve(data)
+        if route is None:
+            self.unmatched += 1
+            logger.debug(f"Нет обработчика для callback: {data}")
+            return False
+        
+        started = time.perf_counter()
+        try:
+            await route.handler(update, context, *args)
+        except Exception:
+            route.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            route.calls += 1
+            route.total_time += elapsed
+            if elapsed > route.max_time:
+                route.max_time = elapsed
+        
+        return True
+    
+    def get_stats(self) -> Dict:
+        """Статистика по всем маршрутам"""
+        stats = {name: route.stats() for name, route in self.exact_routes.items()}
+        
+        stack = [self.prefix_tree]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is _ROUTE:
+                    stats[child.name] = child.stats()
+                else:
+                    stack.append(child)
+        
+        stats["_unmatched"] = {"calls": self.unmatched}
+        return stats
@@ -0,0 +1,359 @@
+import time
+import heapq
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram Bot API: ~30 сообщений в секунду всего,
+# 1 сообщение в секунду в личный чат, 20 сообщений в минуту в группу
+GLOBAL_RATE = 30.0
+PRIVATE_CHAT_INTERVAL = 1.0
+GROUP_CHAT_INTERVAL = 3.0
+
+# Максимальная длина сообщения после склейки уведомлений
+MAX_MESSAGE_LENGTH = 4096
+
+
+class OutgoingMessage:
+    """Сообщение в очереди отправки"""
+    
+    __slots__ = ("chat_id", "text", "kwargs", "coalesce", "future", "attempts")
+    
+    def __init__(self, chat_id: int, text: str, kwargs: Dict, coalesce: bool,
+                 future: Optional[asyncio.Future] = None):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.future = future
+        self.attempts = 0
+
+
+class MessageSender:
+    """
+    Единая очередь исходящих сообщений бота
+    
+    Сообщения группируются по чатам: у каждого чата своя очередь и время,
+    раньше которого в него нельзя писать. Чаты, готовые к отправке,
+    лежат в куче по времени готовности; несколько воркеров забирают их
+    оттуда, соблюдая общий лимит бота. Уведомления с coalesce=True,
+    накопившиеся в одном чате, склеиваются в одно сообщение.
+    """
+    
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE,
+                 chat_interval: float = PRIVATE_CHAT_INTERVAL,
+                 group_interval: float = GROUP_CHAT_INTERVAL,
+                 workers: int = 8, max_queued: int = 100000,
+                 max_retries: int = 5):
+        self.bot = bot
+        self.global_interval = 1.0 / global_rate
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_retries = max_retries
+        
+        # chat_id -> очередь сообщений
+        self._chats: Dict[int, deque] = {}
+        # chat_id -> момент, раньше которого писать в чат нельзя
+        self._chat_ready: Dict[int, float] = {}
+        # Куча (время готовности, порядковый номер, chat_id)
+        self._ready = []
+        self._seq = 0
+        self._queued = 0
+        # Чаты, которые сейчас отправляет какой-либо воркер
+        self._busy = set()
+        
+        self._next_global = 0.0
+        self._paused_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._tasks = []
+        # closing - новые сообщения не принимаются, closed - воркеры остановлены
+        self._closing = False
+        self._closed = False
+        
+        self.stats = {
+            "queued": 0, "sent": 0, "coalesced": 0, "failed": 0,
+            "blocked": 0, "retry_after": 0, "dropped": 0
+        }
+    
+    # Постановка в очередь
+    
+    def notify(self, chat_id: int, text: str, coalesce: bool = True, **kwargs) -> bool:
+        """
+        Поставить уведомление в очередь, не дожидаясь отправки
+        
+        Returns:
+            False, если очередь переполнена
+        """
+        return self._enqueue(OutgoingMessage(chat_id, text, kwargs, coalesce))
+    
+    async def send(self, chat_id: int, text: str, **kwargs):
+        """Отправить сообщение через очередь и дождаться результата"""
+        future = asyncio.get_running_loop().create_future()
+        if not self._enqueue(OutgoingMessage(chat_id, text, kwargs, False, future)):
+            raise RuntimeError("Очередь исходящих сообщений переполнена")
+        return await future
+    
+    def _enqueue(self, message: OutgoingMessage) -> bool:
+        if self._closing:
+            return False
+        if self._queued >= self.max_queued:
+            self.stats["dropped"] += 1
+            logger.warning(f"Очередь сообщений переполнена, сообщение в {message.chat_id} отброшено")
+            return False
+        
+        self._ensure_workers()
+        
+        queue = self._chats.get(message.chat_id)
+        if queue is None:
+            queue = self._chats[message.chat_id] = deque()
+        queue.append(message)
+        self._queued += 1
+        self.stats["queued"] += 1
+        self._drained.clear()
+        
+        # Чат попадает в кучу при появлении первого сообщения; занятый
+        # чат воркер вернет в кучу сам после отправки
+        if len(queue) == 1 and message.chat_id not in self._busy:
+            self._schedule(message.chat_id)
+        
+        return True
+    
+    def _schedule(self, chat_id: int):
+        ready_at = self._chat_ready.get(chat_id, 0.0)
+        self._seq += 1
+        heapq.heappush(self._ready, (ready_at, self._seq, chat_id))
+        self._wakeup.set()
+    
+    # Воркеры
+    
+    def _ensure_workers(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+    
+    async def _next_chat(self) -> int:
+        """Дождаться чата, в который уже можно писать"""
+        while True:
+            now = time.monotonic()
+            if self._ready and self._ready[0][0] <= now and self._paused_until <= now:
+                return heapq.heappop(self._ready)[2]
+            
+            if self._ready:
+                timeout = max(self._ready[0][0], self._paused_until) - now
+            else:
+                timeout = None
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _global_slot(self):
+        """Занять слот общего лимита бота"""
+        now = time.monotonic()
+        slot = max(now, self._next_global, self._paused_until)
+        self._next_global = slot + self.global_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    def _take_batch(self, queue: deque):
+        """Первое сообщение чата и склеиваемые с ним следующие"""
+        first = queue.popleft()
+        batch = [first]
+        
+        if first.coalesce:
+            length = len(first.text)
+            while queue:
+                candidate = queue[0]
+                if (not candidate.coalesce or candidate.kwargs != first.kwargs
+                        or length + len(candidate.text) + 2 > MAX_MESSAGE_LENGTH):
+                    break
+                batch.append(queue.popleft())
+                length += len(candidate.text) + 2
+        
+        return batch
+    
+    async def _worker(self):
+        while True:
+            chat_id = await self._next_chat()
+            queue = self._chats.get(chat_id)
+            if not queue:
+                self._chats.pop(chat_id, None)
+                continue
+            
+            self._busy.add(chat_id)
+            batch = self._take_batch(queue)
+            try:
+                await self._global_slot()
+                
+                interval = self.group_interval if chat_id < 0 else self.chat_interval
+                self._chat_ready[chat_id] = time.monotonic() + interval
+                
+                retry = await self._deliver(chat_id, batch)
+            finally:
+                self._busy.discard(chat_id)
+            
+            if retry:
+                # Возвращаем пачку в начало очереди чата
+                queue.extendleft(reversed(batch))
+            else:
+                self._queued -= len(batch)
+            
+            if queue:
+                self._schedule(chat_id)
+            else:
+                self._chats.pop(chat_id, None)
+                if self._chat_ready.get(chat_id, 0.0) <= time.monotonic():
+                    self._chat_ready.pop(chat_id, None)
+            
+            self._forget_idle_chats()
+            if self._queued == 0:
+                self._drained.set()
+    
+    def _forget_idle_chats(self):
+        """Не держать время готовности для чатов, где лимит уже истек"""
+        if len(self._chat_ready) <= 10 * self.workers + len(self._chats):
+            return
+        now = time.monotonic()
+        for chat_id in [c for c, t in self._chat_ready.items() if t <= now and c not in self._chats]:
+            del self._chat_ready[chat_id]
+    
+    async def _deliver(self, chat_id: int, batch) -> bool:
+        """
+        Отправить пачку одним сообщением
+        
+        Returns:
+            True, если пачку нужно отправить повторно
+        """
+        first = batch[0]
+        text = "\n\n".join(message.text for message in batch)
+        
+        try:
+            result = await self.bot.send_message(chat_id=chat_id, text=text, **first.kwargs)
+        
+        except RetryAfter as e:
+            # Flood control действует на весь бот - приостанавливаем всех воркеров
+            self.stats["retry_after"] += 1
+            self._paused_until = time.monotonic() + float(e.retry_after)
+            logger.warning(f"Flood control Telegram, пауза {e.retry_after} сек")
+            return self._retry(batch, e)
+        
+        except (Forbidden, BadRequest) as e:
+            return self._fail(chat_id, batch, e)
+        
+        except (TimedOut, NetworkError) as e:
+            self._chat_ready[chat_id] = time.monotonic() + min(2 ** first.attempts, 30)
+            logger.warning(f"Сетевая ошибка при отправке в {chat_id}: {e}")
+            return self._retry(batch, e)
+        
+        except Exception as e:
+            return self._fail(chat_id, batch, e)
+        
+        self.stats["sent"] += 1
+        self.stats["coalesced"] += len(batch) - 1
+        for message in batch:
+            if message.future is not None and not message.future.done():
+                message.future.set_result(result)
+        return False
+    
+    def _retry(self, batch, error: Exception) -> bool:
+        for message in batch:
+            message.attempts += 1
+        
+        if batch[0].attempts <= self.max_retries:
+            return True
+        
+        return self._fail(batch[0].chat_id, batch, error)
+    
+    def _fail(self, chat_id: int, batch, error: Exception) -> bool:
+        if isinstance(error, Forbidden):
+            # Пользователь заблокировал бота
+            self.stats["blocked"] += 1
+        else:
+            self.stats["failed"] += 1
+            logger.error(f"Не удалось отправить сообщение в {chat_id}: {error}")
+        
+        for message in batch:
+            if message.future is not None and not message.future.done():
+                message.future.set_exception(error)
+        return False
+    
+    # Рассылки
+    
+    async def broadcast(self, db, text: str, batch_size: int = 1000,
+                        high_watermark: int = 5000, **kwargs) -> Dict:
+        """
+        Рассылка всем пользователям
+        
+        Получатели читаются из БД порциями, а новая порция ставится в
+        очередь только когда в ней осталось меньше high_watermark
+        сообщений, так что память не растет с числом пользователей.
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        counts = {"sent": 0, "failed": 0}
+        recipients = 0
+        
+        def count(future: asyncio.Future):
+            # Отмененное при остановке сообщение не отправлено
+            counts["failed" if future.cancelled() or future.exception() else "sent"] += 1
+        
+        async for user_ids in db.iter_user_ids(batch_size):
+            if self._closing:
+                break
+            while self._queued >= high_watermark and not self._closing:
+                await asyncio.sleep(0.5)
+            
+            for user_id in user_ids:
+                future = loop.create_future()
+                future.add_done_callback(count)
+                # Рассылка не склеивается с личными уведомлениями
+                while not self._enqueue(OutgoingMessage(user_id, text, kwargs, False, future)):
+                    if self._closing:
+                        future.cancel()
+                        break
+                    await asyncio.sleep(1)
+                recipients += 1
+        
+        # После остановки отправитель результатов уже не дождется
+        while counts["sent"] + counts["failed"] < recipients and not self._closed:
+            await asyncio.sleep(0.5)
+        
+        result = {
+            "recipients": recipients,
+            "sent": counts["sent"],
+            "failed": recipients - counts["sent"],
+            "seconds": round(time.monotonic() - started, 1)
+        }
+        logger.info(f"Рассылка завершена: {result}")
+        return result
+    
+    async def close(self, timeout: float = 10.0):
+        """Дождаться отправки очереди и остановить воркеров"""
+        self._closing = True
+        if self._queued:
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"При остановке не отправлено сообщений: {self._queued}")
+        
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._closed = True
+        
+        # Неотправленные сообщения: send и рассылки не ждут их вечно
+        for queue in self._chats.values():
+            for message in queue:
+                if message.future is not None and not message.future.done():
+                    message.future.cancel()
@@ -0,0 +1,176 @@
+import time
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStateStore:
+    """
+    Хранилище состояний диалогов в памяти процесса
+    
+    Записи вытесняются по LRU при превышении количества или объема и
+    удаляются после ttl секунд без обращений.
+    """
+    
+    def __init__(self, max_entries: int = 50000, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        
+        # user_id -> (истекает, размер, состояние); порядок = порядок обращений
+        self._states: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._started = time.monotonic()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def _size(state: Any) -> int:
+        """Примерный размер состояния в байтах"""
+        return len(json.dumps(state, default=str))
+    
+    def _remove(self, user_id: int):
+        _, size, _ = self._states.pop(user_id)
+        self._bytes -= size
+    
+    def _expire(self, now: float):
+        """Удалить истекшие записи (они всегда в начале очереди)"""
+        while self._states:
+            user_id, (expires, _, _) = next(iter(self._states.items()))
+            if expires > now:
+                break
+            self._remove(user_id)
+            self.expirations += 1
+    
+    async def get(self, user_id: int, default: Any = None) -> Any:
+        """Получить состояние пользователя"""
+        now = time.monotonic()
+        entry = self._states.get(user_id)
+        
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                self._remove(user_id)
+                self.expirations += 1
+            self.misses += 1
+            return default
+        
+        # Продлеваем жизнь записи при обращении
+        self._states[user_id] = (now + self.ttl, entry[1], entry[2])
+        self._states.move_to_end(user_id)
+        self.hits += 1
+        return entry[2]
+    
+    async def set(self, user_id: int, state: Any):
+        """Сохранить состояние пользователя"""
+        now = time.monotonic()
+        if user_id in self._states:
+            self._remove(user_id)
+        
+        size = self._size(state)
+        self._states[user_id] = (now + self.ttl, size, state)
+        self._bytes += size
+        
+        self._expire(now)
+        while self._states and (len(self._states) > self.max_entries or
+                                self._bytes > self.max_bytes):
+            self._remove(next(iter(self._states)))
+            self.evictions += 1
+    
+    async def delete(self, user_id: int):
+        """Удалить состояние пользователя"""
+        if user_id in self._states:
+            self._remove(user_id)
+    
+    def stats(self) -> Dict:
+        """Метрики хранилища"""
+        uptime_minutes = max((time.monotonic() - self._started) / 60, 1e-9)
+        return {
+            "backend": "local",
+            "size": len(self._states),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "evictions_per_minute": round(self.evictions / uptime_minutes, 3)
+        }
+
+
+class RedisStateStore:
+    """
+    Хранилище состояний диалогов в Redis, общее для всех процессов бота
+    
+    Каждое состояние - отдельный ключ с TTL; память ограничивается
+    политикой maxmemory самого Redis.
+    """
+    
+    def __init__(self, redis, ttl: int = 3600, key_prefix: str = "casino:state:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+    
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+    
+    async def get(self, user_id: int, default: Any = None) -> Any:
+        """Получить состояние пользователя"""
+        try:
+            # GETEX продлевает TTL при чтении
+            raw = await self.redis.getex(self._key(user_id), ex=self.ttl)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            logger.error(f"Ошибка чтения состояния {user_id} из Redis: {e}")
+            return default
+        
+        if raw is None:
+            self.misses += 1
+            return default
+        
+        self.hits += 1
+        return json.loads(raw)
+    
+    async def set(self, user_id: int, state: Any):
+        """Сохранить состояние пользователя"""
+        try:
+            await self.redis.set(self._key(user_id), json.dumps(state, default=str), ex=self.ttl)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            logger.error(f"Ошибка записи состояния {user_id} в Redis: {e}")
+    
+    async def delete(self, user_id: int):
+        """Удалить состояние пользователя"""
+        try:
+            await self.redis.delete(self._key(user_id))
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            logger.error(f"Ошибка удаления состояния {user_id} из Redis: {e}")
+    
+    def stats(self) -> Dict:
+        """Метрики хранилища"""
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
+
+
+def create_state_store(redis=None, ttl: int = 3600, **kwargs):
+    """Хранилище состояний: Redis, если он доступен, иначе локальное"""
+    if redis is not None:
+        return RedisStateStore(redis, ttl=ttl)
+    return LocalStateStore(ttl=ttl, **kwargs)
@@ -0,0 +1,182 @@
+import logging
+import importlib
+from string import Formatter
+from typing import Dict, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
+from telegram.helpers import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+# Языки, для которых есть модули locales/<код>.py
+LANGUAGES = ("ru", "en")
+
+# Поля с пользовательским текстом, которые экранируются для Markdown
+ESCAPED_FIELDS = frozenset(("first_name", "username"))
+
+
+def _fields(template: str) -> frozenset:
+    """Имена полей шаблона str.format"""
+    return frozenset(
+        field.split(".")[0].split("[")[0]
+        for _, field, _, _ in Formatter().parse(template)
+        if field
+    )
+
+
+class Template:
+    """Шаблон строки, разобранный один раз при загрузке"""
+    
+    __slots__ = ("source", "fields")
+    
+    def __init__(self, source: str):
+        self.source = source
+        self.fields = _fields(source)
+    
+    def render(self, data: Dict) -> str:
+        if not self.fields:
+            return self.source
+        
+        for field in ESCAPED_FIELDS & self.fields:
+            value = data.get(field)
+            if value:
+                data = {**data, field: escape_markdown(str(value))}
+        
+        return self.source.format_map(data)
+
+
+class Screen:
+    """
+    Экран бота: текст и клавиатура
+    
+    Статические кнопки создаются один раз; если в клавиатуре нет
+    подстановок, вся разметка тоже собирается заранее и переиспользуется
+    (объекты telegram неизменяемы).
+    """
+    
+    __slots__ = ("name", "text", "rows", "markup", "fields")
+    
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.text = Template(spec["text"].strip("\n"))
+        
+        # Ряд - кортеж готовых кнопок или (тип, текст, Template) для динамических
+        self.rows = tuple(
+            tuple(self._compile_button(button) for button in row)
+            for row in spec.get("keyboard", ())
+        )
+        
+        dynamic = any(
+            not isinstance(button, InlineKeyboardButton)
+            for row in self.rows for button in row
+        )
+        self.markup = None if dynamic or not self.rows else InlineKeyboardMarkup(self.rows)
+        
+        self.fields = self.text.fields.union(*(
+            button[2].fields
+            for row in self.rows for button in row
+            if not isinstance(button, InlineKeyboardButton)
+        ))
+    
+    @staticmethod
+    def _compile_button(button):
+        if isinstance(button, tuple):
+            text, callback_data = button
+            return InlineKeyboardButton(text, callback_data=callback_data)
+        
+        if "web_app" in button:
+            template = Template(button["web_app"])
+            if template.fields:
+                return ("web_app", button["text"], template)
+            return InlineKeyboardButton(button["text"], web_app=WebAppInfo(url=template.source))
+        
+        if "switch_inline_query" in button:
+            return InlineKeyboardButton(
+                button["text"], switch_inline_query=button["switch_inline_query"]
+            )
+        
+        raise ValueError(f"Неизвестный тип кнопки: {button}")
+    
+    def render_markup(self, data: Dict) -> Optional[InlineKeyboardMarkup]:
+        if self.markup is not None or not self.rows:
+            return self.markup
+        
+        keyboard = []
+        for row in self.rows:
+            buttons = []
+            for button in row:
+                if not isinstance(button, InlineKeyboardButton):
+                    _, text, template = button
+                    button = InlineKeyboardButton(
+                        text, web_app=WebAppInfo(url=template.source.format_map(data))
+                    )
+                buttons.append(button)
+            keyboard.append(buttons)
+        
+        return InlineKeyboardMarkup(keyboard)
+
+
+class TemplateRenderer:
+    """
+    Рендеринг экранов бота из локализованных шаблонов
+    
+    Все шаблоны компилируются при создании; обработчик загружает данные
+    для экрана одним запросом и передает их в render().
+    """
+    
+    def __init__(self, languages=LANGUAGES, default_language: str = "ru"):
+        self.default_language = default_language
+        self.screens: Dict[str, Dict[str, Screen]] = {}
+        self.strings: Dict[str, Dict[str, Template]] = {}
+        
+        for language in languages:
+            module = importlib.import_module(f"locales.{language}")
+            self.screens[language] = {
+                name: Screen(name, spec) for name, spec in module.SCREENS.items()
+            }
+            self.strings[language] = {
+                key: Template(text) for key, text in module.STRINGS.items()
+            }
+        
+        self._check_fields()
+        logger.info(f"Шаблоны загружены: {', '.join(self.screens)}")
+    
+    def _check_fields(self):
+        """Переводы экранов должны использовать те же поля, что и основной язык"""
+        base = self.screens[self.default_language]
+        for language, screens in self.screens.items():
+            for name, screen in base.items():
+                translated = screens.get(name)
+                if translated is None:
+                    logger.warning(f"Экран {name} не переведен на {language}")
+                    screens[name] = screen
+                elif translated.fields != screen.fields:
+                    raise ValueError(
+                        f"Поля экрана {name} ({language}) не совпадают: "
+                        f"{sorted(translated.fields ^ screen.fields)}"
+                    )
+    
+    def language(self, language_code: Optional[str]) -> str:
+        """Язык по language_code пользователя Telegram ("en-US" -> "en")"""
+        if language_code:
+            language = language_code.split("-")[0].lower()
+            if language in self.screens:
+                return language
+        return self.default_language
+    
+    def required_fields(self, screen: str) -> frozenset:
+        """Поля, которые нужно загрузить для экрана"""
+        return self.screens[self.default_language][screen].fields
+    
+    def render(self, screen: str, language: str, data: Optional[Dict] = None
+               ) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """Текст и клавиатура экрана"""
+        compiled = self.screens.get(language, self.screens[self.default_language])[screen]
+        data = data or {}
+        return compiled.text.render(data), compiled.render_markup(data)
+    
+    def text(self, key: str, language: str, **data) -> str:
+        """Короткая локализованная строка"""
+        strings = self.strings.get(language, self.strings[self.default_language])
+        template = strings.get(key) or self.strings[self.default_language][key]
+        return template.render(data)
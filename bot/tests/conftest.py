@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули бота лежат плоско в bot/ и импортируются по имени
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
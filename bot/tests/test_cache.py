@@ -0,0 +1,154 @@
+"""Кэш пользователей на fakeredis: чтение, запись, версии, L1 и отказ Redis"""
+import asyncio
+
+import fakeredis.aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from cache import BalanceCache
+
+ROW = {
+    "username": "player", "first_name": "Игрок", "stars_balance": 100,
+    "spins_balance": 10, "total_deposited": 0, "total_withdrawn": 0,
+    "total_won": 0, "total_games": 0, "created_at": "2024-01-01 00:00:00"
+}
+
+
+class Loader:
+    """Строка из "БД" с версией и счетчиком обращений"""
+    
+    def __init__(self, row=ROW, version=1):
+        self.row = dict(row)
+        self.version = version
+        self.calls = 0
+    
+    async def __call__(self, user_id):
+        self.calls += 1
+        return dict(self.row), self.version
+
+
+class DownRedis:
+    """Redis, на котором падает любая команда"""
+    
+    def register_script(self, script):
+        async def run(keys, args):
+            raise RedisConnectionError("down")
+        return run
+    
+    async def hgetall(self, key):
+        raise RedisConnectionError("down")
+
+
+def make_cache(**kwargs):
+    return BalanceCache(fakeredis.aioredis.FakeRedis(), local_ttl=0, **kwargs)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_read_through_populates_redis():
+    async def scenario():
+        cache = make_cache()
+        loader = Loader()
+        
+        first = await cache.get_user(1, loader)
+        second = await cache.get_user(1, loader)
+        return first, second, loader.calls, cache.stats
+    
+    first, second, calls, stats = run(scenario())
+    assert first == second
+    assert second["stars_balance"] == 100
+    assert calls == 1
+    assert stats["redis_hits"] == 1
+
+
+def test_write_through_updates_fields():
+    async def scenario():
+        cache = make_cache()
+        loader = Loader()
+        await cache.get_user(1, loader)
+        await cache.update(1, 2, {"stars_balance": 50})
+        return await cache.get_user(1, loader), loader.calls
+    
+    row, calls = run(scenario())
+    assert row["stars_balance"] == 50
+    assert calls == 1
+
+
+def test_older_populate_does_not_overwrite_newer_update():
+    async def scenario():
+        cache = make_cache()
+        await cache.get_user(1, Loader())
+        await cache.update(1, 2, {"stars_balance": 50})
+        # Чтение, начатое до списания, записывает строку v1 позже него
+        await cache._write(1, 1, "populate", ROW)
+        return await cache.get_user(1, Loader())
+    
+    assert run(scenario())["stars_balance"] == 50
+
+
+def test_out_of_order_update_goes_to_database():
+    async def scenario():
+        cache = make_cache()
+        await cache.get_user(1, Loader())
+        # v3 пришла раньше v2: поле v2 не должно остаться устаревшим
+        await cache.update(1, 3, {"stars_balance": 30})
+        await cache.update(1, 2, {"spins_balance": 5})
+        
+        loader = Loader({**ROW, "stars_balance": 30, "spins_balance": 5}, version=3)
+        return await cache.get_user(1, loader), loader.calls
+    
+    row, calls = run(scenario())
+    assert calls == 1
+    assert row["spins_balance"] == 5
+
+
+def test_skipped_version_goes_to_database():
+    async def scenario():
+        cache = make_cache()
+        await cache.get_user(1, Loader())
+        await cache.update(1, 3, {"stars_balance": 30})
+        
+        loader = Loader({**ROW, "stars_balance": 30, "spins_balance": 5}, version=3)
+        return await cache.get_user(1, loader), loader.calls
+    
+    row, calls = run(scenario())
+    assert calls == 1
+    assert row["spins_balance"] == 5
+
+
+def test_local_cache_expires():
+    async def scenario():
+        redis = fakeredis.aioredis.FakeRedis()
+        cache = BalanceCache(redis, local_ttl=0.05)
+        await cache.get_user(1, Loader())
+        
+        await cache.get_user(1, Loader())
+        local_hits = cache.stats["local_hits"]
+        
+        await asyncio.sleep(0.1)
+        await cache.get_user(1, Loader())
+        return local_hits, cache.stats
+    
+    local_hits, stats = run(scenario())
+    assert local_hits == 1
+    assert stats["local_hits"] == 1
+    assert stats["redis_hits"] == 1
+
+
+def test_falls_back_to_database_when_redis_is_down():
+    async def scenario():
+        cache = BalanceCache(DownRedis(), local_ttl=0)
+        loader = Loader()
+        
+        first = await cache.get_user(1, loader)
+        await cache.update(1, 2, {"stars_balance": 50})
+        second = await cache.get_user(1, loader)
+        return first, second, loader.calls, cache.stats, cache.redis_available
+    
+    first, second, calls, stats, available = run(scenario())
+    assert first["stars_balance"] == 100
+    assert second["stars_balance"] == 100
+    assert calls == 2
+    assert stats["redis_errors"] == 1
+    assert not available
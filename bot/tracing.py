@@ -0,0 +1,459 @@
+"""
+Трассировка обработки обновлений
+
+Каждое обновление получает trace id; вызовы Database, SQL запросы, команды
+Redis и запросы к Bot API, сделанные во время обработки, записываются
+вложенными спанами с длительностью. Готовое дерево уходит в файл
+(TRACE_FILE, JSON строка на обновление) или в OTLP/HTTP коллектор
+(TRACE_OTLP_URL, например http://127.0.0.1:4318/v1/traces).
+
+Заглушка коллектора для локальной проверки:
+    python tracing.py --port 4318 --output traces.jsonl
+"""
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+import ujson
+from aiohttp import web, ClientSession
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest, RequestData
+
+from metrics import public_coroutines
+
+logger = logging.getLogger(__name__)
+
+# Длинные SQL обрезаются в атрибутах спана
+MAX_STATEMENT_LENGTH = 300
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """Участок обработки обновления"""
+    
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_ns",
+                 "_started", "duration", "attributes", "children", "error")
+    
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Dict):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+    
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+    
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+    
+    def to_dict(self) -> Dict:
+        data = {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children]
+        return data
+
+
+def summarize_trace(root: Span) -> Dict:
+    """Число и суммарное время спанов по виду (db, sql, redis, telegram)"""
+    summary: Dict[str, Dict] = {}
+    for span in root.walk():
+        if span is root:
+            continue
+        entry = summary.setdefault(span.kind, {"count": 0, "total_ms": 0.0})
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + span.duration * 1000, 3)
+    return summary
+
+
+class FileExporter:
+    """Дерево спанов обновления - JSON строкой в файл"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+    
+    def export(self, root: Span):
+        record = {
+            "trace_id": root.trace_id,
+            "summary": summarize_trace(root),
+            "root": root.to_dict()
+        }
+        self._file.write(ujson.dumps(record, ensure_ascii=False) + "\n")
+    
+    async def close(self):
+        self._file.close()
+
+
+class OtlpExporter:
+    """
+    Отправка спанов в OTLP/HTTP коллектор в формате JSON
+    
+    Спаны копятся в очереди и отправляются пачками из фоновой задачи,
+    так что обработка обновления не ждет коллектор.
+    """
+    
+    KINDS = {"update": 2, "handler": 1, "db": 1, "sql": 3, "redis": 3, "telegram": 3}
+    
+    def __init__(self, url: str, service_name: str = "casino-bot",
+                 batch_size: int = 512, interval: float = 1.0, max_queued: int = 10000):
+        self.url = url
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queued = max_queued
+        
+        self._pending: List[Dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._session: Optional[ClientSession] = None
+        self.dropped = 0
+    
+    def _otlp_span(self, span: Span) -> Dict:
+        attributes = [
+            {"key": key, "value": {"stringValue": str(value)}}
+            for key, value in span.attributes.items()
+        ]
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": self.KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.start_ns + int(span.duration * 1e9)),
+            "attributes": attributes
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        if span.error:
+            data["status"] = {"code": 2, "message": span.error}
+        return data
+    
+    def export(self, root: Span):
+        spans = [self._otlp_span(span) for span in root.walk()]
+        if len(self._pending) + len(spans) > self.max_queued:
+            self.dropped += len(spans)
+            return
+        self._pending.extend(spans)
+        
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        while self._pending:
+            await self._flush()
+            await asyncio.sleep(self.interval)
+    
+    async def _flush(self):
+        if self._session is None:
+            self._session = ClientSession(json_serialize=ujson.dumps)
+        
+        while self._pending:
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            body = {
+                "resourceSpans": [{
+                    "resource": {"attributes": [
+                        {"key": "service.name", "value": {"stringValue": self.service_name}}
+                    ]},
+                    "scopeSpans": [{"scope": {"name": "casino.tracing"}, "spans": batch}]
+                }]
+            }
+            try:
+                async with self._session.post(self.url, json=body) as response:
+                    if response.status >= 400:
+                        logger.warning(f"Коллектор трасс ответил {response.status}")
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning(f"Ошибка отправки трасс: {e}")
+    
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._pending:
+            await self._flush()
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+
+class TracingPool:
+    """Пул asyncpg, записывающий каждый SQL запрос спаном"""
+    
+    QUERY_METHODS = ("fetch", "fetchrow", "fetchval", "execute", "executemany")
+    
+    def __init__(self, pool, tracer: "Tracer"):
+        self._pool = pool
+        for name in self.QUERY_METHODS:
+            setattr(self, name, self._traced(name, getattr(pool, name), tracer))
+    
+    @staticmethod
+    def _traced(name: str, method, tracer: "Tracer"):
+        async def wrapper(query, *args, **kwargs):
+            statement = " ".join(query.split())[:MAX_STATEMENT_LENGTH]
+            with tracer.span(f"sql.{name}", "sql", statement=statement):
+                return await method(query, *args, **kwargs)
+        return wrapper
+    
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+class TracingRequest(BaseRequest):
+    """Транспорт Bot API, записывающий каждый вызов спаном"""
+    
+    def __init__(self, request: BaseRequest, tracer: "Tracer"):
+        self._request = request
+        self._tracer = tracer
+    
+    async def initialize(self):
+        await self._request.initialize()
+    
+    async def shutdown(self):
+        await self._request.shutdown()
+    
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self._request.read_timeout
+    
+    async def do_request(self, url: str, method: str,
+                         request_data: Optional[RequestData] = None,
+                         **timeouts) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        with self._tracer.span(f"telegram.{api_method}", "telegram") as span:
+            status, payload = await self._request.do_request(
+                url, method, request_data=request_data, **timeouts
+            )
+            if span is not None:
+                span.attributes["status"] = status
+            return status, payload
+
+
+def describe_update(update: object) -> Dict:
+    """Атрибуты корневого спана: кто и что прислал"""
+    if not isinstance(update, Update):
+        return {"type": type(update).__name__}
+    
+    attributes = {"update_id": update.update_id}
+    if update.effective_user:
+        attributes["user_id"] = update.effective_user.id
+    
+    message = update.message
+    if update.callback_query:
+        attributes["type"] = "callback_query"
+        attributes["data"] = update.callback_query.data
+    elif update.pre_checkout_query:
+        attributes["type"] = "pre_checkout_query"
+    elif message and message.web_app_data:
+        attributes["type"] = "web_app_data"
+    elif message and message.successful_payment:
+        attributes["type"] = "successful_payment"
+    elif message and message.text:
+        attributes["type"] = "message"
+        if message.text.startswith("/"):
+            attributes["command"] = message.text.split()[0]
+    else:
+        attributes["type"] = "other"
+    return attributes
+
+
+class Tracer:
+    """
+    Трассировщик обновлений
+    
+    Без экспортера трассировщик выключен и ничего не оборачивает.
+    Спаны вне обработки обновления (фоновые задачи) не записываются.
+    """
+    
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self.enabled = exporter is not None
+        self.traces = 0
+    
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes):
+        parent = _current_span.get()
+        # Задачи, созданные во время обработки, переживают корневой спан
+        if parent is None or parent.duration is not None:
+            yield None
+            return
+        
+        span = Span(name, kind, parent.trace_id, parent.span_id, attributes)
+        parent.children.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except ApplicationHandlerStop:
+            raise
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+    
+    async def trace_update(self, update: object, coroutine):
+        """Обработать обновление под корневым спаном и экспортировать дерево"""
+        root = Span("update", "update", os.urandom(16).hex(), None, describe_update(update))
+        token = _current_span.set(root)
+        try:
+            await coroutine
+        except Exception as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.finish()
+            _current_span.reset(token)
+            self.traces += 1
+            try:
+                self.exporter.export(root)
+            except Exception as e:
+                logger.warning(f"Ошибка экспорта трассы: {e}")
+    
+    def _wrap(self, func, name: str, kind: str):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with self.span(name, kind):
+                return await func(*args, **kwargs)
+        return wrapper
+    
+    def instrument_database(self, db):
+        """Методы Database - спаны, SQL внутри них - дочерние спаны"""
+        if not self.enabled:
+            return
+        for name in public_coroutines(db):
+            setattr(db, name, self._wrap(getattr(db, name), f"db.{name}", "db"))
+    
+    def instrument_pool(self, db):
+        """Обернуть пул после Database.connect"""
+        if self.enabled and db.pool is not None and not isinstance(db.pool, TracingPool):
+            db.pool = TracingPool(db.pool, self)
+    
+    def instrument_redis(self, redis):
+        """Команды Redis и выполнение конвейеров"""
+        if not self.enabled or redis is None:
+            return
+        
+        execute_command = redis.execute_command
+        
+        async def traced_command(*args, **options):
+            with self.span(f"redis.{args[0]}", "redis"):
+                return await execute_command(*args, **options)
+        
+        redis.execute_command = traced_command
+        
+        pipeline = redis.pipeline
+        
+        def traced_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+            
+            async def traced_execute(*execute_args, **execute_kwargs):
+                with self.span("redis.pipeline", "redis", commands=len(pipe.command_stack)):
+                    return await execute(*execute_args, **execute_kwargs)
+            
+            pipe.execute = traced_execute
+            return pipe
+        
+        redis.pipeline = traced_pipeline
+    
+    def wrap_request(self, request: BaseRequest) -> BaseRequest:
+        return TracingRequest(request, self) if self.enabled else request
+    
+    def instrument_handlers(self, application):
+        """Обработчики приложения; вызывать после регистрации всех обработчиков"""
+        if not self.enabled:
+            return
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                callback = getattr(handler, "callback", None)
+                if callback is None:
+                    continue
+                label = getattr(callback, "__name__", None) or type(callback).__name__
+                handler.callback = self._wrap(callback, f"handler.{label}", "handler")
+    
+    async def close(self):
+        if self.exporter is not None:
+            await self.exporter.close()
+
+
+def create_tracer(trace_file: Optional[str] = None, otlp_url: Optional[str] = None) -> Tracer:
+    """Коллектор, если указан его адрес, иначе файл; без обоих - выключен"""
+    if otlp_url:
+        return Tracer(OtlpExporter(otlp_url))
+    if trace_file:
+        return Tracer(FileExporter(trace_file))
+    return Tracer()
+
+
+async def run_collector(host: str, port: int, output: str):
+    """Заглушка OTLP/HTTP коллектора: пишет пачки спанов в файл"""
+    received = {"batches": 0, "spans": 0}
+    out = open(output, "a", buffering=1)
+    
+    async def handle_traces(request: web.Request) -> web.Response:
+        body = await request.json(loads=ujson.loads)
+        for resource in body.get("resourceSpans", []):
+            for scope in resource.get("scopeSpans", []):
+                received["spans"] += len(scope.get("spans", []))
+        received["batches"] += 1
+        out.write(ujson.dumps(body, ensure_ascii=False) + "\n")
+        return web.json_response({}, dumps=ujson.dumps)
+    
+    app = web.Application()
+    app.router.add_post("/v1/traces", handle_traces)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Коллектор трасс на http://{host}:{port}/v1/traces, запись в {output}")
+    
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logger.info(f"Принято пачек: {received['batches']}, спанов: {received['spans']}")
+    finally:
+        out.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    
+    parser = argparse.ArgumentParser(description="Заглушка OTLP/HTTP коллектора трасс")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl")
+    args = parser.parse_args()
+    
+    asyncio.run(run_collector(args.host, args.port, args.output))
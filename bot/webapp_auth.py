@@ -0,0 +1,201 @@
+import hmac
+import json
+import time
+import base64
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+
+class InitDataError(Exception):
+    """Подпись или содержимое initData Telegram WebApp некорректны"""
+
+
+class WebAppAuth:
+    """
+    Авторизация запросов WebApp
+    
+    initData проверяется один раз при входе, после чего выдается короткий
+    токен сессии. Ключ проверки initData выводится из токена бота один раз
+    при создании, а проверенные токены сессий кэшируются, так что обычный
+    запрос к API обходится поиском в словаре.
+    """
+    
+    def __init__(self, bot_token: str, session_secret: Optional[str] = None,
+                 init_data_max_age: int = 86400, session_ttl: int = 3600,
+                 cache_size: int = 50000):
+        self.init_data_max_age = init_data_max_age
+        self.session_ttl = session_ttl
+        self.cache_size = cache_size
+        
+        # HMAC-SHA256("WebAppData", токен бота) - не зависит от запроса
+        self._init_data_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+        
+        # Ключ подписи токенов сессий
+        secret = session_secret or f"session:{bot_token}"
+        self._session_key = hashlib.sha256(secret.encode()).digest()
+        
+        # токен -> (user_id, истекает)
+        self._sessions: OrderedDict = OrderedDict()
+        
+        self.stats = {"init_data_verified": 0, "session_hits": 0, "session_verified": 0, "rejected": 0}
+    
+    def verify_init_data(self, init_data: str) -> Dict:
+        """
+        Проверить initData и вернуть пользователя
+        
+        Raises:
+            InitDataError: если подпись неверна или данные устарели
+        """
+        if not init_data:
+            self.stats["rejected"] += 1
+            raise InitDataError("Не переданы initData")
+        
+        fields = dict(parse_qsl(init_data, keep_blank_values=True))
+        received_hash = fields.pop("hash", None)
+        if not received_hash:
+            self.stats["rejected"] += 1
+            raise InitDataError("В initData нет подписи")
+        
+        data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+        expected_hash = hmac.new(
+            self._init_data_key, data_check_string.encode(), hashlib.sha256
+        ).hexdigest()
+        
+        if not hmac.compare_digest(expected_hash, received_hash):
+            self.stats["rejected"] += 1
+            raise InitDataError("Неверная подпись initData")
+        
+        auth_date = int(fields.get("auth_date") or 0)
+        if self.init_data_max_age and time.time() - auth_date > self.init_data_max_age:
+            self.stats["rejected"] += 1
+            raise InitDataError("initData устарели")
+        
+        try:
+            user = json.loads(fields["user"])
+        except (KeyError, ValueError):
+            self.stats["rejected"] += 1
+            raise InitDataError("В initData нет пользователя")
+        
+        self.stats["init_data_verified"] += 1
+        return user
+    
+    def _sign(self, payload: bytes) -> str:
+        digest = hmac.new(self._session_key, payload, hashlib.sha256).digest()[:18]
+        return base64.urlsafe_b64encode(digest).decode()
+    
+    def issue_session(self, user_id: int) -> Tuple[str, int]:
+        """Выдать токен сессии: (токен, время жизни в секундах)"""
+        expires = int(time.time()) + self.session_ttl
+        payload = f"{user_id}.{expires}"
+        token = f"{payload}.{self._sign(payload.encode())}"
+        self._remember(token, user_id, expires)
+        return token, self.session_ttl
+    
+    def login(self, init_data: str) -> Tuple[Dict, str, int]:
+        """Проверить initData и выдать сессию: (пользователь, токен, время жизни)"""
+        user = self.verify_init_data(init_data)
+        token, ttl = self.issue_session(int(user["id"]))
+        return user, token, ttl
+    
+    def _remember(self, token: str, user_id: int, expires: int):
+        self._sessions[token] = (user_id, expires)
+        self._sessions.move_to_end(token)
+        while len(self._sessions) > self.cache_size:
+            self._sessions.popitem(last=False)
+    
+    def authenticate(self, token: Optional[str]) -> int:
+        """
+        ID пользователя по токену сессии
+        
+        Raises:
+            InitDataError: если токен неверен или истек
+        """
+        if not token:
+            self.stats["rejected"] += 1
+            raise InitDataError("Требуется авторизация")
+        
+        cached = self._sessions.get(token)
+        if cached is not None:
+            user_id, expires = cached
+            if expires >= time.time():
+                self.stats["session_hits"] += 1
+                return user_id
+            del self._sessions[token]
+            self.stats["rejected"] += 1
+            raise InitDataError("Сессия истекла")
+        
+        # Токен выдан другим процессом API или до перезапуска - проверяем подпись
+        try:
+            user_part, expires_part, signature = token.split(".")
+            user_id, expires = int(user_part), int(expires_part)
+        except ValueError:
+            self.stats["rejected"] += 1
+            raise InitDataError("Неверный токен сессии")
+        
+        expected = self._sign(f"{user_part}.{expires_part}".encode())
+        if not hmac.compare_digest(expected, signature):
+            self.stats["rejected"] += 1
+            raise InitDataError("Неверный токен сессии")
+        
+        if expires < time.time():
+            self.stats["rejected"] += 1
+            raise InitDataError("Сессия истекла")
+        
+        self.stats["session_verified"] += 1
+        self._remember(token, user_id, expires)
+        return user_id
+
+
+def make_init_data(bot_token: str, user: Dict, auth_date: Optional[int] = None) -> str:
+    """Подписанные initData для тестов и нагрузочных прогонов"""
+    fields = {
+        "auth_date": str(auth_date or int(time.time())),
+        "query_id": "AAH",
+        "user": json.dumps(user, separators=(",", ":"))
+    }
+    data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def benchmark(iterations: int = 100000) -> Dict:
+    """Стоимость авторизации одного запроса, мкс"""
+    bot_token = "123456:benchmark-token"
+    auth = WebAppAuth(bot_token)
+    init_data = make_init_data(bot_token, {"id": 42, "first_name": "Bench"})
+    
+    def measure(func, n):
+        started = time.perf_counter()
+        for _ in range(n):
+            func()
+        return round((time.perf_counter() - started) / n * 1e6, 2)
+    
+    def derive_and_verify():
+        # Как без кэша: ключ выводится на каждом запросе
+        WebAppAuth(bot_token).verify_init_data(init_data)
+    
+    token, _ = auth.issue_session(42)
+    
+    def verify_token_cold():
+        auth._sessions.clear()
+        auth.authenticate(token)
+    
+    return {
+        "init_data_uncached_key_us": measure(derive_and_verify, iterations // 10),
+        "init_data_cached_key_us": measure(lambda: auth.verify_init_data(init_data), iterations // 10),
+        "session_token_signature_us": measure(verify_token_cold, iterations),
+        "session_token_cached_us": measure(lambda: auth.authenticate(token), iterations)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Накладные расходы авторизации WebApp")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    
+    print(json.dumps(benchmark(args.iterations), indent=2))
@@ -0,0 +1,134 @@
+import time
+import logging
+from typing import Dict, Literal, Union
+
+import ujson
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from telegram import Update
+from telegram.ext import ContextTypes
+from typing_extensions import Annotated
+
+logger = logging.getLogger(__name__)
+
+# Telegram.WebApp.sendData принимает не больше 4096 байт
+MAX_PAYLOAD_BYTES = 4096
+
+
+class WebAppAction(BaseModel):
+    """
+    Действие из WebApp
+    
+    Лишние поля (user_id, won, winning_color, timestamp) отбрасываются:
+    пользователя дает Telegram, а результат считает сервер.
+    """
+    
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
+class MonoSpinAction(WebAppAction):
+    action: Literal["mono_spin"]
+    chance: int = Field(ge=1, le=65)
+    bet_spins: int = Field(default=1, ge=1, le=100)
+
+
+# Валидатор собирается один раз; модель выбирается по полю action.
+# Ставки Lucky2 идут только через POST /api/lucky2/bet: клиент, отправлявший
+# ставку и через sendData, и через API, рассчитывался дважды.
+ACTION_ADAPTER = TypeAdapter(
+    Annotated[Union[MonoSpinAction], Field(discriminator="action")]
+)
+
+
+class WebAppDataHandler:
+    """Обработчик данных, отправленных из WebApp через sendData"""
+    
+    def __init__(self, mono_game, push=None):
+        self.mono_game = mono_game
+        self.push = push
+        
+        self.actions = {
+            "mono_spin": self.mono_spin
+        }
+        
+        # действие -> [вызовов, ошибок, суммарное время, максимум]
+        self.latency: Dict[str, list] = {}
+        self.rejected = {"too_large": 0, "malformed": 0, "invalid": 0}
+    
+    def parse(self, raw: str) -> Union[MonoSpinAction, None]:
+        """Разобрать и проверить данные; None - данные отклонены"""
+        if len(raw) > MAX_PAYLOAD_BYTES or len(raw.encode()) > MAX_PAYLOAD_BYTES:
+            self.rejected["too_large"] += 1
+            return None
+        
+        try:
+            payload = ujson.loads(raw)
+        except ValueError:
+            self.rejected["malformed"] += 1
+            return None
+        
+        try:
+            return ACTION_ADAPTER.validate_python(payload)
+        except ValidationError as e:
+            self.rejected["invalid"] += 1
+            logger.debug(f"Некорректные данные WebApp: {e.errors(include_url=False)}")
+            return None
+    
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.effective_message
+        user_id = update.effective_user.id
+        
+        action = self.parse(message.web_app_data.data)
+        if action is None:
+            await message.reply_text("❌ Некорректные данные игры")
+            return
+        
+        started = time.perf_counter()
+        failed = False
+        try:
+            text = await self.actions[action.action](user_id, action)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self.latency.setdefault(action.action, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+        
+        await message.reply_text(text, parse_mode='Markdown')
+    
+    async def mono_spin(self, user_id: int, action: MonoSpinAction) -> str:
+        result = await self.mono_game.spin(user_id, action.chance, action.bet_spins)
+        if not result.get("success"):
+            return f"❌ {result.get('error', 'Ошибка игры')}"
+        if self.push:
+            self.push.spin_result(user_id, "mono", result)
+        
+        if result["won"]:
+            text = (
+                f"🎉 *Победа!* Шанс {result['chance']}%, x{result['multiplier']}\n"
+                f"💰 Выигрыш: {result['win_stars']} stars"
+            )
+            if result.get("nft_awarded"):
+                text += "\n🎁 Вы получили NFT подарок!"
+        else:
+            text = f"😔 Не повезло. Шанс {result['chance']}%, выпало {result['win_number']}"
+        
+        return f"{text}\n🎰 Спины: {result['balance']}"
+    
+    def stats(self) -> Dict:
+        """Задержки по действиям и счетчики отклоненных данных"""
+        return {
+            "actions": {
+                name: {
+                    "count": count,
+                    "errors": errors,
+                    "avg_ms": round(total / count * 1000, 2) if count else 0,
+                    "max_ms": round(peak * 1000, 2)
+                }
+                for name, (count, errors, total, peak) in self.latency.items()
+            },
+            "rejected": dict(self.rejected)
+        }
@@ -0,0 +1,163 @@
+import hmac
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+import ujson
+from aiohttp import web
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений с сохранением порядка для пользователя
+    
+    Обновления разных пользователей обрабатываются одновременно (не больше
+    max_concurrent_updates), обновления одного пользователя - строго по очереди.
+    """
+    
+    def __init__(self, max_concurrent_updates: int, tracer=None):
+        super().__init__(max_concurrent_updates)
+        # Обертки обработки обновления: hook(update, coroutine) -> coroutine
+        # (трассировка, проверка запросов к БД)
+        self.update_hooks: List[Callable] = []
+        if tracer is not None and tracer.enabled:
+            self.update_hooks.append(tracer.trace_update)
+        # user_id -> [lock, количество ожидающих]
+        self._locks: Dict[int, list] = {}
+        self.pending = 0
+    
+    @staticmethod
+    def _ordering_key(update: object) -> Optional[int]:
+        """Ключ упорядочивания: пользователь или чат обновления"""
+        if not isinstance(update, Update):
+            return None
+        
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+    
+    async def process_update(self, update: object, coroutine):
+        """
+        Дождаться очереди пользователя, затем слота общего лимита
+        
+        BaseUpdateProcessor.process_update берет слот семафора до
+        do_process_update. Если ждать блокировку пользователя внутри
+        слота, его ожидающие обновления занимают слоты и задерживают
+        остальных пользователей, поэтому порядок здесь обратный.
+        """
+        self.pending += 1
+        try:
+            key = self._ordering_key(update)
+            if key is None:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+                return
+            
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+            
+            try:
+                async with entry[0]:
+                    async with self._semaphore:
+                        await self.do_process_update(update, coroutine)
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+        finally:
+            self.pending -= 1
+    
+    async def do_process_update(self, update: object, coroutine):
+        """Обработать обновление (блокировка и слот уже взяты)"""
+        for hook in self.update_hooks:
+            coroutine = hook(update, coroutine)
+        await coroutine
+    
+    async def initialize(self):
+        pass
+    
+    async def shutdown(self):
+        self._locks.clear()
+
+
+class WebhookServer:
+    """HTTP сервер aiohttp, принимающий обновления Telegram"""
+    
+    def __init__(self, application, processor: PerUserUpdateProcessor,
+                 path: str = "/webhook", secret_token: Optional[str] = None,
+                 host: str = "0.0.0.0", port: int = 8443, max_pending: int = 1000):
+        self.application = application
+        self.processor = processor
+        self.path = path
+        self.secret_token = secret_token
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        
+        self.received = 0
+        self.rejected = 0
+        
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self.handle_update)
+        self.app.router.add_get("/healthz", self.handle_health)
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def backlog(self) -> int:
+        """Обновления в очереди приложения и в обработке"""
+        return self.application.update_queue.qsize() + self.processor.pending
+    
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Принять обновление от Telegram"""
+        # Сравнение за постоянное время: время ответа не выдает префикс токена
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", "").encode(),
+            self.secret_token.encode()
+        ):
+            return web.Response(status=403)
+        
+        # Telegram повторит доставку, если мы ответим ошибкой
+        if self.backlog >= self.max_pending:
+            self.rejected += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        
+        try:
+            data = await request.json(loads=ujson.loads)
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning(f"Некорректное обновление в webhook: {e}")
+            return web.Response(status=400)
+        
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return web.Response()
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Состояние сервера"""
+        return web.json_response({
+            "received": self.received,
+            "rejected": self.rejected,
+            "backlog": self.backlog
+        }, dumps=ujson.dumps)
+    
+    async def start(self):
+        """Запустить HTTP сервер"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Webhook сервер запущен на {self.host}:{self.port}{self.path}")
+    
+    async def stop(self):
+        """Остановить HTTP сервер"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+            logger.info("Webhook сервер остановлен")
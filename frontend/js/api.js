@@ -0,0 +1,79 @@
+// Запросы к API казино от имени пользователя Telegram.
+// Пользователь подтверждается подписью initData, а не user_id из URL:
+// сервер проверяет подпись один раз и выдает токен сессии.
+class CasinoApi {
+    constructor() {
+        this.initData = window.Telegram && window.Telegram.WebApp
+            ? window.Telegram.WebApp.initData
+            : '';
+        this.token = sessionStorage.getItem('casino_token');
+        this.tokenExpires = parseInt(sessionStorage.getItem('casino_token_expires') || 0);
+    }
+
+    // ID пользователя только для отображения; сервер его не принимает
+    get userId() {
+        const unsafe = window.Telegram && window.Telegram.WebApp
+            ? window.Telegram.WebApp.initDataUnsafe
+            : null;
+        return unsafe && unsafe.user ? String(unsafe.user.id) : 'demo';
+    }
+
+    get isDemo() {
+        return !this.initData;
+    }
+
+    async login() {
+        const response = await fetch('/api/auth', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ init_data: this.initData })
+        });
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || 'Ошибка авторизации');
+        }
+
+        this.token = data.token;
+        // Обновляем токен заранее, за минуту до истечения
+        this.tokenExpires = Date.now() + (data.expires_in - 60) * 1000;
+        sessionStorage.setItem('casino_token', this.token);
+        sessionStorage.setItem('casino_token_expires', this.tokenExpires);
+        return this.token;
+    }
+
+    async getToken() {
+        if (!this.token || Date.now() > this.tokenExpires) {
+            await this.login();
+        }
+        return this.token;
+    }
+
+    async request(path, options = {}) {
+        const send = async () => fetch(path, {
+            ...options,
+            headers: {
+                ...(options.headers || {}),
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${await this.getToken()}`
+            }
+        });
+
+        let response = await send();
+        if (response.status === 401) {
+            // Сессия истекла на сервере - входим заново один раз
+            this.token = null;
+            response = await send();
+        }
+        return response.json();
+    }
+
+    get(path) {
+        return this.request(path);
+    }
+
+    post(path, body) {
+        return this.request(path, { method: 'POST', body: JSON.stringify(body) });
+    }
+}
+
+window.casinoApi = new CasinoApi();
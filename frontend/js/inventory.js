@@ -128,8 +128,7 @@ class InventorySystem {
     async loadUserInventory() {
         // Запрос к вашему API
         try {
-            const response = await fetch(`/api/inventory?user_id=${this.userId}`);
-            const data = await response.json();
+            const data = await window.casinoApi.get('/api/inventory');
             
             if (data.success) {
                 this.inventory = data.inventory;
@@ -470,18 +469,9 @@ class InventorySystem {
     async useBooster(booster) {
         // Отправляем запрос на использование буста
         try {
-            const response = await fetch('/api/booster/use', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    user_id: this.userId,
-                    booster_id: booster.id
-                })
+            const data = await window.casinoApi.post('/api/booster/use', {
+                booster_id: booster.id
             });
-            
-            const data = await response.json();
             if (data.success) {
                 this.showMessage(`Буст "${booster.name}" активирован!`, 'success');
             }
@@ -498,19 +488,10 @@ class InventorySystem {
         if (!confirmed) return;
         
         try {
-            const response = await fetch('/api/inventory/sell', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    user_id: this.userId,
-                    item_id: item.id,
-                    item_type: 'nft'
-                })
+            const data = await window.casinoApi.post('/api/inventory/sell', {
+                item_id: item.id,
+                item_type: 'nft'
             });
-            
-            const data = await response.json();
             if (data.success) {
                 this.showMessage(`Предмет продан за ${sellPrice} stars`, 'success');
                 await this.loadInventory();
@@ -623,10 +604,8 @@ class InventorySystem {
 
 // Инициализация инвентаря
 document.addEventListener('DOMContentLoaded', () => {
-    const urlParams = new URLSearchParams(window.location.search);
-    const userId = urlParams.get('user_id') || localStorage.getItem('casino_user_id') || 'demo';
-    
-    localStorage.setItem('casino_user_id', userId);
+    // Пользователя подтверждает подпись Telegram, а не параметр URL
+    const userId = window.casinoApi.userId;
     
     window.inventorySystem = new InventorySystem(userId);
 });
@@ -238,33 +238,54 @@ class Lucky2Game {
         this.isSpinning = true;
         this.spinButton.disabled = true;
         
-        // Определяем выигрышный цвет (в реальном проекте сервер определяет)
-        const winningColor = this.determineWinningColor();
-        const won = winningColor === this.selectedColor;
-        
-        // Анимация вращения колеса
-        await this.animateWheel(winningColor);
-        
-        // Показываем результат
-        this.showResult(won, winningColor);
+        // Результат считает сервер; колесо останавливается на его цвете
+        const result = await this.placeBet();
         
-        // Отправляем результат на сервер
-        if (userId !== 'demo') {
-            await this.sendBetResult(won, winningColor);
+        if (result.success) {
+            await this.animateWheel(result.winning_color);
+            this.showResult(result);
+        } else {
+            this.showMessage(result.error || 'Ошибка ставки', 'error');
         }
         
         this.isSpinning = false;
         this.spinButton.disabled = false;
     }
     
-    determineWinningColor() {
-        // В реальном проекте сервер определяет результат
-        // Здесь симуляция на основе вероятностей
-        const random = Math.random() * 100;
+    async placeBet() {
+        if (this.userId === 'demo') {
+            return this.demoBet();
+        }
         
-        if (random <= 60) return 'blue';
-        if (random <= 65) return 'red';
-        return 'purple';
+        try {
+            return await window.casinoApi.post('/api/lucky2/bet', {
+                color: this.selectedColor,
+                amount: this.betAmount
+            });
+        } catch (error) {
+            console.error('Ошибка отправки ставки:', error);
+            return { success: false, error: 'Нет соединения с сервером' };
+        }
+    }
+    
+    demoBet() {
+        // Демо без аккаунта: результат разыгрывается в браузере, баланс условный
+        const random = Math.random() * 100;
+        const winningColor = random <= 60 ? 'blue' : random <= 65 ? 'red' : 'purple';
+        const won = winningColor === this.selectedColor;
+        const multiplier = won ? this.colors[this.selectedColor].multiplier : 0;
+        const winAmount = this.betAmount * multiplier;
+        
+        return {
+            success: true,
+            won,
+            bet_color: this.selectedColor,
+            bet_amount: this.betAmount,
+            winning_color: winningColor,
+            multiplier,
+            win_amount: winAmount,
+            balance: Math.max(0, parseInt(this.balanceElement.textContent || 0) + winAmount - this.betAmount)
+        };
     }
     
     async animateWheel(winningColor) {
@@ -298,16 +319,18 @@ class Lucky2Game {
         });
     }
     
-    showResult(won, winningColor) {
+    showResult(result) {
+        if (result.balance !== undefined) {
+            this.balanceElement.textContent = result.balance;
+        }
+        
         if (!this.resultElement) return;
         
-        const color = this.colors[winningColor];
-        const selectedColor = this.colors[this.selectedColor];
+        const color = this.colors[result.winning_color];
+        const selectedColor = this.colors[result.bet_color];
         
-        if (won) {
+        if (result.won) {
             // Победа
-            const winAmount = this.betAmount * selectedColor.multiplier;
-            
             this.resultElement.innerHTML = `
                 <div class="result-win">
                     <div class="result-icon">🎉</div>
@@ -315,17 +338,14 @@ class Lucky2Game {
                     <div class="result-color" style="color: ${selectedColor.color}">
                         ${selectedColor.emoji} ${selectedColor.name}
                     </div>
-                    <div class="result-multiplier">${selectedColor.multiplier}x</div>
-                    <div class="result-amount">Выигрыш: ${winAmount} stars</div>
+                    <div class="result-multiplier">${result.multiplier}x</div>
+                    <div class="result-amount">Выигрыш: ${result.win_amount} stars</div>
                     <div class="result-message">Выпал цвет: ${color.emoji} ${color.name}</div>
                 </div>
             `;
             
             this.resultElement.className = 'result win-animation';
             
-            // Обновляем баланс
-            this.updateBalance(winAmount - this.betAmount);
-            
         } else {
             // Проигрыш
             this.resultElement.innerHTML = `
@@ -336,14 +356,11 @@ class Lucky2Game {
                         Вы ставили на: ${selectedColor.emoji} ${selectedColor.name}
                     </div>
                     <div class="result-message">Выпал цвет: ${color.emoji} ${color.name}</div>
-                    <div class="result-lose-amount">Потеряно: ${this.betAmount} stars</div>
+                    <div class="result-lose-amount">Потеряно: ${result.bet_amount} stars</div>
                 </div>
             `;
             
             this.resultElement.className = 'result lose-animation';
-            
-            // Обновляем баланс (минус ставка)
-            this.updateBalance(-this.betAmount);
         }
         
         // Показываем результат
@@ -355,43 +372,6 @@ class Lucky2Game {
         }, 3000);
     }
     
-    async sendBetResult(won, winningColor) {
-        const payload = {
-            action: 'lucky2_bet',
-            user_id: this.userId,
-            color: this.selectedColor,
-            amount: this.betAmount,
-            won: won,
-            winning_color: winningColor,
-            timestamp: Date.now()
-        };
-        
-        // Используем Telegram Web App API
-        if (window.Telegram && window.Telegram.WebApp) {
-            window.Telegram.WebApp.sendData(JSON.stringify(payload));
-        }
-        
-        // В реальном проекте здесь будет fetch запрос к вашему API
-        try {
-            const response = await fetch('/api/lucky2/bet', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(payload)
-            });
-            
-            const data = await response.json();
-            
-            if (data.success && data.new_balance !== undefined) {
-                this.balanceElement.textContent = data.new_balance;
-            }
-            
-        } catch (error) {
-            console.error('Ошибка отправки ставки:', error);
-        }
-    }
-    
     updateBalance(change) {
         const currentBalance = parseInt(this.balanceElement.textContent || 0);
         const newBalance = Math.max(0, currentBalance + change);
@@ -414,15 +394,25 @@ class Lucky2Game {
 
 // Инициализация игры
 document.addEventListener('DOMContentLoaded', () => {
-    const urlParams = new URLSearchParams(window.location.search);
-    const userId = urlParams.get('user_id') || localStorage.getItem('casino_user_id') || 'demo';
-    
-    localStorage.setItem('casino_user_id', userId);
+    // Пользователя подтверждает подпись Telegram, а не параметр URL
+    const userId = window.casinoApi.userId;
     
     window.lucky2Game = new Lucky2Game(userId);
     
-    // Загружаем баланс
+    // Загружаем баланс один раз, дальше его присылает сервер
     loadUserBalance(userId);
+    
+    if (window.CasinoPush) {
+        window.casinoPush = new CasinoPush({
+            balance: (event) => {
+                const balanceElement = document.getElementById('stars-balance');
+                if (balanceElement && event.stars_balance !== undefined) {
+                    balanceElement.textContent = event.stars_balance;
+                }
+            }
+        });
+        window.casinoPush.connect();
+    }
 });
 
 async function loadUserBalance(userId) {
@@ -432,8 +422,7 @@ async function loadUserBalance(userId) {
             balanceElement.textContent = '1000'; // Демо баланс
         } else if (balanceElement) {
             // Запрос к API для получения реального баланса
-            const response = await fetch(`/api/user/balance?user_id=${userId}`);
-            const data = await response.json();
+            const data = await window.casinoApi.get('/api/user/balance');
             if (data.success) {
                 balanceElement.textContent = data.balance;
             }
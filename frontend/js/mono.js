@@ -508,12 +508,14 @@ class MonoGame {
         // Анимация вращения колеса
         const spinResult = await this.performSpin();
         
-        // Показываем результат
-        this.showSpinResult(spinResult);
-        
-        // Обновляем баланс
         if (spinResult.success) {
+            // Показываем результат
+            this.showSpinResult(spinResult);
+            
+            // Обновляем баланс
             this.updateBalances(spinResult);
+        } else {
+            this.showNotification(spinResult.error || 'Ошибка спина', 'error', '🎰');
         }
         
         this.isSpinning = false;
@@ -521,36 +523,18 @@ class MonoGame {
     }
     
     async performSpin() {
+        // Результат считает сервер; колесо только показывает его
+        const result = await this.requestSpin();
+        if (!result.success) {
+            return result;
+        }
+        
         // Добавляем класс вращения
         this.wheelElement.classList.add('spinning');
         
-        // Определяем результат (в реальном проекте с сервера)
-        const winNumber = Math.floor(Math.random() * 100) + 1;
-        const won = winNumber <= this.currentChance;
-        const setting = this.getCurrentSetting();
-        
-        // Вычисляем выигрыш
-        let winSpins = 0;
-        let winStars = 0;
-        let nftAwarded = null;
-        
-        if (won) {
-            winSpins = this.currentBetSpins * setting.multiplier;
-            winStars = winSpins * this.spinToStars;
-            
-            // Шанс NFT 0.5%
-            if (Math.random() < 0.005) {
-                nftAwarded = {
-                    id: Math.floor(Math.random() * 1000),
-                    name: 'Удачный NFT',
-                    rarity: 'rare'
-                };
-            }
-        }
-        
         // Анимация вращения с остановкой в нужном месте
         const spinDuration = 3000;
-        const winRotation = won ? 0 : 180 + Math.random() * 180; // Для проигрыша останавливаем в серой зоне
+        const winRotation = result.won ? 0 : 180 + Math.random() * 180; // Для проигрыша останавливаем в серой зоне
         const totalRotation = 1440 + winRotation; // 4 полных оборота + целевой угол
         
         this.wheelElement.style.transition = `transform ${spinDuration}ms cubic-bezier(0.2, 0.8, 0.3, 1)`;
@@ -562,17 +546,31 @@ class MonoGame {
         // Убираем класс вращения
         this.wheelElement.classList.remove('spinning');
         
-        // В реальном проекте здесь отправка на сервер
-        if (window.Telegram && window.Telegram.WebApp) {
-            const payload = {
-                action: 'mono_spin',
-                user_id: this.userId,
+        return result;
+    }
+    
+    async requestSpin() {
+        if (this.userId === 'demo') {
+            return this.demoSpin();
+        }
+        
+        try {
+            return await window.casinoApi.post('/api/mono/spin', {
                 chance: this.currentChance,
-                bet_spins: this.currentBetSpins,
-                timestamp: Date.now()
-            };
-            window.Telegram.WebApp.sendData(JSON.stringify(payload));
+                bet_spins: this.currentBetSpins
+            });
+        } catch (error) {
+            console.error('Ошибка спина:', error);
+            return { success: false, error: 'Нет соединения с сервером' };
         }
+    }
+    
+    demoSpin() {
+        // Демо без аккаунта: результат разыгрывается в браузере, NFT не выдаются
+        const winNumber = Math.floor(Math.random() * 100) + 1;
+        const won = winNumber <= this.currentChance;
+        const setting = this.getCurrentSetting();
+        const winSpins = won ? this.currentBetSpins * setting.multiplier : 0;
         
         return {
             success: true,
@@ -581,10 +579,10 @@ class MonoGame {
             win_number: winNumber,
             multiplier: won ? setting.multiplier : 0,
             win_spins: winSpins,
-            win_stars: winStars,
+            win_stars: winSpins * this.spinToStars,
             bet_spins: this.currentBetSpins,
             bet_stars: this.currentBetSpins * this.spinToStars,
-            nft_awarded: nftAwarded
+            nft_awarded: null
         };
     }
     
@@ -677,7 +675,17 @@ class MonoGame {
     }
     
     updateBalances(result) {
-        // Обновляем баланс спинов
+        if (result.balance !== undefined) {
+            // Баланс после расчета на сервере
+            this.spinsBalanceElement.textContent = Math.floor(result.balance);
+            if (this.starsBalanceElement && result.balance_stars !== undefined) {
+                this.starsBalanceElement.textContent = result.balance_stars;
+            }
+            this.updateStats(result);
+            return;
+        }
+        
+        // Демо: обновляем баланс спинов локально
         const currentSpins = parseInt(this.spinsBalanceElement.textContent || 0);
         let newSpins = currentSpins;
         
@@ -829,13 +837,30 @@ document.addEventListener('DOMContentLoaded', () => {
         window.notificationSystem.showNotification(title, message, type, icon);
     };
     
-    // Получаем user_id из URL
-    const urlParams = new URLSearchParams(window.location.search);
-    const userId = urlParams.get('user_id') || 'demo';
+    // Пользователя подтверждает подпись Telegram, а не параметр URL
+    const userId = window.casinoApi.userId;
     
     // Инициализируем игру
     window.monoGame = new MonoGame(userId);
     
+    // Балансы обновляются сервером без опроса
+    if (window.CasinoPush) {
+        window.casinoPush = new CasinoPush({
+            balance: (event) => {
+                const spinsBalance = document.getElementById('spins-balance');
+                const starsBalance = document.getElementById('stars-balance');
+                if (spinsBalance && event.spins_balance !== undefined) {
+                    spinsBalance.textContent = event.spins_balance;
+                }
+                if (starsBalance && event.stars_balance !== undefined) {
+                    starsBalance.textContent = event.stars_balance;
+                }
+            },
+            nft: () => window.showNotification('Новый NFT в инвентаре!', 'nft', '🎁')
+        });
+        window.casinoPush.connect();
+    }
+    
     // Загружаем баланс (в реальном проекте с сервера)
     setTimeout(() => {
         const spinsBalance = document.getElementById('spins-balance');
@@ -0,0 +1,46 @@
+// Живые обновления от сервера через WebSocket: балансы, результаты игр, NFT
+class CasinoPush {
+    constructor(handlers = {}) {
+        this.handlers = handlers;
+        this.socket = null;
+        this.retryDelay = 1000;
+    }
+
+    async connect() {
+        const api = window.casinoApi;
+
+        // Без подписи Telegram сервер соединение не примет (демо-режим)
+        if (!api || api.isDemo) return;
+
+        let token;
+        try {
+            token = await api.getToken();
+        } catch (error) {
+            console.error('Ошибка авторизации WebSocket:', error);
+            return;
+        }
+
+        const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const url = `${protocol}://${window.location.host}/ws?token=${encodeURIComponent(token)}`;
+
+        this.socket = new WebSocket(url);
+
+        this.socket.onopen = () => {
+            this.retryDelay = 1000;
+        };
+
+        this.socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            const handler = this.handlers[event.type];
+            if (handler) handler(event);
+        };
+
+        this.socket.onclose = () => {
+            // Переподключаемся с растущей задержкой
+            setTimeout(() => this.connect(), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, 30000);
+        };
+    }
+}
+
+window.CasinoPush = CasinoPush;